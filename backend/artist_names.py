@@ -0,0 +1,150 @@
+"""
+Artist Name Matching
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    Normalisation + approximate matching for artist names, so that
+    "BEYONCÉ" / "Beyoncé", "The Beatles (Remastered)" / "the beatles" and
+    "Drake feat. Rihanna" / "Drake" all hit the same cache / index entry.
+        • normalize_name()  – canonical key (case, diacritics, articles,
+                              bracketed suffixes, "feat." credits, punctuation)
+        • TrigramIndex      – fuzzy lookup by trigram (Dice) similarity
+        • NameIndex         – exact normalised lookup (fuzzy fallback opt-in)
+
+    Fuzzy matching is off by default: at Dice 0.7 "Drake Bell" matches
+    "Drake" and "Adel" matches "Adele", which would credit the wrong country.
+    Origin lookups use exact normalised names only.
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+# artist_names.py - name normalisation and trigram fuzzy matching
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Generic, List, Mapping, Optional, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+_BRACKETS = re.compile(r"\s*[\(\[\{][^\)\]\}]*[\)\]\}]")
+_DASH_SUFFIX = re.compile(r"\s+-\s+.*(remaster|live|version|edit|mix|mono|stereo).*$")
+_FEATURING = re.compile(r"\s+(feat\.?|ft\.?|featuring)\s+.*$")
+_LEADING_ARTICLE = re.compile(r"^(the|a|an)\s+")
+_NON_WORD = re.compile(r"[^\w\s]")
+_WS = re.compile(r"\s+")
+
+
+def _strip_accents(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def normalize_name(name: str) -> str:
+    """
+    Canonical lookup key for an artist name. Never returns "" for a non-blank name.
+    """
+    if not name:
+        return ""
+    text = _strip_accents(name).casefold().strip()
+    text = _BRACKETS.sub("", text)
+    text = _DASH_SUFFIX.sub("", text)
+    text = _FEATURING.sub("", text)
+    text = text.replace("&", " and ")
+    text = _NON_WORD.sub(" ", text)
+    text = _WS.sub(" ", text).strip()
+    stripped = _LEADING_ARTICLE.sub("", text)
+    # "The The" / "A" etc.: keep something rather than an empty key
+    return stripped or text or _WS.sub(" ", name.casefold()).strip()
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex(Generic[T]):
+    """
+    Approximate-match index over normalised keys. lookup() scores candidates that
+    share trigrams with the query by Dice similarity and returns the best match at
+    or above `threshold`.
+    """
+
+    def __init__(self, threshold: float = 0.7):
+        self.threshold = threshold
+        self._keys: List[str] = []
+        self._grams: List[int] = []
+        self._values: List[T] = []
+        self._postings: Dict[str, List[int]] = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key: str, value: T):
+        grams = trigrams(key)
+        idx = len(self._keys)
+        self._keys.append(key)
+        self._grams.append(len(grams))
+        self._values.append(value)
+        for g in grams:
+            self._postings.setdefault(g, []).append(idx)
+
+    def lookup(self, key: str, threshold: Optional[float] = None) -> Optional[Tuple[str, T, float]]:
+        """
+        (matched key, value, score) of the best candidate, or None.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        grams = trigrams(key)
+        if not grams:
+            return None
+        shared: Counter = Counter()
+        for g in grams:
+            for idx in self._postings.get(g, ()):
+                shared[idx] += 1
+        best = None
+        for idx, n in shared.items():
+            score = 2.0 * n / (len(grams) + self._grams[idx])
+            if score >= threshold and (best is None or score > best[2]):
+                best = (self._keys[idx], self._values[idx], score)
+        return best
+
+
+class NameIndex(Generic[T]):
+    """
+    name -> value map that matches on normalised names. With fuzzy=True,
+    misses fall back to the trigram index (only for callers that can
+    tolerate a near-miss; origin lookups can't).
+    """
+
+    def __init__(self, entries: Optional[Mapping[str, T]] = None, threshold: float = 0.7, fuzzy: bool = False):
+        self.fuzzy = fuzzy
+        self._exact: Dict[str, T] = {}
+        self._fuzzy: Optional[TrigramIndex[T]] = TrigramIndex(threshold) if fuzzy else None
+        for name, value in (entries or {}).items():
+            self.add(name, value)
+
+    def __len__(self):
+        return len(self._exact)
+
+    def add(self, name: str, value: T):
+        key = normalize_name(name)
+        if key and key not in self._exact:
+            self._exact[key] = value
+            if self._fuzzy is not None:
+                self._fuzzy.add(key, value)
+
+    def get(self, name: str, default: Optional[T] = None) -> Optional[T]:
+        key = normalize_name(name)
+        if not key:
+            return default
+        if key in self._exact:
+            return self._exact[key]
+        if self._fuzzy is not None:
+            hit = self._fuzzy.lookup(key)
+            if hit is not None:
+                return hit[1]
+        return default
@@ -1,38 +1,594 @@
 """
 @Author: Max Henson
-@Version: 1.0
+@Version: 1.2
 @Since: 10/3/2025
 
 Usage:
-    Simple in-memory cache implementation 
+    Caching subsystem shared by routers and background workers.
+        • CacheBackend   – abstract base every store implements (get/set/delete/clear,
+                           purge_expired, info, plus aget/aset/adelete for asyncio)
+        • SimpleCache    – the original unbounded dict cache with TTL (no eviction)
+        • LRUCache       – in-process, size-bounded, thread-safe; plain LRU or
+                           TinyLFU admission (policy="tinylfu", scan resistant)
+        • SQLiteCache    – shared local store (one SQLite file), so every uvicorn
+                           worker on the host sees the others' entries
+        • TieredCache    – LRUCache in front of a shared store
+        • SingleFlight   – coalesces concurrent identical calls into one execution
+        • memoize        – decorator for sync and async functions
+        • start_sweeper  – background thread that drops expired entries
+
+    Every cache counts hits / misses / sets / evictions / expirations
+    (see all_stats(), exposed on /status).
+
+    build_cache(name) picks the store from env:
+        CACHE_BACKEND=memory (default) | sqlite | tiered
+        CACHE_SQLITE_PATH=./tuniverse_cache.db   CACHE_MAX_ENTRIES=50000
+        CACHE_POLICY=lru | tinylfu               CACHE_SWEEP_INTERVAL=60
 
 Change Log:
     Version 1.0 (10/3/2025): Added get/set/delete with TTL support.
+    Version 1.1 (10/17/2026): Added size-capped, thread-safe LRUCache and SingleFlight.
+    Version 1.2 (10/17/2026): Pluggable backends (memory / SQLite / tiered), TinyLFU
+                              admission, stats counters, expiry sweeper, memoize.
+    Version 1.3 (10/17/2026): CacheBackend is an ABC; SQLiteCache trims per
+                              namespace and survives SQLite errors on every path;
+                              the default `cache` is built on first use;
+                              SimpleCache is unbounded again.
 """
 
 
 
 
-# cache.py - very small in-memory cache fallback (use redis in prod)
+# cache.py - in-process + shared local caches (use redis in prod)
+import abc
+import asyncio
+import functools
+import logging
+import math
+import os
+import pickle
+import random
+import sqlite3
+import threading
 import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MISS = object()  # default for "not cached" when None is a legitimate value
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "./tuniverse_cache.db")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "50000"))
+CACHE_POLICY = os.getenv("CACHE_POLICY", "lru")
+CACHE_SWEEP_INTERVAL = float(os.getenv("CACHE_SWEEP_INTERVAL", "60"))
+
+_registry = weakref.WeakSet()
+
+
+class CacheStats:
+    __slots__ = ("hits", "misses", "sets", "evictions", "expirations")
 
-class SimpleCache:
     def __init__(self):
-        self.store = {}
-    def get(self, key):
-        item = self.store.get(key)
-        if not item: return None
-        val, expires = item
-        if expires and time.time() > expires:
-            del self.store[key]
-            return None
-        return val
+        self.hits = self.misses = self.sets = self.evictions = self.expirations = 0
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+            "sets": self.sets,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class CacheBackend(abc.ABC):
+    """
+    Interface for cache stores. Sync methods are thread-safe; the a* variants are
+    safe to await from the event loop (stores that do I/O run it off-loop).
+    """
+    def __init__(self, name: Optional[str] = None):
+        self.name = name or type(self).__name__
+        self.stats = CacheStats()
+        _registry.add(self)
+    @abc.abstractmethod
+    def get(self, key, default=None):
+        ...
+    def get_entry(self, key) -> Optional[Tuple[Any, Optional[float]]]:
+        """
+        (value, expires_at epoch seconds or None), or None when missing.
+        """
+        val = self.get(key, MISS)
+        return None if val is MISS else (val, None)
+    @abc.abstractmethod
     def set(self, key, val, ttl=None):
+        ...
+    @abc.abstractmethod
+    def delete(self, key):
+        ...
+    @abc.abstractmethod
+    def clear(self):
+        ...
+    def purge_expired(self) -> int:
+        return 0
+    @abc.abstractmethod
+    def __len__(self):
+        ...
+    def info(self) -> dict:
+        out = {"name": self.name, "backend": type(self).__name__, "size": len(self)}
+        out.update(self.stats.as_dict())
+        return out
+    async def aget(self, key, default=None):
+        return self.get(key, default)
+    async def aset(self, key, val, ttl=None):
+        self.set(key, val, ttl)
+    async def adelete(self, key):
+        self.delete(key)
+
+
+class _FrequencySketch:
+    """
+    Count-min sketch (4 rows, 8-bit counters) with periodic halving, used as the
+    TinyLFU frequency estimate.
+    """
+    def __init__(self, capacity: int):
+        self.width = 1 << max(6, (max(capacity, 1) - 1).bit_length())
+        self.mask = self.width - 1
+        self.rows = [bytearray(self.width) for _ in range(4)]
+        self.seeds = [random.getrandbits(32) | 1 for _ in range(4)]
+        self.additions = 0
+        self.sample_size = self.width * 10
+    def _indexes(self, key):
+        h = hash(key)
+        return [(((h ^ s) * 0x9E3779B1) >> 16) & self.mask for s in self.seeds]
+    def increment(self, key):
+        for row, i in zip(self.rows, self._indexes(key)):
+            if row[i] < 255:
+                row[i] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            # age: halve every counter so old popularity fades
+            self.rows = [bytearray(b >> 1 for b in row) for row in self.rows]
+            self.additions //= 2
+    def estimate(self, key) -> int:
+        return min(row[i] for row, i in zip(self.rows, self._indexes(key)))
+
+
+class LRUCache(CacheBackend):
+    """
+    Size-capped, thread-safe LRU with optional per-entry TTL.
+    The least recently used entry is evicted once maxsize is reached. With
+    policy="tinylfu" a new key only displaces that entry if it has been asked
+    for at least as often, so one-off scans don't flush the hot set.
+    """
+    def __init__(self, maxsize=1024, default_ttl=None, policy="lru", name=None):
+        super().__init__(name)
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self.store = OrderedDict()
+        self.lock = threading.Lock()
+        self.sketch = _FrequencySketch(maxsize) if policy == "tinylfu" else None
+    def get_entry(self, key):
+        with self.lock:
+            if self.sketch is not None:
+                self.sketch.increment(key)
+            item = self.store.get(key)
+            if item is None:
+                self.stats.misses += 1
+                return None
+            val, expires = item
+            if expires and time.time() > expires:
+                del self.store[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self.store.move_to_end(key)
+            self.stats.hits += 1
+            return item
+    def get(self, key, default=None):
+        item = self.get_entry(key)
+        return default if item is None else item[0]
+    def set(self, key, val, ttl=None):
+        ttl = ttl if ttl is not None else self.default_ttl
         expires = time.time() + ttl if ttl else None
-        self.store[key] = (val, expires)
+        with self.lock:
+            if key not in self.store and len(self.store) >= self.maxsize:
+                victim = next(iter(self.store))
+                if self.sketch is not None and self.sketch.estimate(key) < self.sketch.estimate(victim):
+                    self.stats.evictions += 1  # candidate rejected by TinyLFU
+                    return
+                del self.store[victim]
+                self.stats.evictions += 1
+            self.store[key] = (val, expires)
+            self.store.move_to_end(key)
+            self.stats.sets += 1
+    def delete(self, key):
+        with self.lock:
+            self.store.pop(key, None)
+    def clear(self):
+        with self.lock:
+            self.store.clear()
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self.lock:
+            expired = [k for k, (_, exp) in self.store.items() if exp and exp < now]
+            for k in expired:
+                del self.store[k]
+            self.stats.expirations += len(expired)
+        return len(expired)
+    def __len__(self):
+        return len(self.store)
+
+
+class SimpleCache(LRUCache):
+    """
+    The original cache: unbounded, per-entry TTL, nothing is ever evicted
+    (expired entries go on read or sweep). Use LRUCache when size matters.
+    """
+    def __init__(self, default_ttl=None, name=None):
+        super().__init__(maxsize=math.inf, default_ttl=default_ttl, name=name)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache stored in a local SQLite file (WAL mode), shared by every process on
+    the host. Values are pickled; keys are namespaced by `namespace`. The table
+    is trimmed back to max_entries (oldest first) during sweeps and on ~1% of writes.
+    """
+    def __init__(self, path=CACHE_SQLITE_PATH, namespace="default", max_entries=CACHE_MAX_ENTRIES, default_ttl=None, name=None):
+        super().__init__(name or f"sqlite:{namespace}")
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, stored REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_expires ON cache_entries (expires)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_stored ON cache_entries (stored)")
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread (sqlite3 connections aren't shareable across threads)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    def _key(self, key) -> str:
+        return f"{self.namespace}:{key if isinstance(key, str) else repr(key)}"
+    def _execute(self, what: str, sql: str, params=()) -> Optional[sqlite3.Cursor]:
+        # a locked or broken cache file must never fail the request using the cache
+        try:
+            return self._conn().execute(sql, params)
+        except sqlite3.Error:
+            logger.warning("sqlite %s failed", what, exc_info=True)
+            return None
+    def _prefix_match(self) -> Tuple[str, tuple]:
+        prefix = f"{self.namespace}:"
+        return "substr(key, 1, ?) = ?", (len(prefix), prefix)
+    def _count(self, field: str, n: int = 1):
+        with self._stats_lock:
+            setattr(self.stats, field, getattr(self.stats, field) + n)
+    def get_entry(self, key):
+        k = self._key(key)
+        try:
+            row = self._conn().execute("SELECT value, expires FROM cache_entries WHERE key = ?", (k,)).fetchone()
+        except sqlite3.Error:
+            logger.warning("sqlite cache read failed", exc_info=True)
+            row = None
+        if row is None:
+            self._count("misses")
+            return None
+        value, expires = row
+        if expires and expires < time.time():
+            self._execute("cache expiry", "DELETE FROM cache_entries WHERE key = ?", (k,))
+            self._count("expirations")
+            self._count("misses")
+            return None
+        try:
+            val = pickle.loads(value)
+        except Exception:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return val, expires
+    def get(self, key, default=None):
+        item = self.get_entry(key)
+        return default if item is None else item[0]
+    def set(self, key, val, ttl=None):
+        ttl = ttl if ttl is not None else self.default_ttl
+        now = time.time()
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires, stored) VALUES (?, ?, ?, ?)",
+                (self._key(key), pickle.dumps(val, protocol=pickle.HIGHEST_PROTOCOL), now + ttl if ttl else None, now),
+            )
+        except sqlite3.Error:
+            logger.warning("sqlite cache write failed", exc_info=True)
+            return
+        self._count("sets")
+        if random.random() < 0.01:
+            self._trim()
+    def delete(self, key):
+        self._execute("cache delete", "DELETE FROM cache_entries WHERE key = ?", (self._key(key),))
+    def clear(self):
+        where, params = self._prefix_match()
+        self._execute("cache clear", f"DELETE FROM cache_entries WHERE {where}", params)
+    def _trim(self) -> int:
+        # max_entries applies to this namespace; other caches in the file trim themselves
+        where, params = self._prefix_match()
+        cur = self._execute("cache trim", f"SELECT COUNT(*) FROM cache_entries WHERE {where}", params)
+        extra = (cur.fetchone()[0] if cur is not None else 0) - self.max_entries
+        if extra <= 0:
+            return 0
+        cur = self._execute(
+            "cache trim",
+            f"DELETE FROM cache_entries WHERE key IN (SELECT key FROM cache_entries WHERE {where} ORDER BY stored LIMIT ?)",
+            params + (extra,),
+        )
+        if cur is None:
+            return 0
+        self._count("evictions", extra)
+        return extra
+    def purge_expired(self) -> int:
+        where, params = self._prefix_match()
+        cur = self._execute(
+            "cache sweep",
+            f"DELETE FROM cache_entries WHERE {where} AND expires IS NOT NULL AND expires < ?",
+            params + (time.time(),),
+        )
+        if cur is None:
+            return 0
+        purged = max(cur.rowcount, 0)
+        self._count("expirations", purged)
+        self._trim()
+        return purged
+    def __len__(self):
+        where, params = self._prefix_match()
+        cur = self._execute("cache count", f"SELECT COUNT(*) FROM cache_entries WHERE {where}", params)
+        return cur.fetchone()[0] if cur is not None else 0
+    async def aget(self, key, default=None):
+        return await asyncio.to_thread(self.get, key, default)
+    async def aset(self, key, val, ttl=None):
+        await asyncio.to_thread(self.set, key, val, ttl)
+    async def adelete(self, key):
+        await asyncio.to_thread(self.delete, key)
+
+
+class TieredCache(CacheBackend):
+    """
+    Fast in-process LRU in front of a shared store. Local copies live at most
+    `local_ttl` seconds (and never past the shared entry's expiry), so other
+    workers' updates show up quickly.
+    """
+    def __init__(self, local: LRUCache, shared: CacheBackend, local_ttl: float = 30.0, name=None):
+        super().__init__(name)
+        self.local = local
+        self.shared = shared
+        self.local_ttl = local_ttl
+    def _local_ttl(self, expires: Optional[float]) -> float:
+        if not expires:
+            return self.local_ttl
+        return max(0.001, min(self.local_ttl, expires - time.time()))
+    def get_entry(self, key):
+        item = self.local.get_entry(key)
+        if item is None:
+            item = self.shared.get_entry(key)
+            if item is None:
+                self.stats.misses += 1
+                return None
+            self.local.set(key, item[0], ttl=self._local_ttl(item[1]))
+        self.stats.hits += 1
+        return item
+    def get(self, key, default=None):
+        item = self.get_entry(key)
+        return default if item is None else item[0]
+    def set(self, key, val, ttl=None):
+        self.shared.set(key, val, ttl)
+        self.local.set(key, val, ttl=min(ttl, self.local_ttl) if ttl else self.local_ttl)
+        self.stats.sets += 1
     def delete(self, key):
-        if key in self.store:
-            del self.store[key]
+        self.local.delete(key)
+        self.shared.delete(key)
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+    def purge_expired(self) -> int:
+        return 0  # both tiers are registered and swept on their own
+    def __len__(self):
+        return len(self.shared)
+    async def aget(self, key, default=None):
+        item = self.local.get_entry(key)
+        if item is not None:
+            self.stats.hits += 1
+            return item[0]
+        return await asyncio.to_thread(self.get, key, default)
+    async def aset(self, key, val, ttl=None):
+        await asyncio.to_thread(self.set, key, val, ttl)
+    async def adelete(self, key):
+        await asyncio.to_thread(self.delete, key)
+
+
+def build_cache(name: str, maxsize: int = 1024, default_ttl=None, backend: str = None) -> CacheBackend:
+    """
+    Cache for one use-site, using the store selected by CACHE_BACKEND.
+    """
+    backend = backend or CACHE_BACKEND
+    if backend == "sqlite":
+        return SQLiteCache(CACHE_SQLITE_PATH, namespace=name, default_ttl=default_ttl, name=name)
+    if backend == "tiered":
+        local = LRUCache(maxsize, default_ttl, policy=CACHE_POLICY, name=f"{name}:local")
+        shared = SQLiteCache(CACHE_SQLITE_PATH, namespace=name, default_ttl=default_ttl, name=f"{name}:shared")
+        return TieredCache(local, shared, name=name)
+    return LRUCache(maxsize, default_ttl, policy=CACHE_POLICY, name=name)
+
+
+def all_stats() -> List[dict]:
+    out = []
+    for c in list(_registry):
+        try:
+            out.append(c.info())
+        except Exception:
+            out.append({"name": c.name, "backend": type(c).__name__, "error": "unavailable"})
+    return sorted(out, key=lambda d: d["name"])
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one execution: the first caller
+    runs fn, the others block and receive its result (or exception).
+    """
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+    def do(self, key, fn, *args, **kwargs):
+        with self.lock:
+            fut = self.calls.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                self.calls[key] = fut
+        if not leader:
+            return fut.result()
+        try:
+            result = fn(*args, **kwargs)
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+
+
+def _default_key(fn: Callable, args: tuple, kwargs: dict) -> str:
+    return f"{fn.__module__}.{fn.__qualname__}:{args!r}:{sorted(kwargs.items())!r}"
+
+
+def memoize(ttl: Optional[float] = None, cache: Optional[CacheBackend] = None, key: Optional[Callable] = None,
+            maxsize: int = 1024, cache_none: bool = True):
+    """
+    Cache a function's results (sync or async). Concurrent calls with the same
+    arguments are coalesced. The wrapper exposes .cache and .cache_clear().
+
+        @memoize(ttl=300)
+        def lookup(name): ...
+    """
+    def decorator(fn):
+        store = cache if cache is not None else LRUCache(maxsize, ttl, name=f"memoize:{fn.__qualname__}")
+        make_key = key or (lambda *a, **kw: _default_key(fn, a, kw))
+
+        if asyncio.iscoroutinefunction(fn):
+            inflight: Dict[Any, asyncio.Future] = {}
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                k = make_key(*args, **kwargs)
+                hit = await store.aget(k, MISS)
+                if hit is not MISS:
+                    return hit
+                fut = inflight.get(k)
+                if fut is not None and fut.get_loop() is asyncio.get_running_loop():
+                    return await asyncio.shield(fut)
+                fut = asyncio.get_running_loop().create_future()
+                inflight[k] = fut
+                try:
+                    result = await fn(*args, **kwargs)
+                    if result is not None or cache_none:
+                        await store.aset(k, result, ttl)
+                    fut.set_result(result)
+                    return result
+                except BaseException as e:
+                    fut.set_exception(e)
+                    fut.exception()  # mark retrieved when nobody else was waiting
+                    raise
+                finally:
+                    if inflight.get(k) is fut:
+                        del inflight[k]
+
+            wrapper = async_wrapper
+        else:
+            flight = SingleFlight()
+
+            def compute(k, args, kwargs):
+                result = fn(*args, **kwargs)
+                if result is not None or cache_none:
+                    store.set(k, result, ttl)
+                return result
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                k = make_key(*args, **kwargs)
+                hit = store.get(k, MISS)
+                if hit is not MISS:
+                    return hit
+                return flight.do(k, compute, k, args, kwargs)
+
+        wrapper.cache = store
+        wrapper.cache_clear = store.clear
+        return wrapper
+    return decorator
+
+
+_sweeper: Optional[threading.Thread] = None
+_sweeper_stop = threading.Event()
+
+
+def start_sweeper(interval: float = CACHE_SWEEP_INTERVAL):
+    """
+    Start (once) a daemon thread that purges expired entries from every cache.
+    """
+    global _sweeper
+    if _sweeper is not None and _sweeper.is_alive():
+        return
+    _sweeper_stop.clear()
+
+    def run():
+        while not _sweeper_stop.wait(interval):
+            for c in list(_registry):
+                try:
+                    c.purge_expired()
+                except Exception:
+                    logger.exception("cache sweep failed for %s", c.name)
+
+    _sweeper = threading.Thread(target=run, name="cache-sweeper", daemon=True)
+    _sweeper.start()
+
+
+def stop_sweeper():
+    _sweeper_stop.set()
+
+
+_default_cache: Optional[CacheBackend] = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> CacheBackend:
+    """
+    The shared "default" cache, built on first use (not at import, so importing
+    this module never opens the SQLite file or reads CACHE_* before it's needed).
+    """
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = build_cache("default")
+    return _default_cache
 
-cache = SimpleCache()
 
+def __getattr__(name):
+    # `from .cache import cache` / `cache.cache` keep working, lazily
+    if name == "cache":
+        return get_default_cache()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
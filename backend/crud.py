@@ -13,10 +13,21 @@ Change Log:
 
 
 # crud.py - basic DB operations used by routers
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from . import models
 from .auth import hash_password
+from .utils import chunked
 from datetime import datetime
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import uuid
+
+# keep IN (...) lists under SQLite's bound-parameter limit
+IN_CHUNK = 500
 
 def create_user(db: Session, email: str, username: str, password: str):
     hashed = hash_password(password)
@@ -64,8 +75,321 @@ def upsert_artist(db: Session, spotify_artist_id: str, name: str, **kwargs):
     db.refresh(a)
     return a
 
-def create_passport(db: Session, user_id: str, country_counts: dict, region_percentages: dict, total_artists: int):
-    p = models.MusicPassportSummary(user_id=user_id, country_counts=country_counts, region_percentages=region_percentages, total_artists=total_artists)
+def get_user_playlists(db: Session, user_id: str):
+    return db.query(models.Playlist).filter(models.Playlist.user_id == user_id).all()
+
+def delete_tracks(db: Session, track_ids: List[str]):
+    # caller commits
+    for chunk in chunked(list(track_ids), IN_CHUNK):
+        db.query(models.Track).filter(models.Track.id.in_(chunk)).delete(synchronize_session=False)
+
+def delete_playlists(db: Session, playlist_ids: List[str]) -> Counter:
+    """
+    Delete playlists and their tracks. Caller commits.
+    Returns the per-artist track counts that were removed (for apply_user_artist_deltas).
+    """
+    removed = Counter()
+    for chunk in chunked(list(playlist_ids), IN_CHUNK):
+        q = db.query(models.Track.artist_ids).filter(models.Track.playlist_id.in_(chunk))
+        removed.update(artist_counts(aids for (aids,) in q))
+        db.query(models.Track).filter(models.Track.playlist_id.in_(chunk)).delete(synchronize_session=False)
+        db.query(models.Playlist).filter(models.Playlist.id.in_(chunk)).delete(synchronize_session=False)
+    return removed
+
+def bulk_insert_tracks(db: Session, rows: List[Dict], chunk_size: int = 1000) -> int:
+    """
+    Insert Track rows in executemany batches. Caller commits.
+    """
+    for chunk in chunked(rows, chunk_size):
+        db.bulk_insert_mappings(models.Track, [{"id": str(uuid.uuid4()), **r} for r in chunk])
+    return len(rows)
+
+def insert_listening_history(db: Session, rows: List[Dict], chunk_size: int = 1000) -> int:
+    """
+    Insert plays in batches, skipping any already stored for the same
+    (user_id, played_at, track_id). Returns how many were new. Caller commits.
+    """
+    dialect = db.get_bind().dialect.name
+    inserted = 0
+    for chunk in chunked(rows, chunk_size):
+        batch = list({(r["user_id"], r["played_at"], r["track_id"]): r for r in chunk}.values())
+        batch = [{"id": str(uuid.uuid4()), **r} for r in batch]
+        if dialect in ("sqlite", "postgresql"):
+            insert = sqlite_insert if dialect == "sqlite" else pg_insert
+            stmt = insert(models.ListeningHistory).on_conflict_do_nothing(
+                index_elements=["user_id", "played_at", "track_id"]
+            )
+            # Core execute on the session's connection: the ORM-level db.execute() returns a result without rowcount
+            inserted += max(db.connection().execute(stmt, batch).rowcount, 0)
+            continue
+        # other databases: filter out keys that already exist, then plain insert
+        keys = [(r["user_id"], r["played_at"], r["track_id"]) for r in batch]
+        existing = set()
+        for kchunk in chunked(keys, IN_CHUNK // 3):
+            q = db.query(models.ListeningHistory.user_id, models.ListeningHistory.played_at, models.ListeningHistory.track_id).filter(
+                tuple_(models.ListeningHistory.user_id, models.ListeningHistory.played_at, models.ListeningHistory.track_id).in_(kchunk)
+            )
+            existing.update(tuple(row) for row in q)
+        fresh = [r for r, k in zip(batch, keys) if k not in existing]
+        if fresh:
+            db.bulk_insert_mappings(models.ListeningHistory, fresh)
+        inserted += len(fresh)
+    return inserted
+
+def latest_played_at(db: Session, user_id: str, source: str = "api") -> Optional[datetime]:
+    return (
+        db.query(func.max(models.ListeningHistory.played_at))
+          .filter(models.ListeningHistory.user_id == user_id, models.ListeningHistory.source == source)
+          .scalar()
+    )
+
+def artist_counts(artist_id_lists: Iterable[List[str]]) -> Counter:
+    # one count per track for each distinct artist on it
+    counts = Counter()
+    for aids in artist_id_lists:
+        counts.update(set(aids or []))
+    return counts
+
+def has_user_artists(db: Session, user_id: str) -> bool:
+    return db.query(models.UserArtist.user_id).filter(models.UserArtist.user_id == user_id).first() is not None
+
+def get_user_artist_ids(db: Session, user_id: str) -> List[str]:
+    """
+    Distinct Spotify artist IDs in a user's playlists (one indexed query).
+    """
+    rows = db.query(models.UserArtist.spotify_artist_id).filter(models.UserArtist.user_id == user_id).all()
+    return [r[0] for r in rows]
+
+def apply_user_artist_deltas(db: Session, user_id: str, delta: Dict[str, int]) -> bool:
+    """
+    Add/subtract per-artist track counts in user_artists. Caller commits.
+    Returns True if the set of artists changed (not just their counts).
+    """
+    delta = {aid: d for aid, d in delta.items() if aid and d}
+    if not delta:
+        return False
+    existing = {}
+    for chunk in chunked(list(delta), IN_CHUNK):
+        q = db.query(models.UserArtist.spotify_artist_id, models.UserArtist.track_count).filter(
+            models.UserArtist.user_id == user_id, models.UserArtist.spotify_artist_id.in_(chunk)
+        )
+        existing.update(dict(q.all()))
+    inserts, updates, deletes = [], [], []
+    for aid, d in delta.items():
+        count = existing.get(aid, 0) + d
+        if aid not in existing:
+            if count > 0:
+                inserts.append({"user_id": user_id, "spotify_artist_id": aid, "track_count": count})
+        elif count > 0:
+            updates.append({"user_id": user_id, "spotify_artist_id": aid, "track_count": count})
+        else:
+            deletes.append(aid)
+    if inserts:
+        db.bulk_insert_mappings(models.UserArtist, inserts)
+    if updates:
+        db.bulk_update_mappings(models.UserArtist, updates)
+    for chunk in chunked(deletes, IN_CHUNK):
+        db.query(models.UserArtist).filter(
+            models.UserArtist.user_id == user_id, models.UserArtist.spotify_artist_id.in_(chunk)
+        ).delete(synchronize_session=False)
+    return bool(inserts or deletes)
+
+def rebuild_user_artists(db: Session, user_id: str):
+    """
+    Recompute user_artists from the Track rows (backfill / repair). Caller commits.
+    """
+    q = db.query(models.Track.artist_ids).join(models.Playlist).filter(models.Playlist.user_id == user_id)
+    counts = artist_counts(aids for (aids,) in q.yield_per(1000))
+    db.query(models.UserArtist).filter(models.UserArtist.user_id == user_id).delete(synchronize_session=False)
+    rows = [{"user_id": user_id, "spotify_artist_id": aid, "track_count": n} for aid, n in counts.items() if aid]
+    for chunk in chunked(rows, 1000):
+        db.bulk_insert_mappings(models.UserArtist, chunk)
+
+def bulk_upsert_artists(db: Session, rows: List[Dict]) -> List[str]:
+    """
+    Insert or update many artists, keyed on spotify_artist_id.
+    Each row is a dict of Artist columns and must include spotify_artist_id.
+    Returns the IDs of artists that are new or whose origin_country changed. Caller commits.
+    """
+    by_sid = {r["spotify_artist_id"]: r for r in rows if r.get("spotify_artist_id")}
+    if not by_sid:
+        return []
+    existing = {}
+    for chunk in chunked(list(by_sid), IN_CHUNK):
+        q = db.query(models.Artist.spotify_artist_id, models.Artist.id, models.Artist.origin_country).filter(models.Artist.spotify_artist_id.in_(chunk))
+        existing.update({sid: (aid, country) for sid, aid, country in q.all()})
+    changed = [
+        sid for sid, row in by_sid.items()
+        if sid not in existing or ("origin_country" in row and row["origin_country"] != existing[sid][1])
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        # ON CONFLICT: another job may insert the same artist between the SELECT above and this write
+        insert = sqlite_insert if dialect == "sqlite" else pg_insert
+        by_columns: Dict[frozenset, List[Dict]] = {}
+        for row in by_sid.values():
+            by_columns.setdefault(frozenset(row), []).append(row)
+        for columns, group in by_columns.items():
+            stmt = insert(models.Artist)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["spotify_artist_id"],
+                set_={c: stmt.excluded[c] for c in columns if c not in ("id", "spotify_artist_id")},
+            )
+            for chunk in chunked(group, IN_CHUNK):
+                db.connection().execute(stmt, [{"id": str(uuid.uuid4()), **r} for r in chunk])
+        return changed
+    # other databases: split on the SELECT above
+    inserts = [{"id": str(uuid.uuid4()), **r} for sid, r in by_sid.items() if sid not in existing]
+    updates = [{**r, "id": existing[sid][0]} for sid, r in by_sid.items() if sid in existing]
+    if inserts:
+        db.bulk_insert_mappings(models.Artist, inserts)
+    if updates:
+        db.bulk_update_mappings(models.Artist, updates)
+    return changed
+
+def mark_artists_checked(db: Session, spotify_artist_ids: List[str], checked_at: datetime):
+    """
+    Stamp last_checked_at without other changes (IDs Spotify no longer knows). Caller commits.
+    """
+    for chunk in chunked(list(spotify_artist_ids), IN_CHUNK):
+        db.query(models.Artist).filter(models.Artist.spotify_artist_id.in_(chunk)).update(
+            {models.Artist.last_checked_at: checked_at}, synchronize_session=False
+        )
+
+def stale_artists_by_user(db: Session, checked_before: datetime, limit: int) -> Dict[str, List[str]]:
+    """
+    Up to `limit` artists not checked since `checked_before` (never-checked first),
+    grouped under one linked user who has each of them (their token is used to refresh).
+    Only artists some linked user has count toward `limit`, so orphaned stale
+    artists can't fill the batch and starve the rest.
+    """
+    q = (
+        db.query(models.Artist.spotify_artist_id, func.min(models.UserArtist.user_id))
+          .join(models.UserArtist, models.UserArtist.spotify_artist_id == models.Artist.spotify_artist_id)
+          .join(models.User, models.User.id == models.UserArtist.user_id)
+          .filter((models.Artist.last_checked_at == None) | (models.Artist.last_checked_at < checked_before),  # noqa: E711
+                  models.User.spotify_linked == True)  # noqa: E712
+          .group_by(models.Artist.spotify_artist_id, models.Artist.last_checked_at)
+          .order_by(models.Artist.last_checked_at.isnot(None), models.Artist.last_checked_at)
+          .limit(limit)
+    )
+    by_user: Dict[str, List[str]] = {}
+    for sid, uid in q:
+        by_user.setdefault(uid, []).append(sid)
+    return by_user
+
+def due_sync_users(db: Session, now: datetime, limit: int) -> List[models.User]:
+    """
+    Linked users whose periodic sync slot has come (or who don't have one yet).
+    """
+    return (
+        db.query(models.User)
+          .filter(models.User.spotify_linked == True,  # noqa: E712
+                  (models.User.next_sync_at == None) | (models.User.next_sync_at <= now))  # noqa: E711
+          .order_by(models.User.next_sync_at)
+          .limit(limit)
+          .all()
+    )
+
+def get_library_version(db: Session, user_id: str) -> int:
+    row = db.query(models.User.library_version).filter(models.User.id == user_id).first()
+    return (row[0] or 0) if row else 0
+
+def bump_library_version(db: Session, user_id: str):
+    """
+    Mark a user's passport inputs as changed. Caller commits.
+    """
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.library_version: func.coalesce(models.User.library_version, 0) + 1,
+         models.User.library_changed_at: datetime.utcnow()},
+        synchronize_session=False,
+    )
+
+def bump_library_versions_for_artists(db: Session, spotify_artist_ids: List[str]):
+    """
+    Bump every user who has any of these artists (their passports changed). Caller commits.
+    """
+    for chunk in chunked(list(spotify_artist_ids), IN_CHUNK):
+        users = select(models.UserArtist.user_id).where(models.UserArtist.spotify_artist_id.in_(chunk))
+        db.query(models.User).filter(models.User.id.in_(users)).update(
+            {models.User.library_version: func.coalesce(models.User.library_version, 0) + 1,
+             models.User.library_changed_at: datetime.utcnow()},
+            synchronize_session=False,
+        )
+
+def get_latest_passport(db: Session, user_id: str, library_version: int):
+    return (
+        db.query(models.MusicPassportSummary)
+          .filter(models.MusicPassportSummary.user_id == user_id,
+                  models.MusicPassportSummary.library_version == library_version)
+          .order_by(models.MusicPassportSummary.created_at.desc())
+          .first()
+    )
+
+def library_changed_users(db: Session, since: datetime = None) -> List[Tuple[str, Optional[datetime]]]:
+    """
+    (user_id, library_changed_at) for users whose library changed after `since`;
+    with since=None, every user with artists.
+    """
+    if since is None:
+        q = (
+            db.query(models.User.id, models.User.library_changed_at)
+              .filter(models.User.id.in_(select(models.UserArtist.user_id).distinct()))
+        )
+    else:
+        q = db.query(models.User.id, models.User.library_changed_at).filter(models.User.library_changed_at > since)
+    return [(uid, changed) for uid, changed in q.all()]
+
+def seed_country_regions(db: Session, mapping: Dict[str, str]):
+    """
+    Make country_regions match `mapping` (inserts new / updates changed rows).
+    """
+    existing = dict(db.query(models.CountryRegion.country, models.CountryRegion.region).all())
+    inserts = [{"country": c, "region": r} for c, r in mapping.items() if c not in existing]
+    updates = [{"country": c, "region": r} for c, r in mapping.items() if c in existing and existing[c] != r]
+    if inserts:
+        db.bulk_insert_mappings(models.CountryRegion, inserts)
+    if updates:
+        db.bulk_update_mappings(models.CountryRegion, updates)
+    db.commit()
+
+def country_histogram(db: Session, user_id: str) -> List[Tuple[str, str, int]]:
+    """
+    (country, region, artist count) for a user's artists, aggregated in SQL.
+    About one row per distinct country; missing country/region -> "Unknown".
+    """
+    country = func.coalesce(models.Artist.origin_country, "Unknown")
+    region = func.coalesce(models.CountryRegion.region, "Unknown")
+    q = (
+        db.query(country, region, func.count())
+          .select_from(models.UserArtist)
+          .join(models.Artist, models.Artist.spotify_artist_id == models.UserArtist.spotify_artist_id)
+          .outerjoin(models.CountryRegion, models.CountryRegion.country == models.Artist.origin_country)
+          .filter(models.UserArtist.user_id == user_id)
+          .group_by(models.Artist.origin_country, models.CountryRegion.region)
+    )
+    return [(c, r, n) for c, r, n in q.all()]
+
+def country_histograms(db: Session, user_ids: List[str]) -> Dict[str, List[Tuple[str, str, int]]]:
+    """
+    country_histogram() for several users in one query: {user_id: [(country, region, artist count)]}.
+    """
+    country = func.coalesce(models.Artist.origin_country, "Unknown")
+    region = func.coalesce(models.CountryRegion.region, "Unknown")
+    q = (
+        db.query(models.UserArtist.user_id, country, region, func.count())
+          .join(models.Artist, models.Artist.spotify_artist_id == models.UserArtist.spotify_artist_id)
+          .outerjoin(models.CountryRegion, models.CountryRegion.country == models.Artist.origin_country)
+          .filter(models.UserArtist.user_id.in_(list(user_ids)))
+          .group_by(models.UserArtist.user_id, models.Artist.origin_country, models.CountryRegion.region)
+    )
+    out: Dict[str, List[Tuple[str, str, int]]] = {}
+    for uid, c, r, n in q.all():
+        out.setdefault(uid, []).append((c, r, n))
+    return out
+
+def create_passport(db: Session, user_id: str, country_counts: dict, region_percentages: dict, total_artists: int, library_version: int = None):
+    p = models.MusicPassportSummary(user_id=user_id, country_counts=country_counts, region_percentages=region_percentages, total_artists=total_artists, library_version=library_version)
     db.add(p)
     db.commit()
     db.refresh(p)
@@ -73,3 +397,51 @@ def create_passport(db: Session, user_id: str, country_counts: dict, region_perc
 
 
 
+
+def create_community_post(db: Session, display_name: str, message: str, passport_hash: str = None) -> models.CommunityPost:
+    post = models.CommunityPost(display_name=display_name, message=message, passport_hash=passport_hash)
+    db.add(post)
+    db.commit()
+    db.refresh(post)
+    return post
+
+def community_posts(db: Session, before: int = None, limit: int = 20, after: int = None) -> List[models.CommunityPost]:
+    """
+    Newest-first page of the feed: posts with id < before (and > after), at most `limit`.
+    Walks the primary key backwards, so the cost doesn't grow with the feed.
+    """
+    q = db.query(models.CommunityPost)
+    if before is not None:
+        q = q.filter(models.CommunityPost.id < before)
+    if after is not None:
+        q = q.filter(models.CommunityPost.id > after)
+    return q.order_by(models.CommunityPost.id.desc()).limit(limit).all()
+
+def community_posts_after(db: Session, after: int, limit: int = 100) -> List[models.CommunityPost]:
+    """
+    Oldest-first: the `limit` posts right after id `after` (for tailing the feed without gaps).
+    """
+    return (
+        db.query(models.CommunityPost)
+          .filter(models.CommunityPost.id > after)
+          .order_by(models.CommunityPost.id.asc())
+          .limit(limit)
+          .all()
+    )
+
+def get_passport_fragment(db: Session, content_hash: str) -> models.PassportFragment:
+    return db.query(models.PassportFragment).filter(models.PassportFragment.hash == content_hash).first()
+
+def save_passport_fragment(db: Session, content_hash: str, html: str, region_counts: dict = None) -> bool:
+    """
+    Store a fragment unless one with this hash exists. Returns True if it was new.
+    """
+    if get_passport_fragment(db, content_hash) is not None:
+        return False
+    db.add(models.PassportFragment(hash=content_hash, html=html, region_counts=region_counts))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # stored by a concurrent post with the same content
+        return False
+    return True
@@ -1,35 +1,183 @@
 """
 @Author: Max Henson
-@Version: 1.0
+@Version: 1.1
 @Since: 10/3/2025
 
 Usage:
-    Handles database engine, session, and base model setup using SQLAlchemy. 
+    Handles database engine, session, and base model setup using SQLAlchemy.
     Provides dependency injection for DB sessions.
 
+    make_engine() builds a tuned engine from env:
+        SQLite     – WAL journal, synchronous=NORMAL, busy_timeout, mmap_size
+                     (SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_SIZE, SQLITE_SYNCHRONOUS)
+        others     – explicit pool: DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+                     DB_POOL_RECYCLE, pre-ping on checkout
+    Request handlers use SessionLocal / get_db. Background work (job worker,
+    scheduler, job handlers, the user index refresh thread) uses
+    WorkerSessionLocal, a separate, smaller pool (WORKER_DB_POOL_SIZE,
+    WORKER_DB_MAX_OVERFLOW), so a heavy sync can't take every connection away
+    from requests. The web process opens this pool too, since the scheduler
+    and the user index run there; size it for that (each uvicorn worker gets
+    its own). pool_status() reports both pools (shown on /status).
+
 Change Log:
     Version 1.0 (10/3/2025): Initial creation
+    Version 1.1 (10/17/2026): Engine factory with SQLite pragmas / pool settings,
+                              pool metrics, separate worker session factory.
 """
 
 
 
 
 # db.py - SQLAlchemy engine + session + Base
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, StaticPool
 import os
+import threading
+from typing import Dict, List, Optional
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./tuniverse.db")
 
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; below typical server idle timeouts
+WORKER_DB_POOL_SIZE = int(os.getenv("WORKER_DB_POOL_SIZE", "4"))
+WORKER_DB_MAX_OVERFLOW = int(os.getenv("WORKER_DB_MAX_OVERFLOW", "4"))
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # NORMAL is durable enough with WAL
+
+
+class PoolMetrics:
+    """
+    Counters fed by pool events, plus a live snapshot of the pool.
+    """
+    def __init__(self, name: str, engine: Engine):
+        self.name = name
+        self.engine = engine
+        self.lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_conn, record):
+        with self.lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_conn, record, proxy):
+        with self.lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def _on_checkin(self, dbapi_conn, record):
+        with self.lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def _on_invalidate(self, dbapi_conn, record, exc):
+        with self.lock:
+            self.invalidations += 1
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool
+        out = {
+            "name": self.name,
+            "dialect": self.engine.dialect.name,
+            "pool": type(pool).__name__,
+            "checked_out": self.checked_out,
+            "peak_checked_out": self.peak_checked_out,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "invalidations": self.invalidations,
+        }
+        if isinstance(pool, QueuePool):
+            out.update(size=pool.size(), idle=pool.checkedin(), overflow=pool.overflow())
+        return out
+
+
+_metrics: List[PoolMetrics] = []
+
+
+def _sqlite_pragmas(dbapi_conn, record):
+    cur = dbapi_conn.cursor()
+    try:
+        cur.execute("PRAGMA journal_mode=WAL")  # readers don't block the writer (and vice versa)
+        cur.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")  # wait for the lock instead of failing
+        cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    finally:
+        cur.close()
+
+
+def make_engine(url: str = DATABASE_URL, name: str = "web", pool_size: int = DB_POOL_SIZE,
+                max_overflow: int = DB_MAX_OVERFLOW, echo: bool = False) -> Engine:
+    """
+    Engine with per-database tuning and pool metrics (see module docstring).
+    """
+    if url.startswith("sqlite"):
+        kwargs = {"connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}}
+        if ":memory:" in url or url.rstrip("/") in ("sqlite:", "sqlite+pysqlite:"):
+            kwargs["poolclass"] = StaticPool  # one shared in-memory database
+        else:
+            kwargs.update(poolclass=QueuePool, pool_size=pool_size, max_overflow=max_overflow, pool_timeout=DB_POOL_TIMEOUT)
+        engine = create_engine(url, echo=echo, **kwargs)
+        event.listen(engine, "connect", _sqlite_pragmas)
+    else:
+        engine = create_engine(
+            url,
+            echo=echo,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True,  # drop connections the server closed instead of failing a request
+        )
+    _metrics.append(PoolMetrics(name, engine))
+    return engine
+
+
 # For SQLite (dev). In production use PostgreSQL or similar.
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
+engine = make_engine(DATABASE_URL, name="web")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+_worker_sessionmaker: Optional[sessionmaker] = None
+_worker_lock = threading.Lock()
+
+
+def WorkerSessionLocal():
+    """
+    Session for background work, on its own pool (created on first use). Web
+    processes open it for the scheduler and the user index thread, never for
+    request handlers.
+    """
+    global _worker_sessionmaker
+    if _worker_sessionmaker is None:
+        with _worker_lock:
+            if _worker_sessionmaker is None:
+                worker_engine = make_engine(DATABASE_URL, name="worker", pool_size=WORKER_DB_POOL_SIZE,
+                                            max_overflow=WORKER_DB_MAX_OVERFLOW)
+                _worker_sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=worker_engine)
+    return _worker_sessionmaker()
+
+
+def pool_status() -> List[Dict]:
+    return [m.snapshot() for m in _metrics]
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
-
@@ -0,0 +1,249 @@
+"""
+Community Feed Fan-out Hub
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    Pushes new community posts to every open /community/stream connection.
+
+        feed_hub.publish(post_dict)         # from any thread (share_post runs in the threadpool)
+        sub = feed_hub.hub.subscribe()      # on the event loop, one per SSE client
+        event = await sub.queue.get()       # post dicts, or DROPPED
+
+    Each subscriber has a bounded queue (COMMUNITY_STREAM_QUEUE_SIZE). Delivery
+    never waits on a client: if a subscriber's queue is full, it is
+    unsubscribed and gets DROPPED as its last event, so the client reloads the
+    feed and reconnects. One slow phone can't hold up everyone else.
+
+    Across workers, posts travel through a broadcast backend
+    (COMMUNITY_BROADCAST):
+        local – this process only (single worker / dev). Default.
+        db    – a poller reads community_posts rows newer than the last one it
+                saw, oldest first and page after page until it has caught up
+                (every COMMUNITY_POLL_SECONDS, only while someone is
+                subscribed), and fans them out here; posts made by this worker
+                are delivered at once and skipped by the poller.
+    Other transports (Redis pub/sub, Postgres LISTEN/NOTIFY) can plug in by
+    implementing BroadcastBackend.
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+# feed_hub.py - in-process pub/sub for community posts + cross-worker backends
+import abc
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from typing import Callable, Dict, Optional, Set
+
+from . import crud
+from .db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+COMMUNITY_STREAM_QUEUE_SIZE = int(os.getenv("COMMUNITY_STREAM_QUEUE_SIZE", "64"))
+COMMUNITY_STREAM_MAX_SUBSCRIBERS = int(os.getenv("COMMUNITY_STREAM_MAX_SUBSCRIBERS", "1000"))
+COMMUNITY_BROADCAST = os.getenv("COMMUNITY_BROADCAST", "local")
+COMMUNITY_POLL_SECONDS = float(os.getenv("COMMUNITY_POLL_SECONDS", "2"))
+RECENT_IDS = 1024  # post ids delivered locally, remembered so the poller doesn't send them twice
+
+DROPPED = object()  # last event of a subscriber that fell too far behind
+
+
+class Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop, size: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self.dropped = False
+
+
+class Hub:
+    """
+    Fan-out to subscribers living on event loops; dispatch() is thread-safe
+    (it hands each event over with loop.call_soon_threadsafe).
+    """
+    def __init__(self, queue_size: int = COMMUNITY_STREAM_QUEUE_SIZE, max_subscribers: int = COMMUNITY_STREAM_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.subscribers: Set[Subscriber] = set()
+        self.lock = threading.Lock()
+        self.delivered = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    def subscribe(self) -> Optional[Subscriber]:
+        """
+        Call on the event loop. None when the hub is at max_subscribers.
+        """
+        sub = Subscriber(asyncio.get_running_loop(), self.queue_size)
+        with self.lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+            self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        with self.lock:
+            self.subscribers.discard(sub)
+
+    def _deliver(self, sub: Subscriber, event: Dict):
+        # runs on the subscriber's loop
+        if sub.dropped:
+            return
+        try:
+            sub.queue.put_nowait(event)
+            self.delivered += 1
+        except asyncio.QueueFull:
+            sub.dropped = True
+            self.dropped += 1
+            self.unsubscribe(sub)
+            sub.queue.get_nowait()  # make room for the marker
+            sub.queue.put_nowait(DROPPED)
+
+    def dispatch(self, event: Dict):
+        """
+        Hand `event` to every local subscriber (from any thread, never blocks).
+        """
+        with self.lock:
+            subs = list(self.subscribers)
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(self._deliver, sub, event)
+            except RuntimeError:
+                self.unsubscribe(sub)  # its loop is closed
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self.subscribers), "delivered": self.delivered, "dropped": self.dropped}
+
+
+class BroadcastBackend(abc.ABC):
+    """
+    Carries published posts to the hubs of every worker.
+    """
+    def start(self, hub: Hub):
+        self.hub = hub
+
+    @abc.abstractmethod
+    def publish(self, event: Dict):
+        ...
+
+    def stop(self):
+        pass
+
+
+class LocalBroadcast(BroadcastBackend):
+    """
+    Single process: publishing is dispatching.
+    """
+    def publish(self, event: Dict):
+        self.hub.dispatch(event)
+
+
+class DBPollBroadcast(BroadcastBackend):
+    """
+    Every worker polls community_posts for ids it hasn't delivered yet. The
+    post row is the message, so nothing extra is written.
+    """
+    def __init__(self, to_event: Callable, interval: float = COMMUNITY_POLL_SECONDS):
+        self.to_event = to_event
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.recent = deque(maxlen=RECENT_IDS)
+        self.recent_set: Set[int] = set()
+        self.lock = threading.Lock()
+        self.last_id: Optional[int] = None
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self, hub: Hub):
+        super().start(hub)
+        self.thread = threading.Thread(target=self._run, name="community-feed-poller", daemon=True)
+        self.thread.start()
+
+    def _remember(self, post_id: int) -> bool:
+        # True if this id is new to us
+        with self.lock:
+            if post_id in self.recent_set:
+                return False
+            if len(self.recent) == self.recent.maxlen:
+                self.recent_set.discard(self.recent[0])
+            self.recent.append(post_id)
+            self.recent_set.add(post_id)
+            return True
+
+    def publish(self, event: Dict):
+        if self._remember(event["id"]):
+            self.hub.dispatch(event)
+
+    def _poll(self):
+        db = SessionLocal()
+        try:
+            if self.last_id is None:
+                newest = crud.community_posts(db, limit=1)
+                self.last_id = newest[0].id if newest else 0
+                return
+            # ascending from the last id seen, until a short page: a burst bigger
+            # than one page is delivered in full, never skipped
+            page = max(self.hub.queue_size, 1)
+            while True:
+                rows = crud.community_posts_after(db, self.last_id, page)
+                for row in rows:
+                    self.last_id = row.id
+                    if self._remember(row.id):
+                        self.hub.dispatch(self.to_event(row))
+                if len(rows) < page or self.stop_event.is_set():
+                    break
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            if not len(self.hub):
+                self.last_id = None  # nobody listening; re-anchor at the newest post once someone is
+                continue
+            try:
+                self._poll()
+            except Exception:
+                logger.exception("community feed poll failed")
+
+    def stop(self):
+        self.stop_event.set()
+
+
+hub = Hub()
+_backend: Optional[BroadcastBackend] = None
+
+
+def start(to_event: Callable):
+    """
+    Start the configured backend (app startup). to_event(row) -> event dict.
+    """
+    global _backend
+    if _backend is not None:
+        return
+    if COMMUNITY_BROADCAST == "db":
+        _backend = DBPollBroadcast(to_event)
+    else:
+        _backend = LocalBroadcast()
+    _backend.start(hub)
+
+
+def stop():
+    global _backend
+    if _backend is not None:
+        _backend.stop()
+        _backend = None
+
+
+def publish(event: Dict):
+    if _backend is None:
+        hub.dispatch(event)  # not started (tests / scripts): local delivery only
+        return
+    _backend.publish(event)
@@ -0,0 +1,260 @@
+"""
+Listening History Ingestion
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    Two sources feed the listening_history table; both insert idempotently
+    (unique user_id + played_at + track_id) in batches, so re-running an import
+    only adds plays that are new.
+
+    1) Spotify API (/me/player/recently-played), resumable:
+           ingest_recent(db, user, progress)
+       The first run walks back from now with the `before` cursor, saving it
+       after every page (User.history_backfill_before), so a retry carries on
+       from the oldest page reached. Only once that walk is finished is the
+       high-water mark (User.history_played_until) set, to the newest play
+       stored; later runs start there and move forward with the `after`
+       cursor, committing the mark after every page.
+
+    2) Spotify "Extended streaming history" export, streamed from disk:
+           ingest_export(db, user_id, "my_spotify_data.zip", progress)
+       Accepts the export .zip, a folder, or a single Streaming_History_*.json.
+       Files are parsed one record at a time (iter_json_array), so memory use
+       stays flat however many years of history the export holds.
+
+    played_at is stored at whole-second precision (the export has no
+    milliseconds), so a play seen by both sources is stored once.
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+# history.py - recently-played cursors + streaming export import
+import io
+import json
+import logging
+import os
+import zipfile
+from datetime import datetime, timedelta
+from typing import Callable, Dict, IO, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+from . import crud, jobs, models, spotify_client
+from .spotify_client import PRIORITY_BULK
+from .utils import parse_spotify_time
+
+logger = logging.getLogger(__name__)
+
+RECENT_PAGE_SIZE = 50  # Spotify's max for recently-played
+HISTORY_MAX_PAGES = int(os.getenv("HISTORY_MAX_PAGES", "200"))
+EXPORT_BATCH_SIZE = 1000
+_EPOCH = datetime(1970, 1, 1)
+
+Progress = Optional[Callable[..., None]]
+
+
+def _to_ms(dt: datetime) -> int:
+    return int((dt - _EPOCH).total_seconds() * 1000)
+
+
+def _from_ms(value) -> Optional[datetime]:
+    try:
+        return _EPOCH + timedelta(milliseconds=int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _played_at(value: Optional[str]) -> Optional[datetime]:
+    dt = parse_spotify_time(value)
+    return dt.replace(microsecond=0) if dt else None
+
+
+def _api_row(user_id: str, item: dict) -> Optional[Dict]:
+    track = item.get("track") or {}
+    played_at = _played_at(item.get("played_at"))
+    if not track.get("id") or played_at is None:
+        return None  # local files / unplayable items have no stable key
+    artists = track.get("artists") or [{}]
+    return {
+        "user_id": user_id,
+        "track_id": track["id"],
+        "track_name": track.get("name"),
+        "artist_id": artists[0].get("id"),
+        "artist_name": artists[0].get("name"),
+        "ms_played": None,  # the API doesn't say how much of the track was heard
+        "source": "api",
+        "played_at": played_at,
+    }
+
+
+def ingest_recent(db: Session, user: models.User, progress: Progress = None) -> int:
+    """
+    Pull plays newer than the user's high-water mark from /me/player/recently-played.
+    Returns the number of new rows. Raises (via jobs.upstream_error) if Spotify fails.
+    """
+    token = user.spotify_access_token
+    mark = user.history_played_until
+    backward = mark is None  # first walk, possibly resumed from a saved `before` cursor
+    if backward:
+        start = user.history_backfill_before or datetime.utcnow()
+        params = {"limit": RECENT_PAGE_SIZE, "before": _to_ms(start)}
+    else:
+        params = {"limit": RECENT_PAGE_SIZE, "after": _to_ms(mark)}
+    cursor_key = "before" if backward else "after"
+
+    inserted = seen = 0
+    finished = False
+    for _ in range(HISTORY_MAX_PAGES):
+        resp = spotify_client.spotify_get("/me/player/recently-played", token, params=params,
+                                          priority=PRIORITY_BULK, user_key=user.id)
+        if not isinstance(resp, dict) or "error" in resp:
+            raise jobs.upstream_error("recently-played failed", resp)
+        items = resp.get("items") or []
+        rows = [r for r in (_api_row(user.id, it) for it in items) if r]
+        inserted += crud.insert_listening_history(db, rows)
+        seen += len(items)
+        cursor = (resp.get("cursors") or {}).get(cursor_key)
+        finished = not items or not cursor or len(items) < params["limit"]
+        if backward:
+            if not finished:
+                user.history_backfill_before = _from_ms(cursor)
+        elif rows:
+            newest = max(r["played_at"] for r in rows)
+            if newest > user.history_played_until:
+                user.history_played_until = newest
+        if backward and finished:
+            # walk complete: from now on only plays after the newest one stored
+            user.history_played_until = crud.latest_played_at(db, user.id) or datetime.utcnow()
+            user.history_backfill_before = None
+        db.commit()  # checkpoint: a retry resumes from here
+        if progress:
+            progress(seen, None, f"{inserted} new plays")
+        if finished:
+            break
+        params = {"limit": RECENT_PAGE_SIZE, cursor_key: cursor}
+    return inserted
+
+
+# ---- extended streaming history export ----
+
+def iter_json_array(fp: IO[str], chunk_size: int = 1 << 16) -> Iterator[dict]:
+    """
+    Yield the elements of a top-level JSON array one by one, reading `fp` in
+    chunks: memory use is bounded by the chunk size plus the largest element.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+    opened = False
+    while True:
+        while pos < len(buf) and (buf[pos].isspace() or (opened and buf[pos] == ",")):
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                raise ValueError("unexpected end of JSON array")
+            chunk = fp.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        if not opened:
+            if buf[pos] != "[":
+                raise ValueError("expected a JSON array")
+            opened = True
+            pos += 1
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+            if end >= len(buf) and not eof:
+                # a bare number cut at the chunk edge would still parse; read more first
+                raise json.JSONDecodeError("element may continue", buf, end)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # element continues in the next chunk
+            chunk = fp.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        yield obj
+        pos = end
+
+
+def _export_files(path: str) -> Iterator[IO[str]]:
+    """
+    Open each audio streaming-history JSON file of an export (.zip, folder or single file).
+    """
+    def wanted(name: str) -> bool:
+        base = os.path.basename(name)
+        return base.endswith(".json") and base.startswith(("Streaming_History_Audio", "endsong"))
+
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for name in sorted(n for n in zf.namelist() if wanted(n)):
+                with zf.open(name) as raw:
+                    yield io.TextIOWrapper(raw, encoding="utf-8")
+    elif os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for name in sorted(f for f in files if wanted(f)):
+                with open(os.path.join(root, name), encoding="utf-8") as fp:
+                    yield fp
+    else:
+        with open(path, encoding="utf-8") as fp:
+            yield fp
+
+
+def _export_row(user_id: str, rec: dict) -> Optional[Dict]:
+    uri = rec.get("spotify_track_uri") or ""
+    if not uri.startswith("spotify:track:"):
+        return None  # podcasts, audiobooks, local files
+    played_at = _played_at(rec.get("ts"))
+    if played_at is None:
+        return None
+    return {
+        "user_id": user_id,
+        "track_id": uri.rsplit(":", 1)[-1],
+        "track_name": rec.get("master_metadata_track_name"),
+        "artist_id": None,
+        "artist_name": rec.get("master_metadata_album_artist_name"),
+        "ms_played": rec.get("ms_played"),
+        "source": "export",
+        "played_at": played_at,
+    }
+
+
+def iter_export_rows(user_id: str, path: str) -> Iterator[Dict]:
+    for fp in _export_files(path):
+        for rec in iter_json_array(fp):
+            row = _export_row(user_id, rec) if isinstance(rec, dict) else None
+            if row:
+                yield row
+
+
+def ingest_export(db: Session, user_id: str, path: str, progress: Progress = None) -> int:
+    """
+    Stream an extended streaming-history export into listening_history,
+    committing every EXPORT_BATCH_SIZE plays. Returns the number of new rows.
+    """
+    inserted = seen = 0
+    batch: List[Dict] = []
+    for row in iter_export_rows(user_id, path):
+        batch.append(row)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            inserted += crud.insert_listening_history(db, batch)
+            db.commit()
+            seen += len(batch)
+            batch = []
+            if progress:
+                progress(seen, None, f"{inserted} new plays")
+    if batch:
+        inserted += crud.insert_listening_history(db, batch)
+        db.commit()
+        seen += len(batch)
+    if progress:
+        progress(seen, seen, f"{inserted} new plays")
+    return inserted
@@ -0,0 +1,155 @@
+"""
+Shared HTTP Connection Pool
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    One pooled, keep-alive httpx client per upstream host (Spotify API, Spotify
+    accounts, MusicBrainz, ...), shared by every router and background worker.
+    Pool sizes and timeouts live here so connections are reused across requests
+    instead of paying a DNS lookup + TLS handshake on every call.
+
+        from .http_client import get_client, get_async_client
+        r = get_client(url).get(url, params=...)
+        r = await get_async_client(url).get(url, params=...)
+
+    HTTP/2 is used automatically when the optional 'h2' package is installed
+    (pip install "httpx[http2]").
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+# http_client.py - per-host pooled sync + async httpx clients
+import asyncio
+import importlib.util
+import os
+import threading
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None  # only needed for HTTP/2
+
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "50"))
+MAX_KEEPALIVE_PER_HOST = int(os.getenv("HTTP_MAX_KEEPALIVE_PER_HOST", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "5"))
+USER_AGENT = os.getenv("HTTP_USER_AGENT", "TuniverseDemo/1.0 (class project)")
+
+# Per-host overrides: host -> (max_connections, max_keepalive_connections)
+HOST_LIMITS: Dict[str, Tuple[int, int]] = {}
+
+_lock = threading.Lock()
+_sync_clients: Dict[str, httpx.Client] = {}
+_async_clients: Dict[Tuple[str, int], Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+
+# Tests / benchmarks can swap the network out (e.g. httpx.MockTransport)
+_transport_factory: Optional[Callable[[bool], httpx.BaseTransport]] = None
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _client_kwargs(origin: str, is_async: bool) -> dict:
+    host = urlsplit(origin).hostname or ""
+    max_conn, max_keepalive = HOST_LIMITS.get(host, (MAX_CONNECTIONS_PER_HOST, MAX_KEEPALIVE_PER_HOST))
+    kwargs = {
+        "http2": HTTP2_AVAILABLE,
+        "limits": httpx.Limits(
+            max_connections=max_conn,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT, pool=POOL_TIMEOUT),
+        "headers": {"User-Agent": USER_AGENT},
+    }
+    if _transport_factory is not None:
+        kwargs["transport"] = _transport_factory(is_async)
+    return kwargs
+
+
+def set_host_limits(host: str, max_connections: int, max_keepalive: Optional[int] = None):
+    """
+    Override the pool size for one host. Call before the first request to it.
+    """
+    HOST_LIMITS[host] = (max_connections, max_keepalive if max_keepalive is not None else max_connections)
+
+
+def set_transport_factory(factory: Optional[Callable[[bool], httpx.BaseTransport]]):
+    """
+    Route every new client through a custom transport (factory(is_async) -> transport).
+    Existing clients are closed so the change takes effect immediately.
+    """
+    global _transport_factory
+    _transport_factory = factory
+    with _lock:
+        _async_clients.clear()
+    close_all()
+
+
+def get_client(url: str) -> httpx.Client:
+    """
+    Pooled sync client for the host of `url` (thread-safe, shared process-wide).
+    """
+    origin = _origin(url)
+    client = _sync_clients.get(origin)
+    if client is None:
+        with _lock:
+            client = _sync_clients.get(origin)
+            if client is None:
+                client = httpx.Client(**_client_kwargs(origin, is_async=False))
+                _sync_clients[origin] = client
+    return client
+
+
+def get_async_client(url: str) -> httpx.AsyncClient:
+    """
+    Pooled async client for the host of `url`, bound to the running event loop.
+    """
+    origin = _origin(url)
+    loop = asyncio.get_running_loop()
+    key = (origin, id(loop))
+    entry = _async_clients.get(key)
+    if entry is None or entry[0] is not loop:
+        with _lock:
+            # drop clients whose event loop has gone away (e.g. asyncio.run in a worker)
+            for k in [k for k, (lp, _) in _async_clients.items() if lp.is_closed()]:
+                del _async_clients[k]
+            entry = _async_clients.get(key)
+            if entry is None or entry[0] is not loop:
+                entry = (loop, httpx.AsyncClient(**_client_kwargs(origin, is_async=True)))
+                _async_clients[key] = entry
+    return entry[1]
+
+
+def close_all():
+    """
+    Close every sync client (async clients are closed by aclose_all()).
+    """
+    with _lock:
+        clients = list(_sync_clients.values())
+        _sync_clients.clear()
+    for c in clients:
+        c.close()
+
+
+async def aclose_all():
+    """
+    Close the pools owned by the running loop, plus the sync pools. Call on app shutdown.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        mine = [k for k, (lp, _) in _async_clients.items() if lp is loop]
+        clients = [_async_clients.pop(k)[1] for k in mine]
+    for c in clients:
+        await c.aclose()
+    close_all()
@@ -0,0 +1,328 @@
+"""
+Durable Job Queue
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    Background work (playlist sync, artist enrichment, history import) is stored
+    in the jobs table and run by separate worker processes (backend/worker.py),
+    so it survives restarts and never competes with request handling.
+
+        job, created = jobs.enqueue(db, "sync", user_id)   # from a route
+        @jobs.handler("sync")                               # next to the work
+        def _background_sync(user_id, progress=None): ...
+
+    • per-user dedup: while a job is queued or running, enqueueing the same
+      kind for the same user returns that job (jobs.dedup_key is unique)
+    • claiming is an atomic compare-and-set UPDATE, safe across processes and DBs
+    • a claimed job holds a lease (JOB_LEASE_SECONDS), extended by progress()
+      calls (handlers report at least once per batch of work); if its worker
+      dies the job is claimed again once the lease ends, or failed if that
+      attempt was its last
+    • failures are retried with jittered exponential backoff (JOB_RETRY_BASE
+      seconds, up to max_attempts); raise PermanentJobError to fail at once
+    • handlers get `progress(done, total=None, message=None)`, shown on /jobs/{id}
+    • finished jobs are deleted JOB_RETENTION_DAYS after they finish
+      (prune_finished(), run by the scheduler leader)
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+# jobs.py - DB-backed job queue (enqueue / claim / finish / retry)
+import logging
+import os
+import socket
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .ratelimit import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_RETRY_BASE = float(os.getenv("JOB_RETRY_BASE", "30"))
+JOB_RETRY_CAP = float(os.getenv("JOB_RETRY_CAP", "3600"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "14"))
+JOB_CLAIM_BATCH = 20  # candidates looked at per claim attempt
+JOB_PRUNE_BATCH = 1000  # rows deleted per statement by prune_finished()
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+HANDLERS: Dict[str, Callable] = {}
+
+
+class PermanentJobError(Exception):
+    """
+    Raised by a handler when retrying can't help (e.g. the user's token was revoked).
+    """
+
+
+def handler(kind: str):
+    """
+    Register fn(user_id, progress=None, **payload) as the handler for `kind`.
+    """
+    def decorator(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+
+def upstream_error(what: str, resp) -> Exception:
+    """
+    Exception for a failed Spotify call: auth/not-found errors are permanent,
+    anything else (network, 429, 5xx) is retried.
+    """
+    status = resp.get("error") if isinstance(resp, dict) else None
+    if status in (400, 401, 403, 404):
+        return PermanentJobError(f"{what}: {resp}")
+    return RuntimeError(f"{what}: {resp}")
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def _dedup_key(kind: str, user_id: Optional[str]) -> Optional[str]:
+    return f"{kind}:{user_id}" if user_id else None
+
+
+def enqueue(db: Session, kind: str, user_id: Optional[str] = None, payload: Optional[dict] = None,
+            max_attempts: int = JOB_MAX_ATTEMPTS, dedup: bool = True, run_after: Optional[datetime] = None) -> Tuple[models.Job, bool]:
+    """
+    Queue a job. Returns (job, created); created is False when an equivalent
+    job for this user was already queued or running (that job is returned).
+    """
+    key = _dedup_key(kind, user_id) if dedup else None
+    if key:
+        existing = db.query(models.Job).filter(models.Job.dedup_key == key).first()
+        if existing is not None:
+            return existing, False
+    job = models.Job(
+        kind=kind,
+        user_id=user_id,
+        payload=payload or {},
+        dedup_key=key,
+        status=QUEUED,
+        max_attempts=max_attempts,
+        run_after=run_after or datetime.utcnow(),
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # another request enqueued the same job between our check and insert
+        db.rollback()
+        existing = db.query(models.Job).filter(models.Job.dedup_key == key).first()
+        if existing is None:
+            raise
+        return existing, False
+    db.refresh(job)
+    return job, True
+
+
+def get_job(db: Session, job_id: str) -> Optional[models.Job]:
+    return db.query(models.Job).filter(models.Job.id == job_id).first()
+
+
+def _fail_abandoned(db: Session, now: datetime):
+    # the worker running the last allowed attempt died (lease ran out): no attempt is left to take it over
+    res = db.execute(
+        update(models.Job)
+        .where(models.Job.status == RUNNING, models.Job.locked_until < now, models.Job.attempts >= models.Job.max_attempts)
+        .values(status=FAILED, dedup_key=None, locked_by=None, locked_until=None, finished_at=now,
+                last_error="lease expired on the last attempt (worker lost)")
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if res.rowcount:
+        logger.warning("failed %d job(s) whose last attempt lost its worker", res.rowcount)
+
+
+def claim(db: Session, worker: str, kinds: Optional[Iterable[str]] = None) -> Optional[models.Job]:
+    """
+    Claim the next runnable job (queued and due, or running with an expired
+    lease and attempts left) for this worker, or None. The UPDATE only
+    succeeds if the row is still claimable, so two workers can never take the
+    same job. Expired jobs with no attempts left are marked failed here.
+    """
+    now = datetime.utcnow()
+    _fail_abandoned(db, now)
+    claimable = or_(
+        (models.Job.status == QUEUED) & (models.Job.run_after <= now),
+        (models.Job.status == RUNNING) & (models.Job.locked_until < now) & (models.Job.attempts < models.Job.max_attempts),
+    )
+    q = db.query(models.Job.id).filter(claimable)
+    if kinds:
+        q = q.filter(models.Job.kind.in_(list(kinds)))
+    candidates = [row.id for row in q.order_by(models.Job.run_after).limit(JOB_CLAIM_BATCH)]
+    for job_id in candidates:
+        res = db.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, claimable)
+            .values(
+                status=RUNNING,
+                locked_by=worker,
+                locked_until=now + timedelta(seconds=JOB_LEASE_SECONDS),
+                attempts=models.Job.attempts + 1,
+                started_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if res.rowcount == 1:
+            return get_job(db, job_id)
+    return None
+
+
+def report_progress(db: Session, job_id: str, worker: str, done: int, total: Optional[int] = None, message: Optional[str] = None):
+    """
+    Record progress and extend the lease (only while this worker still owns the job).
+    """
+    values = {"progress": done, "locked_until": datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)}
+    if total is not None:
+        values["progress_total"] = total
+    if message is not None:
+        values["message"] = message
+    db.execute(
+        update(models.Job)
+        .where(models.Job.id == job_id, models.Job.locked_by == worker, models.Job.status == RUNNING)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def acquire_lease(db: Session, name: str, holder: str, ttl_seconds: float) -> bool:
+    """
+    Take or renew the named lease for `holder`. True if we hold it now; false
+    while another holder's lease is still live.
+    """
+    now = datetime.utcnow()
+    expires = now + timedelta(seconds=ttl_seconds)
+    res = db.execute(
+        update(models.Lease)
+        .where(models.Lease.name == name, or_(models.Lease.holder == holder, models.Lease.expires_at < now))
+        .values(holder=holder, expires_at=expires)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if res.rowcount == 1:
+        return True
+    if db.query(models.Lease.name).filter(models.Lease.name == name).first() is not None:
+        return False
+    db.add(models.Lease(name=name, holder=holder, expires_at=expires))
+    try:
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()  # someone else created it first
+        return False
+
+
+def release_lease(db: Session, name: str, holder: str):
+    db.query(models.Lease).filter(models.Lease.name == name, models.Lease.holder == holder).delete(synchronize_session=False)
+    db.commit()
+
+
+def prune_finished(db: Session, older_than: Optional[datetime] = None) -> int:
+    """
+    Delete succeeded / failed jobs that finished before `older_than` (default:
+    JOB_RETENTION_DAYS ago), JOB_PRUNE_BATCH rows per statement. Returns the count.
+    """
+    cutoff = older_than or datetime.utcnow() - timedelta(days=JOB_RETENTION_DAYS)
+    total = 0
+    while True:
+        ids = [
+            row.id for row in db.query(models.Job.id)
+            .filter(models.Job.status.in_([SUCCEEDED, FAILED]), models.Job.finished_at < cutoff)
+            .limit(JOB_PRUNE_BATCH)
+        ]
+        if not ids:
+            return total
+        db.query(models.Job).filter(models.Job.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        total += len(ids)
+
+
+def count_active(db: Session, kinds: Iterable[str]) -> int:
+    return (
+        db.query(models.Job)
+        .filter(models.Job.kind.in_(list(kinds)), models.Job.status.in_([QUEUED, RUNNING]))
+        .count()
+    )
+
+
+def _finish(db: Session, job_id: str, worker: str, values: dict):
+    db.execute(
+        update(models.Job)
+        .where(models.Job.id == job_id, models.Job.locked_by == worker)
+        .values(locked_by=None, locked_until=None, **values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def complete(db: Session, job: models.Job, worker: str):
+    _finish(db, job.id, worker, {"status": SUCCEEDED, "dedup_key": None, "finished_at": datetime.utcnow(), "last_error": None})
+
+
+def fail(db: Session, job: models.Job, worker: str, exc: BaseException):
+    """
+    Re-queue with backoff, or mark failed once attempts run out (or the error is permanent).
+    """
+    error = "".join(traceback.format_exception_only(type(exc), exc)).strip()
+    if isinstance(exc, PermanentJobError) or job.attempts >= job.max_attempts:
+        _finish(db, job.id, worker, {"status": FAILED, "dedup_key": None, "finished_at": datetime.utcnow(), "last_error": error})
+        return
+    delay = backoff_delay(job.attempts - 1, base=JOB_RETRY_BASE, cap=JOB_RETRY_CAP)
+    _finish(db, job.id, worker, {
+        "status": QUEUED,
+        "run_after": datetime.utcnow() + timedelta(seconds=delay),
+        "last_error": error,
+    })
+
+
+def run(db: Session, job: models.Job, worker: str, progress_session_factory=None):
+    """
+    Run one claimed job through its handler and record the outcome.
+    Progress updates use their own session so they commit independently of
+    the handler's work.
+    """
+    fn = HANDLERS.get(job.kind)
+    if fn is None:
+        fail(db, job, worker, PermanentJobError(f"no handler for job kind {job.kind!r}"))
+        return
+
+    def progress(done: int, total: Optional[int] = None, message: Optional[str] = None):
+        if progress_session_factory is None:
+            report_progress(db, job.id, worker, done, total, message)
+            return
+        pdb = progress_session_factory()
+        try:
+            report_progress(pdb, job.id, worker, done, total, message)
+        finally:
+            pdb.close()
+
+    try:
+        fn(job.user_id, progress=progress, **(job.payload or {}))
+    except Exception as e:
+        db.rollback()
+        logger.warning("job %s (%s, user %s) attempt %d failed: %s", job.id, job.kind, job.user_id, job.attempts, e)
+        fail(db, job, worker, e)
+        return
+    complete(db, job, worker)
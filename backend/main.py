@@ -12,8 +12,13 @@ Created main to run backend code
 
 
 
+import logging
+import os
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from sqlalchemy.exc import SQLAlchemyError
 
 # backend is a package, so we use relative imports
 from .routers import (
@@ -21,13 +26,19 @@ from .routers import (
     artists,
     community,
     compare,
+    dashboard,
     demo_passport,
+    jobs,
     passport,
     playlists,
     spotify,
     users,
 )
 from . import spotify_auth  # <-- this is backend/spotify_auth.py
+from . import cache, crud, feed_hub, http_client, migrations, origin_index, scheduler, user_index
+from .db import SessionLocal, WorkerSessionLocal
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -39,13 +50,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1000"))
+UNCOMPRESSED_PATHS = ("/community/stream",)  # SSE must reach the client event by event
+
+
+class GZipExceptStreams:
+    """
+    GZip larger responses (feed pages, passports, dashboard), but leave
+    streaming endpoints alone: compressing them would buffer events.
+    """
+    def __init__(self, app, minimum_size: int = GZIP_MINIMUM_SIZE):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] not in UNCOMPRESSED_PATHS:
+            await self.gzip(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+
+app.add_middleware(GZipExceptStreams)
+
 # Register all routers, including spotify_auth
 for router in [
     admin.router,
     artists.router,
     community.router,
     compare.router,
+    dashboard.router,
     demo_passport.router,
+    jobs.router,
     passport.router,
     playlists.router,
     spotify.router,
@@ -55,6 +90,75 @@ for router in [
     app.include_router(router)
 
 
+@app.on_event("startup")
+def migrate_schema():
+    # create missing tables / add new columns and indexes to existing databases
+    migrations.upgrade()
+
+
+@app.on_event("startup")
+def map_origin_index():
+    # mmap only; pages of the artist origin index are read on demand
+    origin_index.load()
+
+
+@app.on_event("startup")
+def seed_reference_data():
+    # country -> region table used by the DB-backed passport aggregation
+    db = SessionLocal()
+    try:
+        crud.seed_country_regions(db, passport.COUNTRY_TO_REGION)
+    except SQLAlchemyError:
+        logger.exception("could not seed country_regions")
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+def start_cache_sweeper():
+    # drops expired cache entries so idle keys don't sit in memory / on disk
+    cache.start_sweeper()
+
+
+@app.on_event("startup")
+def start_periodic_jobs():
+    # every worker starts it; the DB lease makes only one of them queue jobs
+    scheduler.start_scheduler()
+
+
+@app.on_event("startup")
+def build_user_index():
+    # "users like you" index, built and refreshed in a background thread (never on a request)
+    user_index.start_background(WorkerSessionLocal)
+
+
+@app.on_event("shutdown")
+def stop_user_index():
+    user_index.stop_background()
+
+
+@app.on_event("startup")
+def start_feed_broadcast():
+    # fan-out of new community posts to /community/stream (COMMUNITY_BROADCAST=local|db)
+    feed_hub.start(community.post_event)
+
+
+@app.on_event("shutdown")
+def stop_feed_broadcast():
+    feed_hub.stop()
+
+
+@app.on_event("shutdown")
+def stop_periodic_jobs():
+    scheduler.shutdown_scheduler()
+
+
+@app.on_event("shutdown")
+async def close_http_pools():
+    # release the pooled upstream connections (Spotify, MusicBrainz)
+    await http_client.aclose_all()
+
+
 @app.get("/")
 def root():
     return {"status": "Tuniverse backend running"}
@@ -0,0 +1,132 @@
+"""
+Schema Migrations
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    The project has no Alembic setup, so upgrade() brings an existing database
+    up to models.py in place. Every step checks the live schema first, so it is
+    safe to run on every start (and from several workers at once):
+
+        1. create the tables that don't exist yet (with their indexes)
+        2. ADD COLUMN for columns added to existing tables (COLUMNS)
+        3. data fixes that must run before an index can be built (DATA_STEPS)
+        4. CREATE INDEX for indexes added to existing tables (INDEXES)
+
+    Runs at app startup and when a job worker starts; by hand:
+
+        python -m backend.migrations
+
+    New columns on existing tables go in COLUMNS, new indexes on existing
+    tables in INDEXES; brand-new tables need no entry.
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+# migrations.py - idempotent in-place schema upgrade
+import logging
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from . import models  # noqa: F401  (registers every table on Base.metadata)
+from .db import Base, engine as default_engine
+
+logger = logging.getLogger(__name__)
+
+# (table, column, column DDL) - added to tables that predate the column
+COLUMNS: List[Tuple[str, str, str]] = [
+    ("playlists", "snapshot_id", "VARCHAR"),
+    ("users", "library_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("users", "library_changed_at", "TIMESTAMP"),
+    ("users", "next_sync_at", "TIMESTAMP"),
+    ("users", "history_played_until", "TIMESTAMP"),
+    ("users", "history_backfill_before", "TIMESTAMP"),
+    ("listening_history", "artist_name", "VARCHAR"),
+    ("listening_history", "ms_played", "INTEGER"),
+    ("listening_history", "source", "VARCHAR DEFAULT 'api'"),
+    ("music_passport_summaries", "library_version", "INTEGER"),
+]
+
+# (index name, table, columns, unique)
+INDEXES: List[Tuple[str, str, Tuple[str, ...], bool]] = [
+    ("ix_users_next_sync_at", "users", ("next_sync_at",), False),
+    ("ix_users_library_changed_at", "users", ("library_changed_at",), False),
+    ("ix_music_passport_summaries_created_at", "music_passport_summaries", ("created_at",), False),
+    ("ix_jobs_finished_at", "jobs", ("finished_at",), False),
+    ("uq_listening_history_play", "listening_history", ("user_id", "played_at", "track_id"), True),
+]
+
+
+
+def _dedupe_listening_history(conn: Connection):
+    # older tables allowed the same play twice; keep one row per play so the unique index can be built
+    if "uq_listening_history_play" in _indexes(conn, "listening_history"):
+        return
+    key = "user_id IS NOT NULL AND played_at IS NOT NULL AND track_id IS NOT NULL"
+    res = conn.execute(text(
+        f"DELETE FROM listening_history WHERE {key} AND id NOT IN ("
+        f" SELECT MIN(id) FROM listening_history WHERE {key} GROUP BY user_id, played_at, track_id)"
+    ))
+    if res.rowcount:
+        logger.info("removed %d duplicate listening_history rows", res.rowcount)
+
+
+# (description, fn(connection)) - run after COLUMNS, before INDEXES
+DATA_STEPS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ("dedupe listening_history plays", _dedupe_listening_history),
+]
+
+
+def _columns(conn: Connection, table: str) -> set:
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _indexes(conn: Connection, table: str) -> set:
+    insp = inspect(conn)
+    names = {i["name"] for i in insp.get_indexes(table)}
+    names |= {u["name"] for u in insp.get_unique_constraints(table) if u.get("name")}
+    return names
+
+
+def _step(eng: Engine, what: str, fn: Callable[[Connection], None]):
+    try:
+        with eng.begin() as conn:
+            fn(conn)
+    except Exception:
+        # another worker may have applied the same step a moment ago; check it stuck
+        logger.warning("migration step failed: %s (retrying once)", what, exc_info=True)
+        with eng.begin() as conn:
+            fn(conn)
+
+
+def upgrade(eng: Engine = default_engine):
+    Base.metadata.create_all(bind=eng, checkfirst=True)
+
+    for table, column, ddl in COLUMNS:
+        def add(conn, table=table, column=column, ddl=ddl):
+            if column not in _columns(conn, table):
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+                logger.info("added column %s.%s", table, column)
+        _step(eng, f"add {table}.{column}", add)
+
+    for what, fn in DATA_STEPS:
+        _step(eng, what, fn)
+
+    for name, table, columns, unique in INDEXES:
+        def create(conn, name=name, table=table, columns=columns, unique=unique):
+            if name not in _indexes(conn, table):
+                kind = "UNIQUE INDEX" if unique else "INDEX"
+                conn.execute(text(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})"))
+                logger.info("created index %s", name)
+        _step(eng, f"index {name}", create)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    upgrade()
@@ -15,7 +15,7 @@ Change Log:
 
 # models.py - ORM models matching your pseudo-code
 import uuid
-from sqlalchemy import Column, String, Boolean, DateTime, Integer, ForeignKey, JSON, Table, Text
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, ForeignKey, JSON, Table, Text, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID, ARRAY
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -32,6 +32,11 @@ class User(Base):
     spotify_access_token = Column(Text, nullable=True)
     spotify_refresh_token = Column(Text, nullable=True)
     preferences = Column(JSON, default={})
+    library_version = Column(Integer, default=0, nullable=False)  # bumped whenever passport inputs change
+    library_changed_at = Column(DateTime, nullable=True, index=True)  # when library_version was last bumped
+    next_sync_at = Column(DateTime, nullable=True, index=True)  # scheduler's next periodic sync (spread per user)
+    history_played_until = Column(DateTime, nullable=True)  # newest recently-played item ingested (cursor high-water mark)
+    history_backfill_before = Column(DateTime, nullable=True)  # `before` cursor of an unfinished first (backward) walk
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
 
@@ -45,6 +50,7 @@ class Playlist(Base):
     spotify_playlist_id = Column(String, index=True)
     name = Column(String)
     track_count = Column(Integer, default=0)
+    snapshot_id = Column(String, nullable=True)  # Spotify's playlist version; unchanged -> skip re-sync
     last_synced_at = Column(DateTime, nullable=True)
 
     user = relationship("User", back_populates="playlists")
@@ -61,6 +67,13 @@ class Track(Base):
 
     playlist = relationship("Playlist", back_populates="tracks")
 
+class UserArtist(Base):
+    # materialised "distinct artists in a user's playlists", kept current by the sync worker
+    __tablename__ = "user_artists"
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    spotify_artist_id = Column(String, primary_key=True, index=True)
+    track_count = Column(Integer, default=0)  # tracks (in the user's playlists) featuring the artist
+
 class Artist(Base):
     __tablename__ = "artists"
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -74,11 +87,26 @@ class Artist(Base):
     confidence = Column(Integer, default=0)  # 0-100
     last_checked_at = Column(DateTime, nullable=True)
 
+class ArtistOrigin(Base):
+    # shared artist-name -> origin cache (MusicBrainz results), see origin_cache.py
+    __tablename__ = "artist_origins"
+    name_key = Column(String, primary_key=True)
+    country = Column(String, nullable=True)  # None = looked up, nothing found
+    source = Column(String, default="musicbrainz")
+    resolved_at = Column(DateTime, default=datetime.utcnow)
+
+class CountryRegion(Base):
+    # country (name or ISO code) -> region reference data, seeded at startup
+    __tablename__ = "country_regions"
+    country = Column(String, primary_key=True)
+    region = Column(String, nullable=False)
+
 class MusicPassportSummary(Base):
     __tablename__ = "music_passport_summaries"
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, ForeignKey("users.id"))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)  # user_index refreshes from new rows
+    library_version = Column(Integer, nullable=True)  # User.library_version this snapshot was built from
     country_counts = Column(JSON, default={})
     region_percentages = Column(JSON, default={})
     total_artists = Column(Integer, default=0)
@@ -95,10 +123,61 @@ class Comparison(Base):
 
 class ListeningHistory(Base):
     __tablename__ = "listening_history"
+    # one row per play; re-imports of the same play are skipped (see crud.insert_listening_history)
+    __table_args__ = (UniqueConstraint("user_id", "played_at", "track_id", name="uq_listening_history_play"),)
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, index=True)
     track_id = Column(String)
     track_name = Column(String)
     artist_id = Column(String)
+    artist_name = Column(String, nullable=True)  # exports carry names, not IDs
+    ms_played = Column(Integer, nullable=True)
+    source = Column(String, default="api")  # api | export
     played_at = Column(DateTime, nullable=True)
 
+class Job(Base):
+    # durable background job (sync / enrich / history import), run by backend/worker.py
+    __tablename__ = "jobs"
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String, nullable=False, index=True)
+    user_id = Column(String, index=True, nullable=True)
+    payload = Column(JSON, default={})
+    dedup_key = Column(String, unique=True, nullable=True)  # "<kind>:<user_id>" while queued/running, cleared when done
+    status = Column(String, default="queued", index=True)  # queued | running | succeeded | failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=5)
+    run_after = Column(DateTime, default=datetime.utcnow, index=True)  # not claimed before this (retry backoff)
+    locked_by = Column(String, nullable=True)
+    locked_until = Column(DateTime, nullable=True)  # lease; a crashed worker's job is reclaimed after it
+    progress = Column(Integer, default=0)
+    progress_total = Column(Integer, nullable=True)
+    message = Column(Text, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True, index=True)  # retention: pruned JOB_RETENTION_DAYS later
+
+class Lease(Base):
+    # named, expiring lock shared through the DB (e.g. which process runs the scheduler)
+    __tablename__ = "leases"
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+class CommunityPost(Base):
+    # community feed; read newest-first with `id` as the keyset cursor
+    __tablename__ = "community_posts"
+    id = Column(Integer, primary_key=True, autoincrement=True)  # DB-assigned, unique across workers
+    display_name = Column(String(80), nullable=False)
+    message = Column(Text, nullable=False)
+    passport_summary = Column(Text, nullable=True)  # legacy inline HTML (posts made before passport_hash); never served
+    passport_hash = Column(String(64), ForeignKey("passport_fragments.hash"), nullable=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class PassportFragment(Base):
+    # rendered passport snippet shared by community posts, stored once per distinct content
+    __tablename__ = "passport_fragments"
+    hash = Column(String(64), primary_key=True)  # sha256 of the canonical content
+    region_counts = Column(JSON, nullable=True)  # {region: artists}; None for legacy client-built HTML
+    html = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,99 @@
+"""
+Artist Origin Cache
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    Two-tier cache for artist-name -> origin country lookups:
+        1) in-process LRU (size-capped, TinyLFU admission so one big library
+           sync doesn't flush the hot names) for hot names
+        2) the shared artist_origins table, so every uvicorn worker (and every
+           host on the same database) reuses what any other worker resolved
+
+    Found and not-found results expire separately (ORIGIN_POSITIVE_TTL_DAYS /
+    ORIGIN_NEGATIVE_TTL_HOURS), so "unknown" artists get re-checked sooner.
+    Entries are keyed by artist_names.normalize_name(), so spelling/case
+    variants of one artist share an entry.
+
+        hit = origin_cache.get("Daft Punk")
+        if hit is MISS: ...look it up...; origin_cache.set("Daft Punk", "France")
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+# origin_cache.py - LRU in front of the artist_origins table
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import models
+from .artist_names import normalize_name
+from .cache import LRUCache
+from .db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+POSITIVE_TTL = timedelta(days=float(os.getenv("ORIGIN_POSITIVE_TTL_DAYS", "90")))
+NEGATIVE_TTL = timedelta(hours=float(os.getenv("ORIGIN_NEGATIVE_TTL_HOURS", "24")))
+LRU_SIZE = int(os.getenv("ORIGIN_LRU_SIZE", "20000"))
+
+MISS = object()  # "not cached" (distinct from a cached None = known unknown)
+
+
+class OriginCache:
+    def __init__(self, session_factory=SessionLocal, maxsize: int = LRU_SIZE,
+                 positive_ttl: timedelta = POSITIVE_TTL, negative_ttl: timedelta = NEGATIVE_TTL):
+        self.session_factory = session_factory
+        self.lru = LRUCache(maxsize=maxsize, policy="tinylfu", name="artist_origins")
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+
+    def _ttl(self, country: Optional[str]) -> timedelta:
+        return self.positive_ttl if country else self.negative_ttl
+
+    def get(self, name: str):
+        """
+        Cached country (or None for a cached "not found"), or MISS.
+        """
+        name = normalize_name(name)
+        hit = self.lru.get(name, MISS)
+        if hit is not MISS:
+            return hit
+        db = self.session_factory()
+        try:
+            row = db.query(models.ArtistOrigin).filter(models.ArtistOrigin.name_key == name).first()
+        except SQLAlchemyError:
+            logger.exception("origin cache read failed")
+            return MISS
+        finally:
+            db.close()
+        if row is None or row.resolved_at is None:
+            return MISS
+        remaining = row.resolved_at + self._ttl(row.country) - datetime.utcnow()
+        if remaining.total_seconds() <= 0:
+            return MISS
+        self.lru.set(name, row.country, ttl=remaining.total_seconds())
+        return row.country
+
+    def set(self, name: str, country: Optional[str], source: str = "musicbrainz"):
+        name = normalize_name(name)
+        self.lru.set(name, country, ttl=self._ttl(country).total_seconds())
+        db = self.session_factory()
+        try:
+            db.merge(models.ArtistOrigin(name_key=name, country=country, source=source, resolved_at=datetime.utcnow()))
+            db.commit()
+        except SQLAlchemyError:
+            # another worker wrote the same name first; their answer is as good as ours
+            db.rollback()
+        finally:
+            db.close()
+
+
+origin_cache = OriginCache()
@@ -0,0 +1,184 @@
+"""
+Offline Artist Origin Index
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    Read-only artist-name -> country table, so most passports resolve without
+    any outbound request. Built from a MusicBrainz dump by
+    backend/tools/build_origin_index.py.
+
+    The index file is NOT in the repository (it is generated from a
+    multi-gigabyte dump): build it once per deployment into INDEX_PATH
+    (backend/data/artist_origins.idx, or $ORIGIN_INDEX_PATH). Until it exists,
+    load() logs a warning and every lookup() misses, so passports fall back to
+    the seeds and MusicBrainz.
+
+    The file is memory-mapped on first use (only touched pages are read) and
+    looked up with a binary search over sorted, normalised names: O(log n).
+    Names are normalised with artist_names.normalize_name(); files built with
+    an older key format are rejected (rebuild them).
+
+        from .origin_index import lookup
+        lookup("Daft Punk")   # -> "France" or None
+
+    Countries are full names (countries.country_name()), the same form the
+    seeds and COUNTRY_TO_REGION use; ISO codes from older files are mapped on
+    the way out.
+
+    File layout (little-endian):
+        b"TUOIDX2\\0" | count: uint32 | offsets: (count + 1) * uint32 | records
+        record i = data[offsets[i]:offsets[i + 1]] = b"<key>\\0<country>"
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+# origin_index.py - mmap'd sorted name table with binary search
+import logging
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from typing import Iterable, Optional, Tuple
+
+from .artist_names import normalize_name
+from .countries import country_name
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = os.getenv(
+    "ORIGIN_INDEX_PATH",
+    os.path.join(os.path.dirname(__file__), "data", "artist_origins.idx"),
+)
+
+MAGIC = b"TUOIDX2\0"  # bump when normalize_key() changes
+_HEADER = struct.Struct("<8sI")
+_U32 = struct.Struct("<I")
+
+
+def normalize_key(name: str) -> str:
+    """
+    Key used both when building and when looking up the index.
+    """
+    return normalize_name(name)
+
+
+class OriginIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an artist origin index (or was built by an older version; rebuild it)")
+        self._offsets_at = _HEADER.size
+        self._data_at = self._offsets_at + (self.count + 1) * _U32.size
+
+    def __len__(self):
+        return self.count
+
+    def _record(self, i: int) -> Tuple[bytes, bytes]:
+        start = _U32.unpack_from(self._mm, self._offsets_at + i * _U32.size)[0]
+        end = _U32.unpack_from(self._mm, self._offsets_at + (i + 1) * _U32.size)[0]
+        key, _, country = self._mm[self._data_at + start:self._data_at + end].partition(b"\0")
+        return key, country
+
+    def get(self, name: str) -> Optional[str]:
+        target = normalize_key(name).encode("utf-8")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key, country = self._record(mid)
+            if key < target:
+                lo = mid + 1
+            elif key > target:
+                hi = mid
+            else:
+                return country.decode("utf-8") or None
+        return None
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+def write_sorted_index(path: str, records: Iterable[Tuple[str, str]]) -> int:
+    """
+    Write (key, country) records that are already normalised, unique and
+    sorted by key. Streams: only the offsets (4 bytes a record) are kept in
+    memory, the records go to a temp file next to `path`. Returns the count.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    offsets = array("I", [0])
+    tmp = path + ".tmp"
+    with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(path))) as data:
+        offset = 0
+        for key, country in records:
+            rec = key.encode("utf-8") + b"\0" + country.encode("utf-8")
+            data.write(rec)
+            offset += len(rec)
+            offsets.append(offset)
+        data.seek(0)
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, len(offsets) - 1))
+            if sys.byteorder != "little":
+                offsets.byteswap()
+            offsets.tofile(f)
+            shutil.copyfileobj(data, f)
+    os.replace(tmp, path)
+    return len(offsets) - 1
+
+
+def write_index(path: str, entries: Iterable[Tuple[str, str]]) -> int:
+    """
+    Write (name, country) pairs as an index file. Names are normalised and
+    de-duplicated (first entry wins). Holds the table in memory; for a full
+    dump use build_origin_index, which sorts on disk. Returns the number of records.
+    """
+    table = {}
+    for name, country in entries:
+        key = normalize_key(name)
+        if key and country and key not in table:
+            table[key] = country_name(country)
+    return write_sorted_index(path, ((k, table[k]) for k in sorted(table)))
+
+
+_index: Optional[OriginIndex] = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def load(path: str = None) -> Optional[OriginIndex]:
+    """
+    Map the index file (once). Missing file -> None (logged); lookups just miss.
+    """
+    global _index, _loaded
+    if _loaded and path is None:
+        return _index
+    with _lock:
+        if not _loaded or path is not None:
+            path = path or INDEX_PATH
+            try:
+                _index = OriginIndex(path)
+                logger.info("artist origin index: %d names from %s", len(_index), path)
+            except FileNotFoundError:
+                logger.warning("artist origin index %s not found (build it with backend.tools.build_origin_index); offline lookups disabled", path)
+                _index = None
+            except (OSError, ValueError, struct.error):
+                logger.exception("could not load artist origin index %s", path)
+                _index = None
+            _loaded = True
+    return _index
+
+
+def lookup(name: str) -> Optional[str]:
+    index = load()
+    return country_name(index.get(name)) if index is not None else None
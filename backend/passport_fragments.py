@@ -0,0 +1,134 @@
+"""
+Shared Passport Fragments
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    The "Artists by Region" snippet shown on community posts is stored once
+    per distinct content, not once per post:
+
+        h = store_regions(db, {"Europe": 12, "East Asia": 3})   # -> content hash
+        fragment_html(db, h)                                    # -> rendered HTML
+
+    Posts keep only the hash (passport_fragments.hash). The HTML is rendered
+    here from the region counts (names escaped, same markup the web UI used to
+    build), kept in an LRU, and served by GET /community/passport/{hash} with
+    immutable caching, so a browser downloads each snippet once no matter how
+    many posts show it. Identical passports share one row.
+
+    Only markup produced by render_regions() is ever served: fragment_html()
+    re-renders from the stored region_counts, and rows without them (HTML
+    that older clients sent) are not served at all. Client HTML is never
+    accepted, so nothing a user writes reaches another user's page unescaped.
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+# passport_fragments.py - dedup + server-side rendering of community passport snippets
+import hashlib
+import json
+import os
+from html import escape
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from . import crud
+from .cache import LRUCache
+
+PASSPORT_FRAGMENT_CACHE_SIZE = int(os.getenv("PASSPORT_FRAGMENT_CACHE_SIZE", "2000"))
+MAX_REGIONS = 32
+MAX_REGION_NAME = 64
+
+# same icons as REGION_ICON_MAP in web-ui/app.js (paths relative to the web UI)
+REGION_ICONS = {
+    "North America": "assets/northamerica.png",
+    "Caribbean": "assets/caribbean.png",
+    "South America": "assets/southamerica.png",
+    "Middle East": "assets/middleeast.png",
+    "South Asia": "assets/southasia.png",
+    "Southeast Asia": "assets/southeastasia.png",
+    "East Asia": "assets/eastasia.png",
+    "Africa": "assets/africa.png",
+}
+
+_fragments = LRUCache(maxsize=PASSPORT_FRAGMENT_CACHE_SIZE, name="passport_fragments")
+
+
+def _hash(kind: str, content: str) -> str:
+    return hashlib.sha256(f"{kind}\0{content}".encode("utf-8")).hexdigest()
+
+
+def canonical_regions(region_counts: Dict[str, int]) -> Dict[str, int]:
+    """
+    Positive integer counts with short region names (so equal passports hash equally).
+    """
+    out: Dict[str, int] = {}
+    for region, count in (region_counts or {}).items():
+        name = str(region).strip()[:MAX_REGION_NAME] or "Unknown"
+        try:
+            n = int(count)
+        except (TypeError, ValueError):
+            continue
+        if n > 0:
+            out[name] = out.get(name, 0) + n
+    if len(out) > MAX_REGIONS:
+        out = dict(sorted(out.items(), key=lambda kv: -kv[1])[:MAX_REGIONS])
+    return out
+
+
+def render_regions(region_counts: Dict[str, int]) -> str:
+    """
+    HTML for the community post "Artists by Region" block, largest region first, Unknown last.
+    """
+    total = sum(region_counts.values())
+    chunks = []
+    for region, count in sorted(region_counts.items(), key=lambda kv: (kv[0] == "Unknown", -kv[1], kv[0])):
+        pct = f"{count / total * 100:.1f}" if total else "0.0"
+        name = escape(region)
+        icon = REGION_ICONS.get(region)
+        icon_html = f'<img src="{icon}" alt="{name}" class="region-icon-inline" />' if icon else ""
+        chunks.append(
+            '<div class="artists-country-group">'
+            f'<div class="artists-country-title">{icon_html}<span class="region-name">{name}</span></div>'
+            f'<ul class="artists-country-list"><li>{count} artist(s) – {pct}% of your passport</li></ul>'
+            "</div>"
+        )
+    return "".join(chunks)
+
+
+def store_regions(db: Session, region_counts: Dict[str, int]) -> Optional[str]:
+    """
+    Render and store (if new) the fragment for these region counts; returns its hash.
+    """
+    counts = canonical_regions(region_counts)
+    if not counts:
+        return None
+    h = _hash("regions", json.dumps(sorted(counts.items()), separators=(",", ":")))
+    if _fragments.get(h) is None:
+        html = render_regions(counts)
+        crud.save_passport_fragment(db, h, html, counts)
+        _fragments.set(h, html)
+    return h
+
+
+def fragment_html(db: Session, content_hash: str) -> Optional[str]:
+    """
+    Server-rendered HTML for a stored fragment, or None (unknown hash, or a
+    legacy row holding client HTML instead of region counts).
+    """
+    html = _fragments.get(content_hash)
+    if html is None:
+        row = crud.get_passport_fragment(db, content_hash)
+        if row is None or not row.region_counts:
+            return None
+        counts = canonical_regions(row.region_counts)
+        if not counts:
+            return None
+        html = render_regions(counts)
+        _fragments.set(content_hash, html)
+    return html
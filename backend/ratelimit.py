@@ -0,0 +1,186 @@
+"""
+Rate Limiting / Request Scheduling
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    Token-bucket budgeting for outbound API calls (Spotify, MusicBrainz).
+        • TokenBucket          – classic refill-per-second bucket
+        • RequestScheduler     – one global bucket + one bucket per key (user),
+                                 priority ordering and a global pause for 429s
+        • backoff_delay()      – jittered exponential backoff
+
+    Callers block in acquire() (threads) or await aacquire() (asyncio) before
+    each request. While a higher-priority caller is waiting for the global
+    bucket, lower-priority callers yield, so interactive endpoints pre-empt
+    bulk sync. A caller held back only by its own per-user bucket does not
+    make anyone else wait.
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+# ratelimit.py - token buckets + priority scheduler shared by sync and async callers
+import asyncio
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Optional, Tuple
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+# how long a waiter sleeps at most before re-checking (so priorities are honoured quickly)
+_POLL_INTERVAL = 0.05
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """
+    "Full jitter" exponential backoff: uniform(0, min(cap, base * 2**attempt)).
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """
+    Refills `rate` tokens per second up to `capacity`. Not locked on its own;
+    RequestScheduler guards it.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """
+        Seconds until one token is available (0 if one is available now).
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class RequestScheduler:
+    """
+    Global + per-key token buckets with priority ordering.
+
+    acquire(key, priority) returns once a request may be sent. Lower priority
+    numbers win: a caller only takes a global token when nobody with a more
+    urgent priority is contending for one (i.e. has its key token and is
+    waiting on the global bucket or a pause). pause(seconds) stops everyone
+    (used for 429 Retry-After).
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        per_key_rate: Optional[float] = None,
+        per_key_burst: Optional[float] = None,
+        max_keys: int = 10000,
+    ):
+        self._lock = threading.Lock()
+        self._global = TokenBucket(rate, burst)
+        self._per_key_rate = per_key_rate
+        self._per_key_burst = per_key_burst or per_key_rate
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._max_keys = max_keys
+        self._contending: Counter = Counter()  # priority -> callers waiting on the global bucket
+        self._paused_until = 0.0
+
+    def _key_bucket(self, key: Optional[str]) -> Optional[TokenBucket]:
+        if key is None or not self._per_key_rate:
+            return None
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self._per_key_rate, self._per_key_burst)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _mark(self, priority: int, was: bool, now: bool) -> bool:
+        # caller holds self._lock
+        if now and not was:
+            self._contending[priority] += 1
+        elif was and not now:
+            self._contending[priority] -= 1
+            if self._contending[priority] <= 0:
+                del self._contending[priority]
+        return now
+
+    def _try_acquire(self, key: Optional[str], priority: int, contending: bool) -> Tuple[float, bool]:
+        """
+        Take a token if allowed. Returns (0, False) on success, else (seconds
+        to wait, whether the caller is now contending for the global bucket).
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return min(self._paused_until - now, 1.0), self._mark(priority, contending, True)
+            bucket = self._key_bucket(key)
+            key_wait = bucket.wait_time(now) if bucket is not None else 0.0
+            if key_wait > 0:
+                # blocked on its own bucket: nobody else should yield to it
+                return min(key_wait, _POLL_INTERVAL), self._mark(priority, contending, False)
+            if any(p < priority for p in self._contending):
+                return _POLL_INTERVAL, self._mark(priority, contending, True)
+            wait = self._global.wait_time(now)
+            if wait > 0:
+                return min(wait, _POLL_INTERVAL), self._mark(priority, contending, True)
+            self._global.take(now)
+            if bucket is not None:
+                bucket.take(now)
+            return 0.0, self._mark(priority, contending, False)
+
+    def _give_up(self, priority: int, contending: bool):
+        if contending:
+            with self._lock:
+                self._mark(priority, True, False)
+
+    def acquire(self, key: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE):
+        contending = False
+        try:
+            while True:
+                wait, contending = self._try_acquire(key, priority, contending)
+                if wait == 0:
+                    return
+                time.sleep(wait)
+        finally:
+            self._give_up(priority, contending)
+
+    async def aacquire(self, key: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE):
+        contending = False
+        try:
+            while True:
+                wait, contending = self._try_acquire(key, priority, contending)
+                if wait == 0:
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            self._give_up(priority, contending)
+
+    def pause(self, seconds: float):
+        """
+        Block every caller for `seconds` (e.g. after a 429 with Retry-After).
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
@@ -0,0 +1,180 @@
+"""
+Spotify Passthrough Response Cache
+@Author: Tuniverse Team
+@Version: 1.2
+@Since: 10/17/2026
+
+Usage:
+    Short-TTL, per-token cache for the live /spotify/* passthrough endpoints
+    the web UI polls. Entries are keyed by endpoint + a digest of the access
+    token (+ params), so users never see each other's data.
+        • fresh (age < ttl)            -> served from memory
+        • stale (age < ttl + stale)    -> served from memory, refreshed in the
+                                          background (stale-while-revalidate)
+        • missing / too old            -> fetched; concurrent identical
+                                          requests share one upstream call
+
+    TTLs are configurable per endpoint with env vars (seconds), e.g.
+    CACHE_TTL_CURRENTLY_PLAYING=5, CACHE_TTL_TOP_ARTISTS=600.
+
+        data = response_cache.get_or_fetch(
+            token_key("top-artists", token, limit, offset),
+            lambda: fetch_top_artists(...),
+            ttl=TTL["top_artists"],
+        )
+
+    Async handlers use aget_or_fetch() with a coroutine factory instead; the
+    upstream call and background refreshes then run on the event loop.
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+    Version 1.1 (10/17/2026): Store is pluggable (cache.build_cache)
+    Version 1.2 (10/17/2026): aget_or_fetch() for async route handlers
+"""
+
+
+
+# response_cache.py - per-token TTL cache with coalescing + stale-while-revalidate
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .cache import SingleFlight, build_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _env_ttl(name: str, default: float) -> float:
+    return float(os.getenv(f"CACHE_TTL_{name.upper()}", str(default)))
+
+
+# seconds an entry is fresh, per endpoint
+TTL = {
+    "currently_playing": _env_ttl("currently_playing", 5),
+    "me": _env_ttl("me", 30),
+    "dashboard": _env_ttl("dashboard", 30),
+    "playlists": _env_ttl("playlists", 120),
+    "top_artists": _env_ttl("top_artists", 600),
+}
+# how long past its TTL an entry may still be served while it is refreshed
+STALE_FACTOR = float(os.getenv("CACHE_STALE_FACTOR", "2"))
+
+
+def token_key(endpoint: str, access_token: str, *parts: Any) -> str:
+    digest = hashlib.sha256((access_token or "").encode()).hexdigest()[:24]
+    return ":".join([endpoint, digest] + [str(p) for p in parts])
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = 10000, refresh_workers: int = 4, store=None):
+        # CACHE_BACKEND=sqlite/tiered shares entries between uvicorn workers
+        self.lru = store if store is not None else build_cache("spotify_responses", maxsize=maxsize)
+        self.flight = SingleFlight()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="cache-refresh")
+        # (loop id, key) -> task fetching it; async twin of self.flight
+        self._ainflight: Dict[Tuple[int, str], asyncio.Task] = {}
+        self._background = set()
+
+    def _store(self, key: str, fetch: Callable[[], Any], ttl: float, stale: float):
+        value = fetch()
+        now = time.time()
+        self.lru.set(key, (value, now + ttl), ttl=ttl + stale)
+        return value
+
+    def _refresh(self, key: str, fetch: Callable[[], Any], ttl: float, stale: float):
+        try:
+            self.flight.do(key, self._store, key, fetch, ttl, stale)
+        except Exception:
+            # keep serving the stale copy; the next miss will surface the error
+            logger.info("background refresh of %s failed", key.split(":")[0], exc_info=True)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any], ttl: float, stale: Optional[float] = None):
+        """
+        Cached value for key, calling fetch() when needed. Exceptions raised by
+        fetch() are not cached and reach every coalesced caller.
+        """
+        stale = ttl * STALE_FACTOR if stale is None else stale
+        entry = self.lru.get(key)
+        if entry is not None:
+            value, fresh_until = entry
+            if time.time() < fresh_until:
+                return value
+            with self._lock:
+                start = key not in self._refreshing
+                self._refreshing.add(key)
+            if start:
+                self._pool.submit(self._refresh, key, fetch, ttl, stale)
+            return value
+        return self.flight.do(key, self._store, key, fetch, ttl, stale)
+
+    async def _astore(self, key: str, fetch: Callable[[], Awaitable[Any]], ttl: float, stale: float):
+        value = await fetch()
+        await self.lru.aset(key, (value, time.time() + ttl), ttl=ttl + stale)
+        return value
+
+    async def _acoalesced(self, key: str, fetch: Callable[[], Awaitable[Any]], ttl: float, stale: float):
+        # the fetch runs as its own task, so a caller that disconnects doesn't
+        # cancel it for everyone else waiting on the same key
+        loop = asyncio.get_running_loop()
+        slot = (id(loop), key)
+        task = self._ainflight.get(slot)
+        if task is None:
+            task = loop.create_task(self._astore(key, fetch, ttl, stale))
+            self._ainflight[slot] = task
+
+            def _done(t, slot=slot):
+                self._ainflight.pop(slot, None)
+                if not t.cancelled():
+                    t.exception()  # retrieved here so an orphaned failure isn't logged as unhandled
+
+            task.add_done_callback(_done)
+        return await asyncio.shield(task)
+
+    async def _arefresh(self, key: str, fetch: Callable[[], Awaitable[Any]], ttl: float, stale: float):
+        try:
+            await self._acoalesced(key, fetch, ttl, stale)
+        except Exception:
+            logger.info("background refresh of %s failed", key.split(":")[0], exc_info=True)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def aget_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]], ttl: float, stale: Optional[float] = None):
+        """
+        get_or_fetch() for async code: fetch is called with no arguments and
+        must return an awaitable.
+        """
+        stale = ttl * STALE_FACTOR if stale is None else stale
+        entry = await self.lru.aget(key)
+        if entry is not None:
+            value, fresh_until = entry
+            if time.time() < fresh_until:
+                return value
+            with self._lock:
+                start = key not in self._refreshing
+                self._refreshing.add(key)
+            if start:
+                self._spawn_refresh(key, fetch, ttl, stale)
+            return value
+        return await self._acoalesced(key, fetch, ttl, stale)
+
+    def _spawn_refresh(self, key, fetch, ttl, stale):
+        task = asyncio.get_running_loop().create_task(self._arefresh(key, fetch, ttl, stale))
+        self._background.add(task)  # keep a reference until it finishes
+        task.add_done_callback(self._background.discard)
+
+    def invalidate(self, key: str):
+        self.lru.delete(key)
+
+
+response_cache = ResponseCache(maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "10000")))
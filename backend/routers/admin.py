@@ -15,8 +15,9 @@ Change Log:
 # routers/admin.py - admin utilities
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from ..db import get_db
-from .. import models
+from ..db import get_db, pool_status
+from .. import feed_hub, models, user_index
+from ..cache import all_stats
 import os
 from typing import Dict
 
@@ -27,16 +28,19 @@ def system_status(db: Session = Depends(get_db)):
     user_count = db.query(models.User).count()
     artist_count = db.query(models.Artist).count()
     playlist_count = db.query(models.Playlist).count()
-    return {"users": user_count, "artists": artist_count, "playlists": playlist_count}
+    return {"users": user_count, "artists": artist_count, "playlists": playlist_count, "caches": all_stats(), "db_pools": pool_status(), "user_index": user_index.stats(), "community_stream": feed_hub.hub.stats()}
 
 @router.delete("/user/{user_id}")
 def purge_user(user_id: str, db: Session = Depends(get_db)):
     # caution: deletes data; permission checks omitted in skeleton
     db.query(models.ListeningHistory).filter(models.ListeningHistory.user_id == user_id).delete()
+    db.query(models.UserArtist).filter(models.UserArtist.user_id == user_id).delete()
+    db.query(models.Job).filter(models.Job.user_id == user_id).delete()
     db.query(models.Playlist).filter(models.Playlist.user_id == user_id).delete()
     db.query(models.MusicPassportSummary).filter(models.MusicPassportSummary.user_id == user_id).delete()
     db.query(models.User).filter(models.User.id == user_id).delete()
     db.commit()
+    user_index.remove_user(user_id)
     return {"status": "deleted", "user_id": user_id}
 
 
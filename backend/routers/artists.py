@@ -1,6 +1,6 @@
 """
 @Author: Tyler Tristan
-@Version: 1.0
+@Version: 1.1
 @Since: 10/03/2025
 
 Usage:
@@ -8,71 +8,134 @@ Usage:
 
 Change Log:
     Version 1.0 (10/03/2025): Implemented artist enrichment and artist listing endpoints.
+    Version 1.1 (10/17/2026): Enrichment runs as a durable job (backend/jobs.py).
 """
 
 
 
 # routers/artists.py - enrichment & artist endpoints
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from ..db import get_db
-from .. import crud, spotify_client, utils
+from ..db import get_db, WorkerSessionLocal
+from .. import crud, jobs, spotify_client, utils
 from .. import models
+from ..countries import country_name
+from ..spotify_client import PRIORITY_BULK
+from datetime import datetime
+from typing import List, Optional
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+ARTIST_BATCH_SIZE = 50  # Spotify's max for GET /artists?ids=
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "4"))
 
 router = APIRouter()
 
 @router.post("/enrich/{user_id}")
-def enrich_artists(user_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def enrich_artists(user_id: str, db: Session = Depends(get_db)):
+    """
+    Enrich all artists referenced by a user's playlists (queued as a job; poll /jobs/{job_id}).
+    """
+    job, created = jobs.enqueue(db, "enrich", user_id)
+    return {"status": "enrich scheduled" if created else "enrich already scheduled", "job_id": job.id}
+
+@jobs.handler("enrich")
+def _enrich_worker(user_id: str, progress=None, artist_ids: Optional[List[str]] = None):
     """
-    Enrich all artists referenced by a user's playlists.
+    Job handler: refresh artist metadata with the user's token. The scheduler
+    passes `artist_ids` (stale artists only); otherwise all of the user's artists.
     """
-    background_tasks.add_task(_enrich_worker, user_id)
-    return {"status": "enrich scheduled"}
+    db = WorkerSessionLocal()
+    try:
+        # unique artist IDs from the user's playlists (materialised by the sync worker)
+        artist_ids = artist_ids or crud.get_user_artist_ids(db, user_id)
+        user = db.query(models.User).filter(models.User.id == user_id).first()
+        token = user.spotify_access_token if user else None
+        if not artist_ids or not token:
+            return
+
+        # GET /artists?ids=... takes up to 50 IDs; ENRICH_CONCURRENCY batches run concurrently
+        # (within the rate budget) per round, and each round is saved and reported before the
+        # next, so the job's lease is extended as it goes and a retry doesn't redo finished rounds
+        batches = list(utils.chunked(sorted(artist_ids), ARTIST_BATCH_SIZE))
+        done = updated = failed = 0
+        first_error = None
+        for round_batches in utils.chunked(batches, ENRICH_CONCURRENCY):
+            calls = [("/artists", {"ids": ",".join(batch)}) for batch in round_batches]
+            responses = spotify_client.spotify_get_many(
+                calls, token, concurrency=ENRICH_CONCURRENCY, priority=PRIORITY_BULK, user_key=user_id
+            )
+            rows = []
+            missing = []
+            checked_at = datetime.utcnow()
+            for batch, aresp in zip(round_batches, responses):
+                done += len(batch)
+                if not aresp or "error" in aresp:
+                    logger.warning("enrich %s: batch of %d artists failed: %s", user_id, len(batch), aresp)
+                    failed += 1
+                    first_error = first_error or aresp
+                    continue
+                for sid, artist in zip(batch, aresp.get("artists") or []):
+                    if artist:
+                        rows.append(_artist_row(artist, checked_at))
+                    else:
+                        missing.append(sid)  # unknown IDs come back as null
+            if missing:
+                # checked, nothing to update: keeps them off the scheduler's stale list
+                crud.mark_artists_checked(db, missing, checked_at)
+            changed = crud.bulk_upsert_artists(db, rows)
+            if changed:
+                # origins changed -> every passport containing these artists is stale
+                crud.bump_library_versions_for_artists(db, changed)
+            db.commit()
+            updated += len(changed)
+            if progress:
+                progress(done, len(artist_ids), f"{updated} artists updated")
+        if failed == len(batches):
+            raise jobs.upstream_error("enrich: every /artists batch failed", first_error)
+    finally:
+        db.close()
 
-def _enrich_worker(user_id: str):
-    db = next(get_db())
-    # find unique artist IDs from tracks
-    artist_ids = set()
-    tracks = db.query(models.Track).join(models.Playlist).filter(models.Playlist.user_id == user_id).all()
-    for t in tracks:
-        for aid in (t.artist_ids or []):
-            artist_ids.add(aid)
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    token = user.spotify_access_token if user else None
-    for aid in artist_ids:
-        # get from spotify
-        aresp = spotify_client.spotify_get(f"/artists/{aid}", token)
-        if not aresp or "error" in aresp:
-            # fallback to MusicBrainz by name (if we had name)
-            continue
-        name = aresp.get("name")
-        genres = aresp.get("genres", [])
-        popularity = aresp.get("popularity")
-        origin_country = aresp.get("country")  # spotify often doesn't include
-        # fallback:
-        if not origin_country:
-            mb = utils.musicbrainz_lookup_artist(name)
-            if mb:
-                origin_country = mb.get("country")
-                coords = {"lat": mb.get("lat"), "lon": mb.get("lon")} if mb.get("lat") else None
-                confidence = 80
-            else:
-                coords = None
-                confidence = 20
+def _artist_row(aresp: dict, checked_at: datetime) -> dict:
+    """
+    Map one Spotify artist object to Artist column values (with origin fallback).
+    """
+    name = aresp.get("name")
+    origin_country = country_name(aresp.get("country"))  # spotify often doesn't include
+    # fallback:
+    if not origin_country:
+        mb = utils.musicbrainz_lookup_artist(name or "")
+        if mb:
+            origin_country = mb.get("country")
+            coords = {"lat": mb.get("lat"), "lon": mb.get("lon")} if mb.get("lat") else None
+            confidence = 80
         else:
-            coords = utils.geocode_country(origin_country)
-            confidence = 90
-        crud.upsert_artist(db, aid, name, genres=genres, popularity=popularity, origin_country=origin_country, coordinates=coords, confidence=confidence)
-    db.close()
+            coords = None
+            confidence = 20
+    else:
+        coords = utils.geocode_country(origin_country)
+        confidence = 90
+    return {
+        "spotify_artist_id": aresp.get("id"),
+        "name": name,
+        "genres": aresp.get("genres", []),
+        "popularity": aresp.get("popularity"),
+        "origin_country": origin_country,
+        "coordinates": coords,
+        "confidence": confidence,
+        "last_checked_at": checked_at,
+    }
 
 @router.get("/for_user/{user_id}")
 def list_user_artists(user_id: str, db: Session = Depends(get_db)):
     # return artist list mapped to user's tracks
-    tracks = db.query(models.Track).join(models.Playlist).filter(models.Playlist.user_id == user_id).all()
-    artist_ids = set()
-    for t in tracks:
-        for a in (t.artist_ids or []):
-            artist_ids.add(a)
-    artists = db.query(models.Artist).filter(models.Artist.spotify_artist_id.in_(list(artist_ids))).all() if artist_ids else []
+    artists = (
+        db.query(models.Artist)
+          .join(models.UserArtist, models.UserArtist.spotify_artist_id == models.Artist.spotify_artist_id)
+          .filter(models.UserArtist.user_id == user_id)
+          .all()
+    )
     return [{"spotify_artist_id": a.spotify_artist_id, "name": a.name, "origin_country": a.origin_country, "coordinates": a.coordinates, "confidence": a.confidence} for a in artists]
 
@@ -1,34 +1,81 @@
 """
 @Author: Tyler Tristan
-@Version: 1.0
+@Version: 1.3
 @Since: 10/3/2025
 
 Usage:
     Community router for Tuniverse backend.
     Provides endpoints for:
         • Accepting community posts shared from the web UI
-        • Storing posts in an in-memory feed (newest first)
-        • Returning the community feed to clients
+        • Storing posts in the community_posts table (IDs assigned by the DB)
+        • Passport snippets: a post sends passport_id (a stored passport) or
+          passport_regions ({region: artists}); the server renders the
+          "Artists by Region" HTML once per distinct content
+          (backend/passport_fragments.py) and the post keeps only its hash.
+          Clients fetch it from GET /community/passport/{hash} (immutable,
+          cached by the browser, gzip-compressed like every larger response,
+          nosniff + a locked-down Content-Security-Policy). Client-built HTML
+          is never accepted or served: a passport_summary field in a post is
+          ignored, and posts stored with one are returned without it.
+        • Returning the community feed to clients, newest first, one page at a time:
+              GET /community/feed?limit=20                 -> {posts, next_before}
+              GET /community/feed?before=<next_before>     -> the page after that
+        • Pushing new posts as they are shared (Server-Sent Events):
+              GET /community/stream?after=<newest id shown>
+          events: "post" (a CommunityPostOut, SSE id = post id) and "resync"
+          (the client fell behind: reload the feed, then reconnect). On
+          reconnect the browser sends Last-Event-ID and missed posts are
+          replayed first. Fan-out and cross-worker delivery: backend/feed_hub.py.
+
+    The newest COMMUNITY_FEED_CACHE_SIZE posts are kept in a ring buffer
+    (FeedCache), so the first pages are served from memory; older pages walk
+    the primary-key index from the cursor. Either way a read touches at most
+    `limit` rows, however long the feed gets.
 
 Change Log:
     Version 1.0 (10/3/2025): Implemented basic in-memory community feed
                               with /share and /feed endpoints.
+    Version 1.1 (10/17/2026): Feed persisted in the DB with keyset pagination
+                              (?before=&limit=) and a ring-buffer cache of the
+                              newest posts.
+    Version 1.2 (10/17/2026): GET /stream pushes new posts over SSE.
+    Version 1.3 (10/17/2026): Posts reference a deduplicated, server-rendered
+                              passport fragment by hash (GET /passport/{hash})
+                              instead of carrying client HTML.
 """
 
 
 # backend/routers/community.py
 
-from datetime import datetime, timezone
-from typing import List, Optional
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from datetime import timezone
+from itertools import islice
+from typing import Deque, Dict, List, Optional
 
-from fastapi import APIRouter, Header
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+
+from .. import crud, feed_hub, models, passport_fragments
+from ..db import SessionLocal, get_db
+from . import passport
 
 router = APIRouter(
     prefix="/community",
     tags=["community"],
 )
 
+COMMUNITY_FEED_CACHE_SIZE = int(os.getenv("COMMUNITY_FEED_CACHE_SIZE", "200"))
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE = 100
+STREAM_KEEPALIVE_SECONDS = 15  # comment line so proxies don't close an idle stream
+STREAM_RETRY_MS = 3000  # browser reconnect delay
+
 
 class CommunityPostIn(BaseModel):
     """
@@ -38,58 +85,251 @@ class CommunityPostIn(BaseModel):
         {
             display_name: string,
             message: string,
-            passport_summary: string (can contain HTML)
+            passport_regions: {region: artist count}   (or passport_id: stored passport)
         }
+
+    passport_summary (client-built HTML from older web UI builds) is ignored.
     """
     display_name: str = Field(..., max_length=80)
     message: str = Field(..., max_length=500)
-    passport_summary: Optional[str] = Field(None, max_length=4000)
+    passport_id: Optional[str] = Field(None, max_length=64)
+    passport_regions: Optional[Dict[str, int]] = None
 
 
-class CommunityPostOut(CommunityPostIn):
+class CommunityPostOut(BaseModel):
     """
-    What we return to the client and store in memory.
+    What we return to the client (and keep in the feed cache).
+    passport_hash -> GET /community/passport/{hash}.
     """
     id: int
+    display_name: str
+    message: str
+    passport_hash: Optional[str] = None
     created_at: str
 
 
-# super simple in-memory store (fine for the class project)
-COMMUNITY_FEED: List[CommunityPostOut] = []
+class CommunityFeedOut(BaseModel):
+    """
+    One page of the feed; pass next_before as ?before= to get the next (older) page.
+    """
+    posts: List[CommunityPostOut]
+    next_before: Optional[int] = None
+
+
+def _post_out(row: models.CommunityPost) -> CommunityPostOut:
+    return CommunityPostOut(
+        id=row.id,
+        display_name=row.display_name,
+        message=row.message,
+        passport_hash=row.passport_hash,
+        created_at=row.created_at.replace(tzinfo=timezone.utc).isoformat(),
+    )
+
+
+class FeedCache:
+    """
+    The newest posts, newest first, in a bounded deque: adding a post is O(1)
+    and the oldest one falls off the end. Always a contiguous run of the feed
+    (refreshed from the DB, never patched by hand), so any page that starts
+    inside it can be answered from memory.
+    """
+    def __init__(self, size: int):
+        self.posts: Deque[CommunityPostOut] = deque(maxlen=size)
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.complete = False  # the whole feed fits in the cache
+
+    def refresh(self, db: Session):
+        """
+        Pull in posts newer than the cached head (other workers write too).
+        One bounded index range scan.
+        """
+        size = self.posts.maxlen
+        with self.lock:
+            head = self.posts[0].id if self.posts else None
+            rows = crud.community_posts(db, limit=size, after=head)
+            if not self.loaded or len(rows) >= size:
+                # first load, or so many new posts that the old run isn't contiguous any more
+                self.posts.clear()
+                self.posts.extend(_post_out(r) for r in rows)
+                self.complete = not self.loaded and len(rows) < size
+                self.loaded = True
+                return
+            for row in reversed(rows):
+                if len(self.posts) == size:
+                    self.complete = False
+                self.posts.appendleft(_post_out(row))
+
+    def page(self, before: Optional[int], limit: int) -> Optional[List[CommunityPostOut]]:
+        """
+        The page from the cache, or None if it runs past what the cache holds.
+        """
+        with self.lock:
+            if not self.loaded:
+                return None
+            start = 0
+            if before is not None:
+                start = next((i for i, p in enumerate(self.posts) if p.id < before), len(self.posts))
+            posts = list(islice(self.posts, start, start + limit))
+            if len(posts) < limit and not self.complete:
+                return None
+            return posts
+
+
+_feed_cache = FeedCache(COMMUNITY_FEED_CACHE_SIZE)
+
+
+def _summary_regions(summary: models.MusicPassportSummary) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for country, n in (summary.country_counts or {}).items():
+        region = passport.region_of(country) or "Unknown"
+        counts[region] = counts.get(region, 0) + int(n or 0)
+    return counts
+
+
+def _passport_hash(db: Session, post: CommunityPostIn) -> Optional[str]:
+    if post.passport_id:
+        summary = db.query(models.MusicPassportSummary).filter(models.MusicPassportSummary.id == post.passport_id).first()
+        if summary is None:
+            raise HTTPException(status_code=404, detail="Passport not found")
+        return passport_fragments.store_regions(db, _summary_regions(summary))
+    if post.passport_regions:
+        return passport_fragments.store_regions(db, post.passport_regions)
+    return None
 
 
-@router.post("/share", response_model=CommunityPostOut)
-async def share_post(
+@router.post("/share", response_model=CommunityPostOut, response_model_exclude_none=True)
+def share_post(
     post: CommunityPostIn,
     x_app_token: Optional[str] = Header(default=None, alias="X-App-Token"),
+    db: Session = Depends(get_db),
 ):
     """
-    Accept a post from the UI and stash it in memory.
+    Accept a post from the UI and store it.
     X-App-Token is accepted but not enforced for now.
     """
     display_name = (post.display_name or "").strip() or "Anonymous traveler"
     message = (post.message or "").strip()
-    passport_summary = post.passport_summary or ""
 
     if not message:
         message = "[empty message]"
 
-    created_at = datetime.now(timezone.utc).isoformat()
-    new_post = CommunityPostOut(
-        id=len(COMMUNITY_FEED) + 1,
-        display_name=display_name,
-        message=message,
-        passport_summary=passport_summary,
-        created_at=created_at,
-    )
+    row = crud.create_community_post(db, display_name, message, _passport_hash(db, post))
+    _feed_cache.refresh(db)
+    out = _post_out(row)
+    feed_hub.publish(out.dict(exclude_none=True))
+    return out
+
+
+@router.get("/feed", response_model=CommunityFeedOut, response_model_exclude_none=True)
+def get_feed(
+    before: Optional[int] = Query(None, ge=1, description="return posts older than this id (next_before of the previous page)"),
+    limit: int = Query(FEED_PAGE_SIZE, ge=1, le=FEED_MAX_PAGE),
+    db: Session = Depends(get_db),
+):
+    """
+    Return one page of the community feed, newest-first.
+    """
+    if before is None or not _feed_cache.loaded:
+        _feed_cache.refresh(db)
+    posts = _feed_cache.page(before, limit)
+    if posts is None:
+        posts = [_post_out(r) for r in crud.community_posts(db, before=before, limit=limit)]
+    next_before = posts[-1].id if len(posts) == limit else None
+    return CommunityFeedOut(posts=posts, next_before=next_before)
+
+
+def post_event(row: models.CommunityPost) -> dict:
+    # what stream subscribers receive for a stored post (used by feed_hub's DB poller)
+    return _post_out(row).dict(exclude_none=True)
+
+
+def _posts_after(after: int) -> Optional[List[dict]]:
+    # posts newer than `after`, oldest first; None if too many were missed to replay
+    db = SessionLocal()
+    try:
+        rows = crud.community_posts(db, after=after, limit=COMMUNITY_FEED_CACHE_SIZE)
+    finally:
+        db.close()
+    if len(rows) >= COMMUNITY_FEED_CACHE_SIZE:
+        return None
+    return [post_event(r) for r in reversed(rows)]
 
-    COMMUNITY_FEED.insert(0, new_post)
-    return new_post
 
+def _sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: post\ndata: {json.dumps(event)}\n\n"
 
-@router.get("/feed", response_model=List[CommunityPostOut])
-async def get_feed():
+
+async def _event_stream(request: Request, sub: feed_hub.Subscriber, resume: Optional[int]):
+    replayed = set()
+    try:
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        if resume is not None:
+            missed = await asyncio.to_thread(_posts_after, resume)
+            if missed is None:
+                yield "event: resync\ndata: {}\n\n"
+                return
+            for event in missed:
+                replayed.add(event["id"])
+                yield _sse(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+                continue
+            if event is feed_hub.DROPPED:
+                yield "event: resync\ndata: {}\n\n"
+                return
+            if event["id"] in replayed:
+                continue  # published while we were replaying
+            yield _sse(event)
+    finally:
+        feed_hub.hub.unsubscribe(sub)
+
+
+@router.get("/stream")
+async def stream_feed(
+    request: Request,
+    after: Optional[int] = Query(None, ge=0, description="replay posts newer than this id first"),
+    last_event_id: Optional[str] = Header(default=None, alias="Last-Event-ID"),
+):
+    """
+    Server-Sent Events stream of new posts (see module docstring).
+    """
+    resume = int(last_event_id) if last_event_id and last_event_id.isdigit() else after
+    sub = feed_hub.hub.subscribe()  # before replaying, so nothing falls in between
+    if sub is None:
+        raise HTTPException(status_code=503, detail="Too many feed subscribers; poll /community/feed instead")
+    return StreamingResponse(
+        _event_stream(request, sub, resume),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/passport/{content_hash}")
+def get_passport_fragment(
+    content_hash: str,
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match"),
+    db: Session = Depends(get_db),
+):
     """
-    Return the community feed, newest-first.
+    Rendered passport snippet for a post. Content-addressed, so it never changes.
     """
-    return COMMUNITY_FEED
+    etag = f'"{content_hash}"'
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": etag,
+        "X-Content-Type-Options": "nosniff",
+        # opened directly, the snippet runs nothing and loads only our own icons
+        "Content-Security-Policy": "default-src 'none'; img-src 'self'; sandbox; frame-ancestors 'none'",
+    }
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    html = passport_fragments.fragment_html(db, content_hash) if len(content_hash) == 64 else None
+    if html is None:
+        raise HTTPException(status_code=404, detail="Passport fragment not found")
+    return Response(content=html, media_type="text/html; charset=utf-8", headers=headers)
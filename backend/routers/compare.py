@@ -1,6 +1,6 @@
 """
 @Author: Umaiza Azmat
-@Version: 1.0
+@Version: 1.1
 @Since: 10/3/2025
 
 Usage:
@@ -8,15 +8,21 @@ Usage:
 
 Change Log:
     Version 1.0 (10/3/2025): Added comparison endpoint with overlap calculations.
+    Version 1.1 (10/17/2026): One-query, vectorised comparisons (backend/similarity.py):
+                              jaccard / cosine / genre / country similarity, POST /compare/group.
+                              GET /compare/similar/{user_id}: nearest users from the LSH
+                              index (backend/user_index.py). This router has no prefix (the
+                              original /with/{user_id} stays where clients expect it), so new
+                              routes carry /compare in their own path.
 """
 
 
 
 # routers/compare.py - community comparisons
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from ..db import get_db
-from .. import models, crud
+from .. import models, similarity, user_index
 from typing import List
 
 router = APIRouter()
@@ -27,25 +33,47 @@ def compare_with(user_id: str, friend_ids: List[str], db: Session = Depends(get_
     Compare user's artist distribution with friends
     """
     # privacy checks omitted for brevity
-    def get_artist_set(uid):
-        tracks = db.query(models.Track).join(models.Playlist).filter(models.Playlist.user_id == uid).all()
-        s = set()
-        for t in tracks:
-            for a in (t.artist_ids or []):
-                s.add(a)
-        return s
-
-    base = get_artist_set(user_id)
-    results = {"user_count": len(base), "comparisons": {}}
-    for fid in friend_ids:
-        fset = get_artist_set(fid)
-        overlap = base.intersection(fset)
-        unique_to_user = base - fset
-        unique_to_friend = fset - base
-        results["comparisons"][fid] = {"overlap_count": len(overlap), "unique_to_user": len(unique_to_user), "unique_to_friend": len(unique_to_friend)}
+    if len(friend_ids) + 1 > similarity.MAX_GROUP_SIZE:
+        raise HTTPException(status_code=400, detail=f"at most {similarity.MAX_GROUP_SIZE - 1} friends per comparison")
+    sim = similarity.compare_users(db, [user_id] + friend_ids)
+    results = {
+        "user_count": sim.artist_count(user_id),
+        "comparisons": {fid: sim.pair(user_id, fid) for fid in friend_ids},
+    }
     comp = models.Comparison(user_id=user_id, friend_ids=friend_ids, results=results)
     db.add(comp)
     db.commit()
     db.refresh(comp)
     return comp
 
+@router.post("/compare/group")
+def compare_group(user_ids: List[str], db: Session = Depends(get_db)):
+    """
+    Pairwise similarity matrices for a group of users (rows/columns in user_ids order)
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if len(user_ids) < 2:
+        raise HTTPException(status_code=400, detail="need at least two users")
+    if len(user_ids) > similarity.MAX_GROUP_SIZE:
+        raise HTTPException(status_code=400, detail=f"at most {similarity.MAX_GROUP_SIZE} users per comparison")
+    return similarity.compare_users(db, user_ids).matrices()
+
+@router.get("/compare/similar/{user_id}")
+def similar_users(user_id: str, k: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    """
+    "Users like you": the k users whose passports/artists are closest to this user's
+    """
+    if db.query(models.User.id).filter(models.User.id == user_id).first() is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    matches, scanned = user_index.similar_users(db, user_id, k)
+    ids = [uid for uid, _ in matches]
+    names = dict(db.query(models.User.id, models.User.username).filter(models.User.id.in_(ids)).all()) if ids else {}
+    results = []
+    for uid, score in matches:
+        if uid not in names:
+            user_index.remove_user(uid)  # deleted since it was indexed
+            continue
+        results.append({"user_id": uid, "username": names[uid], "similarity": round(score, 4)})
+    index = user_index.stats()
+    return {"user_id": user_id, "results": results, "candidates_scored": scanned,
+            "indexed_users": index["indexed_users"], "index_ready": index["ready"]}
@@ -0,0 +1,89 @@
+"""
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    One-call payload for the web UI's first paint:
+        GET /dashboard?access_token=...&limit=8
+    -> {"me": <as /spotify/me>, "passport": <as /passport/from_token>,
+        "top_artists": [<Spotify artist objects>], "errors": {...}}
+
+    /me, /me/player/recently-played and /me/top/artists are requested
+    concurrently, and the passport and the top-artist list are both built from
+    the single /me/top/artists response, so the request takes about as long as
+    the slowest upstream call (plus country inference). If the top-artists
+    call fails the profile is still returned; "passport" is then null and the
+    reason is in "errors". Such partial payloads are never cached, and a
+    stale-while-revalidate refresh that comes back partial keeps the last good
+    payload.
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+# routers/dashboard.py - composite endpoint for the web UI
+import asyncio
+
+from fastapi import APIRouter, Query
+
+from ..response_cache import TTL, response_cache, token_key
+from ..spotify_auth import me_payload
+from ..spotify_client import aspotify_get
+from .passport import snapshot_from_top_artists
+
+router = APIRouter(tags=["Dashboard"])
+
+
+class _PartialDashboard(Exception):
+    """
+    Raised by the cache fetch so a payload with errors is served but not stored.
+    """
+
+    def __init__(self, payload: dict):
+        super().__init__(payload["errors"])
+        self.payload = payload
+
+
+@router.get("/dashboard")
+async def get_dashboard(
+    access_token: str = Query(..., description="Spotify access token"),
+    limit: int = Query(8, ge=1, le=50),
+):
+    try:
+        return await response_cache.aget_or_fetch(
+            token_key("dashboard", access_token, limit),
+            lambda: _cacheable_dashboard(access_token, limit),
+            ttl=TTL["dashboard"],
+        )
+    except _PartialDashboard as e:
+        return e.payload
+
+
+async def _cacheable_dashboard(access_token: str, limit: int) -> dict:
+    payload = await _build_dashboard(access_token, limit)
+    if payload["errors"]:
+        raise _PartialDashboard(payload)
+    return payload
+
+
+async def _build_dashboard(access_token: str, limit: int) -> dict:
+    profile, recent, top = await asyncio.gather(
+        aspotify_get("/me", access_token),
+        aspotify_get("/me/player/recently-played", access_token, params={"limit": 1}),
+        aspotify_get("/me/top/artists", access_token, params={"limit": limit}),
+    )
+    me = me_payload(profile, recent)  # 400 if the profile itself failed
+
+    errors = {}
+    passport = None
+    top_artists = []
+    if isinstance(top, dict) and "items" in top:
+        top_artists = top["items"]
+        passport = await snapshot_from_top_artists(top_artists)
+    else:
+        errors["top_artists"] = top
+
+    return {"me": me, "passport": passport, "top_artists": top_artists, "errors": errors}
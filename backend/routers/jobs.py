@@ -0,0 +1,42 @@
+"""
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    Status of background jobs queued by /sync, /enrich and /history/import:
+        GET /jobs/{job_id}          -> status, attempts, progress, last error
+        GET /jobs/for_user/{user_id} -> that user's recent jobs, newest first
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+# routers/jobs.py - job status endpoints
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List
+from ..db import get_db
+from .. import jobs, models
+from ..schemas import JobOut
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+@router.get("/for_user/{user_id}", response_model=List[JobOut])
+def list_user_jobs(user_id: str, limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db)):
+    return (
+        db.query(models.Job)
+        .filter(models.Job.user_id == user_id)
+        .order_by(models.Job.created_at.desc())
+        .limit(limit)
+        .all()
+    )
+
+@router.get("/{job_id}", response_model=JobOut)
+def get_job_status(job_id: str, db: Session = Depends(get_db)):
+    job = jobs.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
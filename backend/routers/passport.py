@@ -1,31 +1,45 @@
 """
 Backend Passport Coding
 @Author: Tyler Tristan
-@Version: 1.0
+@Version: 1.2
 @Since: 10/03/2025
 Usage:
 Generate the user's customized music passport
 Change Log:
 Version 1.0 (10/03/2025):
 Created backend code for the music passport
+Version 1.1 (10/17/2026):
+Spotify/MusicBrainz calls use the shared pooled HTTP clients
+Version 1.2 (10/17/2026):
+from_token endpoints are async; MusicBrainz lookups run on their own executor
 """
 # backend/routers/passport.py
 # Music Passport endpoints:
 #  - GET /passport/ping                 -> quick health check
 #  - GET /passport/from_token           -> Live snapshot from Spotify Top Artists
 #  - GET /passport/from_token_recent    -> Live snapshot from Recently Played
-#  - GET /passport/{user_id}            -> DB-based summary (kept)
+#  - GET /passport/{user_id}            -> DB-based summary (cached per library version, ETag/304)
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import Dict, Optional, List
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+import asyncio
 import os
+import threading
 import time
-import requests
 
 from ..db import get_db
-from .. import crud, models
+from .. import crud
+from ..artist_names import NameIndex, normalize_name
+from ..cache import LRUCache, SingleFlight
+from ..countries import country_name
+from ..http_client import get_client, set_host_limits
+from ..origin_cache import MISS, origin_cache
+from .. import origin_index
+from ..ratelimit import RequestScheduler
 from ..schemas import PassportSummaryOut
+from ..spotify_client import aspotify_get
 
 router = APIRouter(prefix="/passport", tags=["Music Passport"])
 
@@ -34,6 +48,20 @@ router = APIRouter(prefix="/passport", tags=["Music Passport"])
 # Toggle MusicBrainz lookups via env
 USE_MB = os.getenv("PASSPORT_USE_MB", "0") == "1"
 
+# MusicBrainz allows ~1 request/second per client; every lookup in this process
+# shares this budget (lower MB_RATE_PER_SEC when running several workers)
+MB_RATE_PER_SEC = float(os.getenv("MB_RATE_PER_SEC", "1"))
+MB_CONCURRENCY = int(os.getenv("MB_CONCURRENCY", "4"))
+MB_DEADLINE = float(os.getenv("MB_DEADLINE", "8"))  # seconds a passport waits for lookups
+MB_MAX_PENDING = int(os.getenv("MB_MAX_PENDING", "256"))  # queued + running lookups; beyond this, skip MusicBrainz
+mb_limiter = RequestScheduler(MB_RATE_PER_SEC, 1)
+_mb_inflight = SingleFlight()
+_mb_pool = ThreadPoolExecutor(max_workers=MB_CONCURRENCY, thread_name_prefix="musicbrainz")
+_mb_slots = threading.BoundedSemaphore(MB_MAX_PENDING)
+set_host_limits("musicbrainz.org", MB_CONCURRENCY)
+
+# Seed data for the country_regions table (seeded at startup); the live
+# from_token endpoints, which don't touch the DB, use it directly.
 COUNTRY_TO_REGION = {
     "United States": "North America", "Canada": "North America", "Mexico": "North America",
     "United Kingdom": "Europe", "Ireland": "Europe", "Germany": "Europe", "France": "Europe",
@@ -83,60 +111,126 @@ QUICK_COUNTRY_SEEDS: Dict[str, str] = {
     "IU": "South Korea",
     "Rammstein": "Germany",
 }
+# matches "the beatles", "The Beatles (Remastered)", "Drake feat. X" (exact normalised names only)
+SEED_INDEX = NameIndex(QUICK_COUNTRY_SEEDS)
 
-MB_COUNTRY_CACHE: Dict[str, Optional[str]] = {}
+def _mb_fetch_country(artist_name: str) -> Optional[str]:
+    """
+    Ask MusicBrainz for the artist's country. Raises on network/HTTP errors.
+    """
+    url = "https://musicbrainz.org/ws/2/artist"
+    params = {"query": f'artist:"{artist_name}"', "limit": 1, "fmt": "json"}
+    headers = {"User-Agent": "TuniverseDemo/1.0 (class project)"}
+    mb_limiter.acquire()
+    r = get_client(url).get(url, params=params, headers=headers, timeout=3.0)
+    r.raise_for_status()
+    data = r.json()
+    if data.get("artists"):
+        a = data["artists"][0]
+        if "country" in a:
+            return country_name(a["country"])
+        for key in ("area", "begin-area"):
+            if isinstance(a.get(key), dict):
+                nm = a[key].get("name")
+                if nm:
+                    return nm
+    return None
 
 def mb_lookup_country(artist_name: str) -> Optional[str]:
     if not USE_MB:
         return None
-    if artist_name in MB_COUNTRY_CACHE:
-        return MB_COUNTRY_CACHE[artist_name]
+    # shared across workers (LRU + artist_origins table), incl. negative results
+    cached = origin_cache.get(artist_name)
+    if cached is not MISS:
+        return cached
+    # identical names in flight (from any request) share one MusicBrainz call
+    return _mb_inflight.do(normalize_name(artist_name), _mb_resolve, artist_name)
+
+def _mb_resolve(artist_name: str) -> Optional[str]:
     try:
-        url = "https://musicbrainz.org/ws/2/artist"
-        params = {"query": f'artist:"{artist_name}"', "limit": 1, "fmt": "json"}
-        headers = {"User-Agent": "TuniverseDemo/1.0 (class project)"}
-        r = requests.get(url, params=params, headers=headers, timeout=3.0)
-        r.raise_for_status()
-        data = r.json()
-        if data.get("artists"):
-            a = data["artists"][0]
-            if "country" in a:
-                MB_COUNTRY_CACHE[artist_name] = a["country"]
-                return a["country"]
-            for key in ("area", "begin-area"):
-                if isinstance(a.get(key), dict):
-                    nm = a[key].get("name")
-                    if nm:
-                        MB_COUNTRY_CACHE[artist_name] = nm
-                        return nm
+        country = _mb_fetch_country(artist_name)
     except Exception:
-        pass
-    MB_COUNTRY_CACHE[artist_name] = None
-    return None
+        # transient failure: don't cache, try again next time
+        return None
+    origin_cache.set(artist_name, country)
+    return country
 
 def infer_country_fast(artist_name: str) -> str:
-    if artist_name in QUICK_COUNTRY_SEEDS:
-        return QUICK_COUNTRY_SEEDS[artist_name]
-    c = mb_lookup_country(artist_name)
+    # seeds, then the bundled offline index, before any network fallback
+    c = SEED_INDEX.get(artist_name) or origin_index.lookup(artist_name) or mb_lookup_country(artist_name)
     return c or "Unknown"
 
-def spotify_get(path: str, access_token: str, params: Optional[Dict] = None):
+def _offline_countries(artist_names: List[str]):
     """
-    Safe GET to Spotify that never raises; returns dict with 'error' on failure.
+    Resolve what we can without the network: ({name: country}, [names left for MusicBrainz]).
     """
-    try:
-        headers = {"Authorization": f"Bearer {access_token}"}
-        url = f"https://api.spotify.com/v1{path}"
-        r = requests.get(url, headers=headers, params=params or {}, timeout=8)
-        try:
-            data = r.json()
-        except Exception:
-            data = {"text": r.text or ""}
-        if r.status_code >= 400:
-            return {"error": r.status_code, **(data if isinstance(data, dict) else {})}
-        return data if isinstance(data, dict) else {"error": "bad_json"}
-    except requests.RequestException as e:
-        return {"error": "network", "message": str(e)}
+    result: Dict[str, str] = {}
+    pending = []
+    for name in dict.fromkeys(artist_names):
+        offline = SEED_INDEX.get(name) or origin_index.lookup(name)
+        if offline:
+            result[name] = offline
+        elif not USE_MB:
+            result[name] = "Unknown"
+        else:
+            pending.append(name)
+    return result, pending
+
+def _mb_submit(names: List[str]) -> Dict[Future, str]:
+    """
+    Queue lookups on _mb_pool while fewer than MB_MAX_PENDING are queued or
+    running; names over the limit get no lookup (they come back "Unknown").
+    """
+    futures: Dict[Future, str] = {}
+    for name in names:
+        if not _mb_slots.acquire(blocking=False):
+            break
+        fut = _mb_pool.submit(mb_lookup_country, name)
+        fut.add_done_callback(lambda _f: _mb_slots.release())  # also runs when cancelled
+        futures[fut] = name
+    return futures
+
+def _mb_collect(futures: Dict[Future, str], done, result: Dict[str, str]):
+    # past the deadline: drop lookups that haven't started, keep the running ones
+    for fut, name in futures.items():
+        if fut not in done:
+            fut.cancel()
+        result[name] = (fut.result() if fut in done else None) or "Unknown"
+
+def infer_countries(artist_names: List[str]) -> Dict[str, str]:
+    """
+    infer_country_fast for many names at once: network lookups run concurrently
+    and the whole call waits at most MB_DEADLINE seconds. Names still pending
+    come back "Unknown"; lookups already running finish in the background and
+    land in the origin cache for next time, queued ones are cancelled.
+    """
+    result, pending = _offline_countries(artist_names)
+    if pending:
+        futures = _mb_submit(pending)
+        done, _ = wait(futures, timeout=MB_DEADLINE)
+        for name in pending:
+            result.setdefault(name, "Unknown")
+        _mb_collect(futures, done, result)
+    return result
+
+async def ainfer_countries(artist_names: List[str]) -> Dict[str, str]:
+    """
+    infer_countries for async handlers: the blocking MusicBrainz lookups run on
+    _mb_pool and are awaited, so the event loop (and the server's threadpool)
+    stay free while they're in flight.
+    """
+    result, pending = _offline_countries(artist_names)
+    if pending:
+        futures = _mb_submit(pending)
+        done = set()
+        if futures:
+            waiting = {asyncio.wrap_future(f): f for f in futures}
+            finished, _ = await asyncio.wait(waiting, timeout=MB_DEADLINE)
+            done = {waiting[f] for f in finished}
+        for name in pending:
+            result.setdefault(name, "Unknown")
+        _mb_collect(futures, done, result)
+    return result
 
 # ---------------- routes ----------------
 
@@ -145,7 +239,7 @@ def ping():
     return {"ok": True, "ts": time.strftime("%Y-%m-%dT%H:%M:%S")}
 
 @router.get("/from_token")
-def passport_from_token(
+async def passport_from_token(
     access_token: str = Query(..., description="Spotify access token"),
     limit: int = Query(8, ge=1, le=20),
 ):
@@ -159,28 +253,31 @@ def passport_from_token(
     - artists_by_country: {country -> [artist names]}
     - top_artists: [artist names, ordered as Spotify returns them]
     """
-    top = spotify_get("/me/top/artists", access_token, params={"limit": limit})
+    top = await aspotify_get("/me/top/artists", access_token, params={"limit": limit})
     if not isinstance(top, dict) or "items" not in top:
         raise HTTPException(status_code=400, detail=f"Could not fetch top artists: {top}")
+    return await snapshot_from_top_artists(top["items"])
 
+async def snapshot_from_top_artists(items: List[dict]) -> dict:
+    """
+    Passport snapshot from the items of a /me/top/artists response (shared
+    with /dashboard, which already has that response in hand).
+    """
     country_counts: Dict[str, int] = {}
     artists_by_country: Dict[str, List[str]] = {}
     total_artists = 0
     top_artists: List[str] = []
 
-    for artist in top["items"]:
-        if not isinstance(artist, dict):
-            continue
-        name = artist.get("name")
-        if not name:
-            continue
+    names = [a.get("name") for a in items if isinstance(a, dict) and a.get("name")]
+    countries = await ainfer_countries(names)
 
+    for name in names:
         # track ordered list of top artists
         if name not in top_artists:
             top_artists.append(name)
 
         total_artists += 1
-        country = infer_country_fast(name)
+        country = countries[name]
         country_counts[country] = country_counts.get(country, 0) + 1
 
         if country not in artists_by_country:
@@ -203,11 +300,11 @@ def passport_from_token(
     }
 
 @router.get("/from_token_recent")
-def passport_from_token_recent(
+async def passport_from_token_recent(
     access_token: str = Query(..., description="Spotify access token"),
     limit: int = Query(20, ge=1, le=50),
 ):
-    recent = spotify_get("/me/player/recently-played", access_token, params={"limit": limit})
+    recent = await aspotify_get("/me/player/recently-played", access_token, params={"limit": limit})
     items = recent.get("items", []) if isinstance(recent, dict) else []
     if isinstance(recent, dict) and "error" in recent:
         raise HTTPException(status_code=400, detail=f"Could not fetch recently played: {recent}")
@@ -223,10 +320,11 @@ def passport_from_token_recent(
                 names.append(nm)
 
     names = names[:12]
+    countries = await ainfer_countries(names)
 
     country_counts: Dict[str, int] = {}
     for nm in names:
-        country = infer_country_fast(nm)
+        country = countries[nm]
         country_counts[country] = country_counts.get(country, 0) + 1
 
     region_percentages = rollup_regions(country_counts)
@@ -240,38 +338,57 @@ def passport_from_token_recent(
         "note": "Built from recently played; fast inference.",
     }
 
+# (user_id, library_version) -> PassportSummaryOut
+_passport_memo = LRUCache(maxsize=int(os.getenv("PASSPORT_MEMO_SIZE", "5000")), name="passport_memo")
+
+def _etag(user_id: str, version: int) -> str:
+    return f'"{user_id}-v{version}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
 @router.get("/{user_id}", response_model=PassportSummaryOut)
-def get_passport(user_id: str, db: Session = Depends(get_db)):
-    tracks: List[models.Track] = (
-        db.query(models.Track)
-          .join(models.Playlist)
-          .filter(models.Playlist.user_id == user_id)
-          .all()
-    )
-
-    artist_ids = set()
-    for t in tracks:
-        for aid in (t.artist_ids or []):
-            artist_ids.add(aid)
-
-    if artist_ids:
-        artists: List[models.Artist] = (
-            db.query(models.Artist)
-              .filter(models.Artist.spotify_artist_id.in_(list(artist_ids)))
-              .all()
-        )
-    else:
-        artists = []
+def get_passport(user_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    """
+    Latest passport for the user's library. Recomputed (and a new snapshot stored)
+    only when sync/enrichment bumped the user's library_version; otherwise the
+    stored snapshot is served, and clients sending If-None-Match get a 304.
+    """
+    version = crud.get_library_version(db, user_id)
+    etag = _etag(user_id, version)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    key = (user_id, version)
+    cached = _passport_memo.get(key)
+    if cached is not None:
+        return cached
+    stored = crud.get_latest_passport(db, user_id, version)
+    if stored is not None:
+        out = PassportSummaryOut.from_orm(stored)
+        _passport_memo.set(key, out)
+        return out
+
+    # histogram + region lookup happen in SQL; only one row per country comes back
+    rows = crud.country_histogram(db, user_id)
 
     country_counts: Dict[str, int] = {}
-    for a in artists:
-        c = a.origin_country or "Unknown"
-        country_counts[c] = country_counts.get(c, 0) + 1
+    region_counts: Dict[str, int] = {}
+    for country, region, cnt in rows:
+        country_counts[country] = country_counts.get(country, 0) + cnt
+        region_counts[region] = region_counts.get(region, 0) + cnt
 
-    total = len(artists)
-    region_percentages = rollup_regions(country_counts)
-    passport = crud.create_passport(db, user_id, country_counts, region_percentages, total)
-    return passport
+    total = sum(country_counts.values())
+    region_percentages = {reg: cnt / total for reg, cnt in region_counts.items()} if total else {}
+    passport = crud.create_passport(db, user_id, country_counts, region_percentages, total, library_version=version)
+    out = PassportSummaryOut.from_orm(passport)
+    _passport_memo.set(key, out)
+    return out
 
 
 
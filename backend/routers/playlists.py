@@ -1,91 +1,232 @@
 """
 Playlist & Listening History Coding
 @Author: Tyler Tristan
-@Version: 1.0
+@Version: 1.1
 @Since: 10/03/2025
 Usage:
 Import playlist data and listening history
 Change Log:
 Version 1.0 (10/03/2025):
 Created backend code for the playlist history
+Version 1.1 (10/17/2026):
+Sync and history import run as durable jobs (backend/jobs.py, backend/worker.py)
+History import pages through recently-played with cursors (backend/history.py)
 """
 
 
 
 # routers/playlists.py - import & sync playlists, import listening history
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from ..db import get_db
-from .. import crud, spotify_client
+from ..db import get_db, WorkerSessionLocal
+from .. import crud, history, jobs, spotify_client, utils
 from .. import models
-from typing import List, Dict
+from ..spotify_client import PRIORITY_BULK
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Dict, Optional
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_PAGE_SIZE = 50
+TRACK_PAGE_SIZE = 100  # Spotify's max for playlist items
+TRACK_FIELDS = "items(added_at,track(id,name,artists(id))),next"
+SYNC_CONCURRENCY = int(os.getenv("SYNC_CONCURRENCY", "6"))
+SYNC_COMMIT_EVERY = 25  # playlists per transaction
 
 router = APIRouter()
 
 @router.post("/sync/{user_id}")
-def sync_playlists(user_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def sync_playlists(user_id: str, db: Session = Depends(get_db)):
     """
-    Start background sync of playlists and tracks for this user.
+    Queue a background sync of playlists and tracks for this user
+    (at most one per user is queued/running; poll /jobs/{job_id}).
     """
     user = crud.get_user(db, user_id)
     if not user or not user.spotify_linked:
         raise HTTPException(status_code=400, detail="Spotify not linked for user")
-    background_tasks.add_task(_background_sync, user_id)
-    return {"status": "sync scheduled"}
+    job, created = jobs.enqueue(db, "sync", user_id)
+    return {"status": "sync scheduled" if created else "sync already scheduled", "job_id": job.id}
 
-def _background_sync(user_id: str):
+@jobs.handler("sync")
+def _background_sync(user_id: str, progress=None):
     """
-    Background worker: fetch playlists via Spotify API, store in DB.
+    Job handler: incremental playlist sync.
+    Scans every page of /me/playlists, then only re-fetches playlists whose
+    snapshot_id changed (several at once) and applies the track diff.
+    Playlists removed on Spotify are removed here too, and the user's
+    user_artists rows are adjusted by the same diff.
     """
-    db = next(get_db())
-    user = crud.get_user(db, user_id)
-    if not user:
-        return
-    token = user.spotify_access_token
-    playlists_resp = spotify_client.spotify_get("/me/playlists", token, params={"limit": 50})
-    if not playlists_resp or "error" in playlists_resp:
-        return
-    for item in playlists_resp.get("items", []):
-        pid = item.get("id")
-        name = item.get("name")
-        total = item.get("tracks", {}).get("total", 0)
-        pl = crud.create_playlist(db, user_id, pid, name, total)
-        # naive tracks fetch (pagination omitted)
-        tracks_resp = spotify_client.spotify_get(f"/playlists/{pid}/tracks", token, params={"limit": 50})
-        for t in tracks_resp.get("items", []):
-            track = t.get("track")
-            if not track:
+    db = WorkerSessionLocal()
+    try:
+        user = crud.get_user(db, user_id)
+        if not user:
+            return
+        token = user.spotify_access_token
+        playlists, err = spotify_client.spotify_get_all(
+            "/me/playlists", token, params={"limit": PLAYLIST_PAGE_SIZE}, priority=PRIORITY_BULK, user_key=user_id
+        )
+        if err:
+            # never diff against a partial listing (it would delete playlists); retry later
+            raise jobs.upstream_error("/me/playlists failed", err)
+        playlists = {p["id"]: p for p in playlists if p and p.get("id")}
+        # first sync since user_artists existed: rebuild it at the end instead of diffing
+        rebuild = not crud.has_user_artists(db, user_id)
+        artist_delta = Counter()
+        artists_changed = False
+
+        existing: Dict[str, models.Playlist] = {}
+        stale_ids = []
+        for pl in crud.get_user_playlists(db, user_id):
+            if pl.spotify_playlist_id in playlists and pl.spotify_playlist_id not in existing:
+                existing[pl.spotify_playlist_id] = pl
+            else:
+                stale_ids.append(pl.id)  # deleted on Spotify, or a duplicate from older full syncs
+        if stale_ids:
+            artist_delta.subtract(crud.delete_playlists(db, stale_ids))
+
+        changed = []
+        for pid, item in playlists.items():
+            pl = existing.get(pid)
+            if pl is not None and pl.snapshot_id and pl.snapshot_id == item.get("snapshot_id"):
+                if pl.name != item.get("name"):
+                    pl.name = item.get("name")
                 continue
-            # create track rows (simplified)
-            tr = models.Track(playlist_id=pl.id, spotify_track_id=track.get("id"), name=track.get("name"), artist_ids=[a.get("id") for a in track.get("artists", [])])
-            db.add(tr)
-    db.commit()
-    db.close()
+            changed.append(item)
+
+        pending = 0
+        done = 0
+        if progress:
+            progress(0, len(changed), f"{len(changed)} of {len(playlists)} playlists changed")
+        with ThreadPoolExecutor(max_workers=SYNC_CONCURRENCY, thread_name_prefix="sync") as pool:
+            futures = {pool.submit(_fetch_playlist_tracks, token, user_id, p["id"]): p for p in changed}
+            # DB writes stay on this thread; fetches for other playlists keep running meanwhile
+            for fut in as_completed(futures):
+                item = futures[fut]
+                track_items, err = fut.result()
+                done += 1
+                if err:
+                    # left with its old snapshot_id, so the next sync retries it
+                    logger.warning("sync %s: tracks for playlist %s failed: %s", user_id, item["id"], err)
+                else:
+                    artist_delta.update(_apply_playlist(db, user_id, item, track_items, existing.get(item["id"])))
+                    pending += 1
+                    if pending >= SYNC_COMMIT_EVERY:
+                        artists_changed |= _flush_artist_delta(db, user_id, artist_delta, rebuild)
+                        db.commit()
+                        pending = 0
+                if progress:
+                    # heartbeat per playlist (own session): slow or 429-paused fetches must not outlive the lease
+                    progress(done, len(changed))
+        artists_changed |= _flush_artist_delta(db, user_id, artist_delta, rebuild)
+        if rebuild:
+            crud.rebuild_user_artists(db, user_id)
+        if rebuild or artists_changed:
+            crud.bump_library_version(db, user_id)  # invalidates the cached passport
+        db.commit()
+        if progress:
+            progress(done, len(changed), "done")
+    finally:
+        db.close()
+
+def _flush_artist_delta(db: Session, user_id: str, delta: Counter, rebuild: bool) -> bool:
+    changed = False
+    if not rebuild:
+        changed = crud.apply_user_artist_deltas(db, user_id, delta)
+    delta.clear()
+    return changed
+
+def _fetch_playlist_tracks(token: str, user_id: str, spotify_playlist_id: str):
+    return spotify_client.spotify_get_all(
+        f"/playlists/{spotify_playlist_id}/tracks",
+        token,
+        params={"limit": TRACK_PAGE_SIZE, "fields": TRACK_FIELDS},
+        priority=PRIORITY_BULK,
+        user_key=user_id,
+    )
+
+def _track_row(playlist_id: str, item: dict) -> Optional[Dict]:
+    track = item.get("track")
+    if not track:
+        return None
+    return {
+        "playlist_id": playlist_id,
+        "spotify_track_id": track.get("id"),
+        "name": track.get("name"),
+        "artist_ids": [a.get("id") for a in track.get("artists", []) if a.get("id")],
+        "added_at": utils.parse_spotify_time(item.get("added_at")),
+    }
+
+def _track_key(spotify_track_id: Optional[str], name: Optional[str]) -> str:
+    # local files have no Spotify ID
+    return spotify_track_id or f"local:{name}"
+
+def _apply_playlist(db: Session, user_id: str, item: dict, track_items: List[dict], pl: Optional[models.Playlist]):
+    """
+    Create or update one playlist and apply only the track additions/removals.
+    Returns the per-artist track-count change. Caller commits.
+    """
+    if pl is None:
+        pl = models.Playlist(id=str(uuid.uuid4()), user_id=user_id, spotify_playlist_id=item["id"])
+        db.add(pl)
+        db.flush()  # tracks reference the new row
+        old_rows = []
+    else:
+        old_rows = db.query(models.Track.id, models.Track.spotify_track_id, models.Track.name, models.Track.artist_ids).filter(models.Track.playlist_id == pl.id).all()
+
+    new_rows = [r for r in (_track_row(pl.id, t) for t in track_items) if r]
+
+    # multiset diff: a track can appear in a playlist more than once
+    old_by_key: Dict[str, List] = {}
+    for row_id, sid, name, aids in old_rows:
+        old_by_key.setdefault(_track_key(sid, name), []).append((row_id, aids))
+    additions = []
+    for row in new_rows:
+        olds = old_by_key.get(_track_key(row["spotify_track_id"], row["name"]))
+        if olds:
+            olds.pop()
+        else:
+            additions.append(row)
+    removals = [old for olds in old_by_key.values() for old in olds]
+
+    delta = crud.artist_counts(r["artist_ids"] for r in additions)
+    delta.subtract(crud.artist_counts(aids for _, aids in removals))
+    if removals:
+        crud.delete_tracks(db, [row_id for row_id, _ in removals])
+    if additions:
+        crud.bulk_insert_tracks(db, additions)
+    pl.name = item.get("name")
+    pl.snapshot_id = item.get("snapshot_id")
+    pl.track_count = len(new_rows)
+    pl.last_synced_at = datetime.utcnow()
+    return delta
 
 @router.post("/history/import/{user_id}")
-def import_listening_history(user_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def import_listening_history(user_id: str, db: Session = Depends(get_db)):
     user = crud.get_user(db, user_id)
     if not user or not user.spotify_linked:
         raise HTTPException(status_code=400, detail="Spotify not linked")
-    background_tasks.add_task(_import_history, user_id)
-    return {"status": "history import scheduled"}
-
-def _import_history(user_id: str):
-    db = next(get_db())
-    user = crud.get_user(db, user_id)
-    token = user.spotify_access_token
-    url = "/me/player/recently-played?limit=50"
-    # naive pagination
-    resp = spotify_client.spotify_get(url, token)
-    if not resp:
-        return
-    for item in resp.get("items", []):
-        track = item.get("track")
-        played_at = item.get("played_at")
-        if not track:
-            continue
-        lh = models.ListeningHistory(user_id=user_id, track_id=track.get("id"), track_name=track.get("name"), artist_id=track.get("artists", [{}])[0].get("id"), played_at=played_at)
-        db.add(lh)
-    db.commit()
-    db.close()
+    job, created = jobs.enqueue(db, "history", user_id)
+    return {"status": "history import scheduled" if created else "history import already scheduled", "job_id": job.id}
 
+@jobs.handler("history")
+def _import_history(user_id: str, progress=None, export_path: Optional[str] = None):
+    """
+    Job handler: new plays from the API since the last run (cursor high-water
+    mark), or, with export_path, a streaming-history export file (see backend/history.py).
+    """
+    db = WorkerSessionLocal()
+    try:
+        if export_path:
+            history.ingest_export(db, user_id, export_path, progress)
+            return
+        user = crud.get_user(db, user_id)
+        if not user:
+            return
+        history.ingest_recent(db, user, progress)
+    finally:
+        db.close()
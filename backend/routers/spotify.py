@@ -1,6 +1,6 @@
 """
 @Author: Max Henson
-@Version: 1.0
+@Version: 1.2
 @Since: 10/3/2025
 
 Usage:
@@ -12,10 +12,14 @@ Usage:
     Uses:
         • Authorization: Bearer <spotify_access_token> header from the client
         • Helper _call_spotify() to wrap common request/validation logic
+        • backend/spotify_client.py for the actual (pooled) HTTP calls
+        • backend/response_cache.py to serve repeat polls from memory (per token)
 
 Change Log:
     Version 1.0 (11/3/2025): Implemented core Spotify integration with profile and
                              currently-playing endpoints for frontend use.
+    Version 1.1 (10/17/2026): Calls go through the shared pooled Spotify client.
+    Version 1.2 (10/17/2026): Handlers are async (no worker thread held per upstream call).
 """
 
 
@@ -23,21 +27,17 @@ Change Log:
 
 from fastapi import APIRouter, HTTPException, Header
 from typing import Optional
-import requests
+import httpx
 
-router = APIRouter(prefix="/spotify", tags=["spotify"])
+from ..response_cache import TTL, response_cache, token_key
+from ..spotify_client import aspotify_request
 
-SPOTIFY_API_BASE = "https://api.spotify.com/v1"
+router = APIRouter(prefix="/spotify", tags=["spotify"])
 
 
-def _call_spotify(
-    path: str,
-    authorization: str,
-    params: Optional[dict] = None,
-) -> dict:
+def _bearer_token(authorization: str) -> str:
     """
-    Helper to call the Spotify Web API.
-    Expects a full 'Authorization' header value, e.g. 'Bearer <token>'.
+    Validate an 'Authorization: Bearer <token>' header value and return the token.
     """
     if not authorization:
         raise HTTPException(status_code=400, detail="Missing Authorization header")
@@ -47,15 +47,26 @@ def _call_spotify(
             status_code=400,
             detail="Authorization header must start with 'Bearer '",
         )
+    return authorization[len("bearer "):].strip()
 
-    url = f"{SPOTIFY_API_BASE}{path}"
 
-    resp = requests.get(
-        url,
-        headers={"Authorization": authorization},
-        params=params or {},
-        timeout=10,
-    )
+async def _fetch(path: str, authorization: str, params: Optional[dict] = None) -> httpx.Response:
+    try:
+        return await aspotify_request(path, _bearer_token(authorization), params)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Spotify unreachable: {e}")
+
+
+async def _call_spotify(
+    path: str,
+    authorization: str,
+    params: Optional[dict] = None,
+) -> dict:
+    """
+    Helper to call the Spotify Web API.
+    Expects a full 'Authorization' header value, e.g. 'Bearer <token>'.
+    """
+    resp = await _fetch(path, authorization, params)
 
     # If Spotify says no, pass that back in a helpful way
     if resp.status_code != 200:
@@ -68,7 +79,7 @@ def _call_spotify(
 
 
 @router.get("/me")
-def get_spotify_me(authorization: str = Header(...)):
+async def get_spotify_me(authorization: str = Header(...)):
     """
     Get the current user's Spotify profile.
 
@@ -76,12 +87,14 @@ def get_spotify_me(authorization: str = Header(...)):
       GET /spotify/me
       Header: Authorization: Bearer <spotify_access_token>
     """
-    data = _call_spotify("/me", authorization)
-    return data
+    token = _bearer_token(authorization)
+    return await response_cache.aget_or_fetch(
+        token_key("me_raw", token), lambda: _call_spotify("/me", authorization), ttl=TTL["me"]
+    )
 
 
 @router.get("/currently_playing")
-def get_currently_playing(authorization: str = Header(...)):
+async def get_currently_playing(authorization: str = Header(...)):
     """
     Get the user's currently playing track.
 
@@ -91,20 +104,18 @@ def get_currently_playing(authorization: str = Header(...)):
 
     This is handy to fill `currentTrack` for community sharing.
     """
+    token = _bearer_token(authorization)
+    return await response_cache.aget_or_fetch(
+        token_key("currently_playing", token),
+        lambda: _fetch_currently_playing(authorization),
+        ttl=TTL["currently_playing"],
+    )
+
+
+async def _fetch_currently_playing(authorization: str) -> dict:
     # Spotify uses /me/player/currently-playing
     # If nothing is playing, Spotify returns 204 No Content.
-    if not authorization.lower().startswith("bearer "):
-        raise HTTPException(
-            status_code=400,
-            detail="Authorization header must start with 'Bearer '",
-        )
-
-    url = f"{SPOTIFY_API_BASE}/me/player/currently-playing"
-    resp = requests.get(
-        url,
-        headers={"Authorization": authorization},
-        timeout=10,
-    )
+    resp = await _fetch("/me/player/currently-playing", authorization)
 
     if resp.status_code == 204:
         # Nothing playing
@@ -1,32 +1,187 @@
 """
 Backend Scheduler Coding
 @Author: Jalen Counterman
-@Version: 1.0
+@Version: 1.1
 @Since: 10/03/2025
 Usage:
 Refresh user data periodically
 Change Log:
 Version 1.0 (10/03/2025):
 Created scheduled data refresh system
-"""# scheduler.py - APScheduler skeleton for backups / periodic tasks
+Version 1.1 (10/17/2026):
+Periodic incremental syncs and stale-artist re-enrichment, queued as jobs
+(backend/jobs.py) and spread across the day; one leader per deployment
+"""# scheduler.py - APScheduler periodic tasks
+#
+#  - every SCHEDULER_TICK_SECONDS: queue a "sync" job for users whose slot has come.
+#    Each user's slot is a fixed point in the SYNC_INTERVAL_HOURS cycle derived from
+#    a hash of their id, plus +/- SCHEDULER_JITTER_SECONDS, so refreshes are spread
+#    evenly instead of all landing at midnight.
+#  - every ENRICH_TICK_MINUTES: queue "enrich" jobs for artists whose
+#    last_checked_at is older than ARTIST_STALE_DAYS (grouped per user token).
+#  - SCHEDULER_MAX_ACTIVE caps queued + running sync/enrich jobs overall; the
+#    scheduler tops the queue up to the cap and leaves the rest for the next tick.
+#  - every JOB_PRUNE_HOURS: delete jobs finished more than JOB_RETENTION_DAYS ago.
+#  - only the holder of the "scheduler" lease (a DB row) queues anything, so
+#    every uvicorn worker can call start_scheduler() safely.
 from apscheduler.schedulers.background import BackgroundScheduler
-from .routers.playlists import _background_sync
-from .routers.artists import _enrich_worker
+from datetime import datetime, timedelta
 import atexit
+import hashlib
+import logging
 import os
+import random
+
+from . import crud, jobs
+from .db import WorkerSessionLocal
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+SCHEDULER_TICK_SECONDS = int(os.getenv("SCHEDULER_TICK_SECONDS", "60"))
+SCHEDULER_JITTER_SECONDS = float(os.getenv("SCHEDULER_JITTER_SECONDS", "600"))
+SCHEDULER_MAX_ACTIVE = int(os.getenv("SCHEDULER_MAX_ACTIVE", "20"))
+SYNC_INTERVAL_HOURS = float(os.getenv("SYNC_INTERVAL_HOURS", "24"))
+ENRICH_TICK_MINUTES = int(os.getenv("ENRICH_TICK_MINUTES", "30"))
+ARTIST_STALE_DAYS = float(os.getenv("ARTIST_STALE_DAYS", "30"))
+STALE_ARTIST_BATCH = int(os.getenv("STALE_ARTIST_BATCH", "1000"))
+JOB_PRUNE_HOURS = float(os.getenv("JOB_PRUNE_HOURS", "6"))
+LEASE_NAME = "scheduler"
+LEASE_SECONDS = SCHEDULER_TICK_SECONDS * 3  # a dead leader is replaced within a few ticks
+
+_EPOCH = datetime(1970, 1, 1)
 
 scheduler = BackgroundScheduler()
+_holder = jobs.worker_id()
+
+
+def _phase_seconds(user_id: str, period: float) -> float:
+    # stable per-user offset into the cycle
+    return int(hashlib.sha1(user_id.encode()).hexdigest()[:12], 16) % int(period)
+
+
+def next_sync_slot(user_id: str, after: datetime) -> datetime:
+    """
+    The user's next slot (naive UTC): their hashed phase in the SYNC_INTERVAL_HOURS
+    cycle, plus jitter. At least half a cycle after `after`, so a slot that ran
+    early because of jitter doesn't come due again minutes later.
+    """
+    period = SYNC_INTERVAL_HOURS * 3600
+    t = (after - _EPOCH).total_seconds() + period / 2
+    slot = t - t % period + _phase_seconds(user_id, period)
+    if slot < t:
+        slot += period
+    jitter = min(SCHEDULER_JITTER_SECONDS, period / 4)
+    return _EPOCH + timedelta(seconds=slot + random.uniform(-jitter, jitter))
+
+
+def _is_leader(db) -> bool:
+    try:
+        return jobs.acquire_lease(db, LEASE_NAME, _holder, LEASE_SECONDS)
+    except Exception:
+        db.rollback()
+        logger.exception("scheduler lease check failed")
+        return False
+
+
+def _capacity(db) -> int:
+    return max(0, SCHEDULER_MAX_ACTIVE - jobs.count_active(db, ("sync", "enrich")))
+
+
+def tick_syncs():
+    db = WorkerSessionLocal()
+    try:
+        if not _is_leader(db):
+            return
+        room = _capacity(db)
+        now = datetime.utcnow()
+        # users without a slot only get one assigned (no burst of syncs after a deploy)
+        for user in crud.due_sync_users(db, now, limit=max(room, 1) * 5):
+            if user.next_sync_at is not None:
+                if room <= 0:
+                    continue  # stays due; picked up once the queue drains
+                _, created = jobs.enqueue(db, "sync", user.id)
+                room -= created
+            user.next_sync_at = next_sync_slot(user.id, now)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("periodic sync tick failed")
+    finally:
+        db.close()
+
+
+def tick_enrichment():
+    db = WorkerSessionLocal()
+    try:
+        if not _is_leader(db):
+            return
+        room = _capacity(db)
+        if room <= 0:
+            return
+        cutoff = datetime.utcnow() - timedelta(days=ARTIST_STALE_DAYS)
+        by_user = crud.stale_artists_by_user(db, cutoff, STALE_ARTIST_BATCH)
+        for user_id, artist_ids in sorted(by_user.items(), key=lambda kv: -len(kv[1]))[:room]:
+            jobs.enqueue(db, "enrich", user_id, payload={"artist_ids": artist_ids})
+    except Exception:
+        db.rollback()
+        logger.exception("stale artist tick failed")
+    finally:
+        db.close()
+
+
+def tick_prune_jobs():
+    db = WorkerSessionLocal()
+    try:
+        if not _is_leader(db):
+            return
+        pruned = jobs.prune_finished(db)
+        if pruned:
+            logger.info("pruned %d finished jobs", pruned)
+    except Exception:
+        db.rollback()
+        logger.exception("job retention tick failed")
+    finally:
+        db.close()
+
 
 def start_scheduler():
+    if not SCHEDULER_ENABLED or scheduler.running:
+        return
     # Example: run backups weekly and re-sync daily
     scheduler.add_job(job_backup, 'interval', weeks=1, id='weekly_backup')
-    # other periodic jobs can be registered per-user or as needed
+    # first run a random fraction of a tick in, so workers started together don't race
+    first = datetime.now() + timedelta(seconds=random.uniform(1, SCHEDULER_TICK_SECONDS))
+    scheduler.add_job(tick_syncs, 'interval', seconds=SCHEDULER_TICK_SECONDS, id='periodic_sync',
+                      next_run_time=first, max_instances=1, coalesce=True)
+    scheduler.add_job(tick_enrichment, 'interval', minutes=ENRICH_TICK_MINUTES, id='stale_artists',
+                      jitter=60, max_instances=1, coalesce=True)
+    scheduler.add_job(tick_prune_jobs, 'interval', hours=JOB_PRUNE_HOURS, id='prune_jobs',
+                      jitter=60, max_instances=1, coalesce=True)
     scheduler.start()
-    atexit.register(lambda: scheduler.shutdown())
+    atexit.register(shutdown_scheduler)
+
+
+def shutdown_scheduler():
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+        db = WorkerSessionLocal()
+        try:
+            jobs.release_lease(db, LEASE_NAME, _holder)
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
+
 
 def job_backup():
     # create DB dump / snapshot stub
     # In production: use pg_dump or cloud snapshot
+    # every worker registers this job; only the scheduler leader runs it
+    db = WorkerSessionLocal()
+    try:
+        if not _is_leader(db):
+            return
+    finally:
+        db.close()
     print("Running weekly backup (stub) - implement real backup in prod")
-
-
@@ -38,6 +38,7 @@ class PlaylistOut(BaseModel):
     spotify_playlist_id: str
     name: str
     track_count: int
+    snapshot_id: Optional[str]
     last_synced_at: Optional[datetime]
 
     class Config:
@@ -58,8 +59,24 @@ class PassportSummaryOut(BaseModel):
     country_counts: Dict[str, int]
     region_percentages: Dict[str, float]
     total_artists: int
+    library_version: Optional[int]
 
     class Config:
         orm_mode = True
 
+class JobOut(BaseModel):
+    id: str
+    kind: str
+    user_id: Optional[str]
+    status: str
+    attempts: int
+    progress: int
+    progress_total: Optional[int]
+    message: Optional[str]
+    last_error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
 
+    class Config:
+        orm_mode = True
@@ -0,0 +1,231 @@
+"""
+Listening Similarity Engine
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    Compares any number of users in one pass. All of their user_artists rows
+    (plus each artist's genres / origin country) are loaded in a single query
+    and laid out as a users x artists matrix over a shared artist index; every
+    pairwise metric is then a matrix product:
+
+        sim = similarity.compare_users(db, [user_id] + friend_ids)
+        sim.pair(user_id, friend_id)
+        # {"overlap_count", "unique_to_user", "unique_to_friend", "jaccard",
+        #  "cosine", "genre_similarity", "country_similarity", "similarity"}
+
+    • overlap / jaccard – shared artists (binary membership)
+    • cosine            – artist vectors weighted by how many of the user's
+                          tracks feature the artist (user_artists.track_count)
+    • genre / country   – cosine of the users' genre and origin-country
+                          profiles (track-weighted), so fans of different
+                          artists in the same scene still score as similar
+    • similarity        – ARTIST_WEIGHT * cosine + GENRE_WEIGHT * genre
+                          + COUNTRY_WEIGHT * country
+
+    Uses scipy.sparse for the artist matrix (scipy is in requirements.txt).
+    Without scipy it falls back to dense NumPy, one block of artist columns
+    at a time (SIMILARITY_DENSE_BLOCK_MB per block, default 32), so memory stays
+    bounded however many distinct artists the group has.
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+# similarity.py - vectorised pairwise user similarity
+import os
+from typing import Dict, List, Sequence
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from . import models
+
+try:
+    import scipy.sparse as sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    sparse = None
+    SCIPY_AVAILABLE = False
+
+ARTIST_WEIGHT = float(os.getenv("SIMILARITY_ARTIST_WEIGHT", "0.5"))
+GENRE_WEIGHT = float(os.getenv("SIMILARITY_GENRE_WEIGHT", "0.3"))
+COUNTRY_WEIGHT = float(os.getenv("SIMILARITY_COUNTRY_WEIGHT", "0.2"))
+MAX_GROUP_SIZE = int(os.getenv("SIMILARITY_MAX_GROUP_SIZE", "500"))
+DENSE_BLOCK_BYTES = int(float(os.getenv("SIMILARITY_DENSE_BLOCK_MB", "32")) * 1024 * 1024)
+
+
+def _index(keys: Dict[str, int], key: str) -> int:
+    i = keys.get(key)
+    if i is None:
+        i = keys[key] = len(keys)
+    return i
+
+
+def _cosine(gram: np.ndarray) -> np.ndarray:
+    # gram[i, j] = <v_i, v_j>  ->  <v_i, v_j> / (|v_i| |v_j|), 0 for empty vectors
+    norms = np.sqrt(np.clip(np.diag(gram), 0, None))
+    denom = np.outer(norms, norms)
+    return np.divide(gram, denom, out=np.zeros_like(gram), where=denom > 0)
+
+
+def _dense_grams(n: int, rows: np.ndarray, cols: np.ndarray, vals: np.ndarray):
+    """
+    (binary @ binary.T, weighted @ weighted.T) for the users x artists matrix
+    without materialising it: artist columns are filled and multiplied in
+    blocks of n x `block` floats, and the products summed.
+    """
+    overlap = np.zeros((n, n), dtype=np.float64)
+    gram = np.zeros((n, n), dtype=np.float64)
+    if not len(cols):
+        return overlap, gram
+    block = max(1, DENSE_BLOCK_BYTES // (8 * max(n, 1)))
+    order = np.argsort(cols, kind="stable")
+    rows, cols, vals = rows[order], cols[order], vals[order]
+    for start in range(0, int(cols[-1]) + 1, block):
+        lo, hi = np.searchsorted(cols, [start, start + block])
+        if lo == hi:
+            continue
+        weighted = np.zeros((n, block), dtype=np.float64)
+        weighted[rows[lo:hi], cols[lo:hi] - start] = vals[lo:hi]  # (user, artist) is the user_artists primary key
+        binary = (weighted > 0).astype(np.float64)
+        overlap += binary @ binary.T
+        gram += weighted @ weighted.T
+    return overlap, gram
+
+
+def _profile_gram(n: int, width: int, rows: List[int], cols: List[int], weights: List[float]) -> np.ndarray:
+    # users x features profile (summed weights), then its Gram matrix
+    profile = np.zeros((n, max(width, 1)), dtype=np.float64)
+    if rows:
+        np.add.at(profile, (np.asarray(rows), np.asarray(cols)), np.asarray(weights, dtype=np.float64))
+    return profile @ profile.T
+
+
+class SimilarityResult:
+    """
+    Pairwise metrics for `user_ids`; each matrix is indexed in that order.
+    """
+    def __init__(self, user_ids: List[str], sizes: np.ndarray, overlap: np.ndarray, jaccard: np.ndarray,
+                 cosine: np.ndarray, genre: np.ndarray, country: np.ndarray):
+        self.user_ids = user_ids
+        self.position = {uid: i for i, uid in enumerate(user_ids)}
+        self.sizes = sizes
+        self.overlap = overlap
+        self.jaccard = jaccard
+        self.cosine = cosine
+        self.genre = genre
+        self.country = country
+        self.similarity = ARTIST_WEIGHT * cosine + GENRE_WEIGHT * genre + COUNTRY_WEIGHT * country
+
+    def artist_count(self, user_id: str) -> int:
+        return int(self.sizes[self.position[user_id]])
+
+    def pair(self, user_id: str, other_id: str) -> Dict:
+        i, j = self.position[user_id], self.position[other_id]
+        shared = int(self.overlap[i, j])
+        return {
+            "overlap_count": shared,
+            "unique_to_user": int(self.sizes[i]) - shared,
+            "unique_to_friend": int(self.sizes[j]) - shared,
+            "jaccard": round(float(self.jaccard[i, j]), 4),
+            "cosine": round(float(self.cosine[i, j]), 4),
+            "genre_similarity": round(float(self.genre[i, j]), 4),
+            "country_similarity": round(float(self.country[i, j]), 4),
+            "similarity": round(float(self.similarity[i, j]), 4),
+        }
+
+    def matrices(self) -> Dict:
+        return {
+            "user_ids": self.user_ids,
+            "artist_counts": [int(s) for s in self.sizes],
+            "overlap": self.overlap.astype(int).tolist(),
+            "jaccard": np.round(self.jaccard, 4).tolist(),
+            "cosine": np.round(self.cosine, 4).tolist(),
+            "genre_similarity": np.round(self.genre, 4).tolist(),
+            "country_similarity": np.round(self.country, 4).tolist(),
+            "similarity": np.round(self.similarity, 4).tolist(),
+        }
+
+
+def load_memberships(db: Session, user_ids: Sequence[str]):
+    """
+    One query: (user_id, artist_id, track_count, genres, origin_country) for
+    every artist of every requested user.
+    """
+    return (
+        db.query(
+            models.UserArtist.user_id,
+            models.UserArtist.spotify_artist_id,
+            models.UserArtist.track_count,
+            models.Artist.genres,
+            models.Artist.origin_country,
+        )
+        .outerjoin(models.Artist, models.Artist.spotify_artist_id == models.UserArtist.spotify_artist_id)
+        .filter(models.UserArtist.user_id.in_(list(user_ids)))
+        .all()
+    )
+
+
+def compare_users(db: Session, user_ids: Sequence[str]) -> SimilarityResult:
+    """
+    All pairwise metrics for `user_ids` (duplicates dropped, order kept).
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    n = len(user_ids)
+    users = {uid: i for i, uid in enumerate(user_ids)}
+    artists: Dict[str, int] = {}
+    genres: Dict[str, int] = {}
+    countries: Dict[str, int] = {}
+
+    u_idx: List[int] = []
+    a_idx: List[int] = []
+    weights: List[float] = []
+    g_rows: List[int] = []
+    g_cols: List[int] = []
+    g_weights: List[float] = []
+    c_rows: List[int] = []
+    c_cols: List[int] = []
+    c_weights: List[float] = []
+    for uid, artist_id, track_count, artist_genres, country in load_memberships(db, user_ids):
+        u = users[uid]
+        w = float(max(track_count or 0, 1))
+        u_idx.append(u)
+        a_idx.append(_index(artists, artist_id))
+        weights.append(w)
+        for genre in artist_genres or ():
+            g_rows.append(u)
+            g_cols.append(_index(genres, genre))
+            g_weights.append(w)
+        if country:
+            c_rows.append(u)
+            c_cols.append(_index(countries, country))
+            c_weights.append(w)
+
+    m = max(len(artists), 1)
+    rows = np.asarray(u_idx, dtype=np.int64)
+    cols = np.asarray(a_idx, dtype=np.int64)
+    vals = np.asarray(weights, dtype=np.float64)
+    if SCIPY_AVAILABLE:
+        weighted = sparse.csr_matrix((vals, (rows, cols)), shape=(n, m))
+        binary = sparse.csr_matrix((np.ones_like(vals), (rows, cols)), shape=(n, m))
+        overlap = (binary @ binary.T).toarray()
+        gram = (weighted @ weighted.T).toarray()
+    else:
+        overlap, gram = _dense_grams(n, rows, cols, vals)
+
+    sizes = np.diag(overlap).copy()
+    union = sizes[:, None] + sizes[None, :] - overlap
+    jaccard = np.divide(overlap, union, out=np.zeros_like(overlap, dtype=np.float64), where=union > 0)
+    return SimilarityResult(
+        user_ids,
+        sizes,
+        overlap,
+        jaccard,
+        _cosine(gram),
+        _cosine(_profile_gram(n, len(genres), g_rows, g_cols, g_weights)),
+        _cosine(_profile_gram(n, len(countries), c_rows, c_cols, c_weights)),
+    )
@@ -28,17 +28,24 @@ Spotify OAuth + simple Spotify passthrough endpoints used by the web UI.
 - GET  /spotify/me         -> profile + now_playing (from recently played only)
 - GET  /spotify/playlists  -> playlists via Spotify API (requires access_token)
 - GET  /spotify/top-artists-> top artists via Spotify API (requires access_token)
+
+The /spotify/* passthroughs are cached per token for a few seconds/minutes
+(see backend/response_cache.py). Everything that calls Spotify is async, so a
+slow upstream doesn't tie up one of the server's worker threads per request.
 """
 
 from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import RedirectResponse
 from typing import Optional
+import asyncio
 import os
 import urllib.parse
-import base64
-import requests
+
+import httpx
 
 from .auth import create_access_token
+from .response_cache import TTL, response_cache, token_key
+from .spotify_client import apost_token, aspotify_get
 
 router = APIRouter()
 
@@ -58,15 +65,9 @@ SCOPES = (
     "user-read-currently-playing"
 )
 
-TOKEN_URL = "https://accounts.spotify.com/api/token"
 AUTHORIZE_URL = "https://accounts.spotify.com/authorize"
 
 
-def _basic_auth_header() -> str:
-    raw = f"{SPOTIFY_CLIENT_ID}:{SPOTIFY_CLIENT_SECRET}".encode()
-    return "Basic " + base64.b64encode(raw).decode()
-
-
 @router.get("/auth/login", summary="Redirect to Spotify login", tags=["Auth"])
 def spotify_login(state: Optional[str] = None):
     if not SPOTIFY_CLIENT_ID or not SPOTIFY_REDIRECT_URI:
@@ -88,7 +89,7 @@ def spotify_login(state: Optional[str] = None):
     summary="Spotify callback → exchange code → redirect to web UI",
     tags=["Auth"],
 )
-def spotify_callback(
+async def spotify_callback(
     code: Optional[str] = Query(None),
     error: Optional[str] = Query(None),
     state: Optional[str] = Query(None),
@@ -96,16 +97,18 @@ def spotify_callback(
     if error or not code:
         raise HTTPException(400, f"Spotify auth error: {error or 'missing code'}")
 
-    token_res = requests.post(
-        TOKEN_URL,
-        headers={"Authorization": _basic_auth_header()},
-        data={
-            "grant_type": "authorization_code",
-            "code": code,
-            "redirect_uri": SPOTIFY_REDIRECT_URI,
-        },
-        timeout=15,
-    )
+    try:
+        token_res = await apost_token(
+            {
+                "grant_type": "authorization_code",
+                "code": code,
+                "redirect_uri": SPOTIFY_REDIRECT_URI,
+            },
+            SPOTIFY_CLIENT_ID,
+            SPOTIFY_CLIENT_SECRET,
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(502, f"Token exchange failed: {e}")
     if token_res.status_code != 200:
         raise HTTPException(400, f"Token exchange failed: {token_res.text}")
 
@@ -113,7 +116,7 @@ def spotify_callback(
     access_token = tokens["access_token"]
     refresh_token = tokens.get("refresh_token", "")
 
-    me = _sp_get("/me", access_token)
+    me = await aspotify_get("/me", access_token)
     if isinstance(me, dict) and "error" in me:
         raise HTTPException(400, f"/me failed: {me}")
 
@@ -131,17 +134,8 @@ def spotify_callback(
     return RedirectResponse(f"{target}#{fragment}")
 
 
-# ---- helper to talk to Spotify Web API ----
-
-def _sp_get(path: str, access_token: str, params: Optional[dict] = None):
-    headers = {"Authorization": f"Bearer {access_token}"}
-    url = f"https://api.spotify.com/v1{path}"
-    r = requests.get(url, headers=headers, params=params or {}, timeout=10)
-    try:
-        return r.json()
-    except Exception:
-        return {"error": f"http {r.status_code}", "text": r.text}
-
+# ---- helpers for the Spotify passthrough endpoints ----
+# All Spotify calls go through backend/spotify_client.py (shared connection pool).
 
 def _build_now_playing_from_item(item: dict):
     if not isinstance(item, dict):
@@ -170,20 +164,36 @@ def _build_now_playing_from_item(item: dict):
 
 
 @router.get("/spotify/me", tags=["Spotify"])
-def get_me(access_token: str = Query(...)):
+async def get_me(access_token: str = Query(...)):
     """
     Return the Spotify user profile AND now_playing.
 
     now_playing is taken ONLY from:
     - /me/player/recently-played?limit=1 (most recently played track)
     """
-    profile = _sp_get("/me", access_token)
+    return await response_cache.aget_or_fetch(
+        token_key("me", access_token), lambda: _fetch_me(access_token), ttl=TTL["me"]
+    )
+
+
+async def _fetch_me(access_token: str):
+    # profile and most recently played are independent: fetch them together
+    profile, recent = await asyncio.gather(
+        aspotify_get("/me", access_token),
+        aspotify_get("/me/player/recently-played", access_token, params={"limit": 1}),
+    )
+    return me_payload(profile, recent)
+
+
+def me_payload(profile: dict, recent: dict) -> dict:
+    """
+    /spotify/me body from the /me and /me/player/recently-played?limit=1 responses.
+    """
     if isinstance(profile, dict) and "error" in profile:
         raise HTTPException(400, f"/me failed: {profile}")
 
     # Only use most recently played
     now_playing = None
-    recent = _sp_get("/me/player/recently-played", access_token, params={"limit": 1})
     if isinstance(recent, dict):
         items = recent.get("items") or []
         if items:
@@ -201,8 +211,16 @@ def get_me(access_token: str = Query(...)):
 
 
 @router.get("/spotify/playlists", tags=["Spotify"])
-def get_playlists(access_token: str = Query(...), limit: int = 20, offset: int = 0):
-    data = _sp_get(
+async def get_playlists(access_token: str = Query(...), limit: int = 20, offset: int = 0):
+    return await response_cache.aget_or_fetch(
+        token_key("playlists", access_token, limit, offset),
+        lambda: _fetch_playlists(access_token, limit, offset),
+        ttl=TTL["playlists"],
+    )
+
+
+async def _fetch_playlists(access_token: str, limit: int, offset: int):
+    data = await aspotify_get(
         "/me/playlists",
         access_token,
         params={"limit": limit, "offset": offset},
@@ -213,8 +231,16 @@ def get_playlists(access_token: str = Query(...), limit: int = 20, offset: int =
 
 
 @router.get("/spotify/top-artists", tags=["Spotify"])
-def get_top_artists(access_token: str = Query(...), limit: int = 10, offset: int = 0):
-    data = _sp_get(
+async def get_top_artists(access_token: str = Query(...), limit: int = 10, offset: int = 0):
+    return await response_cache.aget_or_fetch(
+        token_key("top_artists", access_token, limit, offset),
+        lambda: _fetch_top_artists(access_token, limit, offset),
+        ttl=TTL["top_artists"],
+    )
+
+
+async def _fetch_top_artists(access_token: str, limit: int, offset: int):
+    data = await aspotify_get(
         "/me/top/artists",
         access_token,
         params={"limit": limit, "offset": offset},
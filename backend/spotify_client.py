@@ -1,41 +1,290 @@
 """
 Backend Spotify Logic
 @Author: Umaiza Azmat
-@Version: 1.0
+@Version: 1.3
 @Since: 10/03/2025
 Usage:
 Embed and secure spotify data
 Change Log:
 Version 1.0 (10/03/2025):
 Created backend code to embed spotify data
+Version 1.1 (10/17/2026):
+Single Spotify client for every router and worker, on the shared pooled
+connections from http_client (sync + async API)
+Version 1.2 (10/17/2026):
+Requests are budgeted by a global + per-user token bucket scheduler,
+with priorities and 429 Retry-After / jittered backoff retries
+Version 1.3 (10/17/2026):
+Async counterparts for fan-out and the token exchange, used by the
+async route handlers
 """
-# spotify_client.py - minimal wrapper + token refresh stub
-import requests
+# spotify_client.py - the one place that talks to the Spotify Web API
+import asyncio
+import hashlib
+import logging
 import os
-from typing import Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import httpx
+
+from .http_client import get_async_client, get_client
+from .ratelimit import PRIORITY_BULK, PRIORITY_INTERACTIVE, RequestScheduler, backoff_delay
+
+logger = logging.getLogger(__name__)
 
 SPOTIFY_API = "https://api.spotify.com/v1"
 SPOTIFY_TOKEN_URL = "https://accounts.spotify.com/api/token"
 CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID", "")
 CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET", "")
 
-def spotify_get(path: str, access_token: str, params: dict = None):
-    url = f"{SPOTIFY_API}{path}"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    r = requests.get(url, headers=headers, params=params, timeout=10)
-    if r.status_code == 200:
-        return r.json()
-    else:
-        # return None in skeleton; handle errors in callers
-        return {"error": r.status_code, "text": r.text}
+# Request budget (Spotify enforces a rolling per-app window; tune to your app's quota)
+SPOTIFY_RATE_PER_SEC = float(os.getenv("SPOTIFY_RATE_PER_SEC", "10"))
+SPOTIFY_BURST = float(os.getenv("SPOTIFY_BURST", "20"))
+SPOTIFY_USER_RATE_PER_SEC = float(os.getenv("SPOTIFY_USER_RATE_PER_SEC", "4"))
+SPOTIFY_USER_BURST = float(os.getenv("SPOTIFY_USER_BURST", "8"))
+SPOTIFY_MAX_RETRIES = int(os.getenv("SPOTIFY_MAX_RETRIES", "4"))
+SPOTIFY_FANOUT = int(os.getenv("SPOTIFY_FANOUT", "4"))
+# longest Retry-After we honour (it pauses every caller), and how long an
+# interactive request may spend retrying before the error goes back to the user
+SPOTIFY_MAX_RETRY_AFTER = float(os.getenv("SPOTIFY_MAX_RETRY_AFTER", "60"))
+SPOTIFY_INTERACTIVE_RETRY_BUDGET = float(os.getenv("SPOTIFY_INTERACTIVE_RETRY_BUDGET", "5"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+scheduler = RequestScheduler(
+    SPOTIFY_RATE_PER_SEC,
+    SPOTIFY_BURST,
+    per_key_rate=SPOTIFY_USER_RATE_PER_SEC,
+    per_key_burst=SPOTIFY_USER_BURST,
+)
+
+
+def _url(path: str) -> str:
+    # accepts "/me/playlists" or a full URL (e.g. a paging "next" link)
+    return path if path.startswith("http") else f"{SPOTIFY_API}{path}"
+
+
+def _headers(access_token: str) -> dict:
+    return {"Authorization": f"Bearer {access_token}"}
+
+
+def _budget_key(access_token: str, user_key: Optional[str]) -> str:
+    # per-user bucket; fall back to a digest of the token (never keep raw tokens around)
+    if user_key:
+        return f"user:{user_key}"
+    return "token:" + hashlib.sha1((access_token or "").encode()).hexdigest()[:16]
+
+
+def _retry_delay(r: httpx.Response, attempt: int) -> float:
+    """
+    Honour Retry-After on 429, capped at SPOTIFY_MAX_RETRY_AFTER (plus a little
+    jitter); jittered backoff otherwise.
+    """
+    retry_after = r.headers.get("Retry-After")
+    if r.status_code == 429 and retry_after and retry_after.strip().isdigit():
+        return min(int(retry_after), SPOTIFY_MAX_RETRY_AFTER) + backoff_delay(0, base=1.0)
+    return backoff_delay(attempt)
+
+
+def _over_budget(priority: int, started: float, delay: float) -> bool:
+    # interactive callers get the error back rather than sleeping past a request-scale budget
+    return priority <= PRIORITY_INTERACTIVE and time.monotonic() - started + delay > SPOTIFY_INTERACTIVE_RETRY_BUDGET
+
+
+def to_result(r: httpx.Response) -> dict:
+    """
+    Normalise a Spotify response: the JSON body on success, {} for 204,
+    and a dict with 'error' (the HTTP status) on failure.
+    """
+    if r.status_code == 204:
+        return {}
+    try:
+        data = r.json()
+    except ValueError:
+        data = None
+    if r.status_code >= 400:
+        out = {"error": r.status_code, "text": r.text}
+        if r.status_code == 429:
+            out["retry_after"] = r.headers.get("Retry-After")
+        return out
+    return data if isinstance(data, dict) else {"error": "bad_json", "text": r.text}
+
+
+def spotify_request(
+    path: str,
+    access_token: str,
+    params: Optional[dict] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    user_key: Optional[str] = None,
+) -> httpx.Response:
+    """
+    Raw GET returning the httpx response, after waiting for rate budget.
+    429 / 5xx / network errors are retried with backoff (429 pauses every caller
+    for Retry-After, capped). Interactive callers get the 429/5xx back instead
+    once retrying would exceed SPOTIFY_INTERACTIVE_RETRY_BUDGET.
+    Raises httpx.HTTPError if the network keeps failing.
+    """
+    url = _url(path)
+    key = _budget_key(access_token, user_key)
+    started = time.monotonic()
+    for attempt in range(SPOTIFY_MAX_RETRIES + 1):
+        scheduler.acquire(key, priority)
+        try:
+            r = get_client(url).get(url, headers=_headers(access_token), params=params)
+        except httpx.TransportError:
+            if attempt == SPOTIFY_MAX_RETRIES:
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+        if r.status_code not in RETRY_STATUSES or attempt == SPOTIFY_MAX_RETRIES:
+            return r
+        delay = _retry_delay(r, attempt)
+        if r.status_code == 429:
+            scheduler.pause(delay)
+        if _over_budget(priority, started, delay):
+            return r
+        logger.info("Spotify %s on %s, retrying in %.1fs", r.status_code, path, delay)
+        if r.status_code != 429:
+            time.sleep(delay)
+    return r
+
+
+async def aspotify_request(
+    path: str,
+    access_token: str,
+    params: Optional[dict] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    user_key: Optional[str] = None,
+) -> httpx.Response:
+    url = _url(path)
+    key = _budget_key(access_token, user_key)
+    started = time.monotonic()
+    for attempt in range(SPOTIFY_MAX_RETRIES + 1):
+        await scheduler.aacquire(key, priority)
+        try:
+            r = await get_async_client(url).get(url, headers=_headers(access_token), params=params)
+        except httpx.TransportError:
+            if attempt == SPOTIFY_MAX_RETRIES:
+                raise
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+        if r.status_code not in RETRY_STATUSES or attempt == SPOTIFY_MAX_RETRIES:
+            return r
+        delay = _retry_delay(r, attempt)
+        if r.status_code == 429:
+            scheduler.pause(delay)
+        if _over_budget(priority, started, delay):
+            return r
+        logger.info("Spotify %s on %s, retrying in %.1fs", r.status_code, path, delay)
+        if r.status_code != 429:
+            await asyncio.sleep(delay)
+    return r
+
+
+def spotify_get(path: str, access_token: str, params: dict = None, priority: int = PRIORITY_INTERACTIVE, user_key: Optional[str] = None):
+    """
+    Safe GET that never raises; returns a dict with 'error' on failure.
+    Background jobs pass priority=PRIORITY_BULK and their user_id as user_key.
+    """
+    try:
+        return to_result(spotify_request(path, access_token, params, priority, user_key))
+    except httpx.HTTPError as e:
+        return {"error": "network", "message": str(e)}
+
+
+async def aspotify_get(path: str, access_token: str, params: dict = None, priority: int = PRIORITY_INTERACTIVE, user_key: Optional[str] = None):
+    try:
+        return to_result(await aspotify_request(path, access_token, params, priority, user_key))
+    except httpx.HTTPError as e:
+        return {"error": "network", "message": str(e)}
+
+
+def spotify_get_many(
+    calls: List[Tuple[str, Optional[dict]]],
+    access_token: str,
+    concurrency: int = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    user_key: Optional[str] = None,
+) -> List[dict]:
+    """
+    Run several safe GETs concurrently (bounded by `concurrency`, and still within
+    the scheduler's rate budget). `calls` is [(path, params), ...]; results come
+    back in the same order.
+    """
+    if not calls:
+        return []
+    workers = max(1, min(concurrency or SPOTIFY_FANOUT, len(calls)))
+    if workers == 1:
+        return [spotify_get(path, access_token, params, priority, user_key) for path, params in calls]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="spotify-fanout") as pool:
+        futures = [pool.submit(spotify_get, path, access_token, params, priority, user_key) for path, params in calls]
+        return [f.result() for f in futures]
+
+
+async def aspotify_get_many(
+    calls: List[Tuple[str, Optional[dict]]],
+    access_token: str,
+    concurrency: int = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    user_key: Optional[str] = None,
+) -> List[dict]:
+    """
+    Async spotify_get_many: at most `concurrency` calls in flight, results in order.
+    """
+    sem = asyncio.Semaphore(max(1, concurrency or SPOTIFY_FANOUT))
+
+    async def one(path, params):
+        async with sem:
+            return await aspotify_get(path, access_token, params, priority, user_key)
+
+    return list(await asyncio.gather(*(one(path, params) for path, params in calls)))
+
+
+def spotify_get_all(
+    path: str,
+    access_token: str,
+    params: Optional[dict] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    user_key: Optional[str] = None,
+) -> Tuple[List[dict], Optional[dict]]:
+    """
+    Follow a paging object's 'next' links until the end.
+    Returns (items, error): error is the failing response (items so far are kept).
+    """
+    items: List[dict] = []
+    data = spotify_get(path, access_token, params, priority, user_key)
+    while True:
+        if not isinstance(data, dict) or "error" in data:
+            return items, data
+        items.extend(data.get("items") or [])
+        nxt = data.get("next")
+        if not nxt:
+            return items, None
+        data = spotify_get(nxt, access_token, None, priority, user_key)
+
+
+def post_token(data: dict, client_id: str = None, client_secret: str = None) -> httpx.Response:
+    """
+    POST to the accounts token endpoint (code exchange / refresh) with client basic auth.
+    """
+    auth = (client_id or CLIENT_ID, client_secret or CLIENT_SECRET)
+    return get_client(SPOTIFY_TOKEN_URL).post(SPOTIFY_TOKEN_URL, data=data, auth=auth, timeout=15)
+
+
+async def apost_token(data: dict, client_id: str = None, client_secret: str = None) -> httpx.Response:
+    auth = (client_id or CLIENT_ID, client_secret or CLIENT_SECRET)
+    return await get_async_client(SPOTIFY_TOKEN_URL).post(SPOTIFY_TOKEN_URL, data=data, auth=auth, timeout=15)
+
 
 def refresh_spotify_token(refresh_token: str) -> Optional[dict]:
     # Stub: implement PKCE / refresh flow for production.
     payload = {"grant_type": "refresh_token", "refresh_token": refresh_token, "client_id": CLIENT_ID}
-    r = requests.post(SPOTIFY_TOKEN_URL, data=payload, auth=(CLIENT_ID, CLIENT_SECRET))
+    try:
+        r = post_token(payload)
+    except httpx.HTTPError:
+        return None
     if r.status_code == 200:
         return r.json()
     else:
         return None
-
-
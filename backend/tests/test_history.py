@@ -0,0 +1,66 @@
+# tests/test_history.py - listening history ingestion (run: python -m pytest backend/tests)
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import crud, history, models
+from backend.db import Base
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _plays(n, start=datetime(2024, 1, 1)):
+    return [
+        {"user_id": "u1", "track_id": f"t{i}", "track_name": "song", "artist_id": "a1", "artist_name": "artist",
+         "ms_played": None, "source": "api", "played_at": start + timedelta(minutes=i)}
+        for i in range(n)
+    ]
+
+
+def test_insert_listening_history_counts_only_new_plays(db):
+    rows = _plays(5)
+    assert crud.insert_listening_history(db, rows) == 5
+    db.commit()
+    assert crud.insert_listening_history(db, rows) == 0
+    db.commit()
+    assert db.query(models.ListeningHistory).count() == 5
+
+
+def test_backward_walk_resumes_from_saved_cursor(db, monkeypatch):
+    user = models.User(id="u1", email="u1@example.com", username="u1", password_hash="x", spotify_access_token="t")
+    db.add(user)
+    db.commit()
+    now = datetime.utcnow().replace(microsecond=0)
+    plays = [now - timedelta(minutes=i) for i in range(2 * history.RECENT_PAGE_SIZE + 10)]  # newest first
+    calls = []
+
+    def fake_get(path, token, params=None, **kwargs):
+        calls.append(dict(params))
+        if len(calls) == 2:
+            return {"error": 503}  # fail on page 2 of the first run
+        before = history._from_ms(params["before"])
+        page = [p for p in plays if p < before][:params["limit"]]
+        items = [{"played_at": p.isoformat() + "Z", "track": {"id": f"t{p:%H%M}", "artists": [{"id": "a1"}]}} for p in page]
+        return {"items": items, "cursors": {"before": str(history._to_ms(page[-1]))} if page else None}
+
+    monkeypatch.setattr(history.spotify_client, "spotify_get", fake_get)
+    with pytest.raises(RuntimeError):
+        history.ingest_recent(db, user)
+    assert user.history_played_until is None  # still walking back
+    assert user.history_backfill_before == plays[history.RECENT_PAGE_SIZE - 1]
+
+    history.ingest_recent(db, user)
+    assert "before" in calls[2] and history._from_ms(calls[2]["before"]) == plays[history.RECENT_PAGE_SIZE - 1]
+    assert db.query(models.ListeningHistory).count() == len(plays)
+    assert user.history_played_until == plays[0]
+    assert user.history_backfill_before is None
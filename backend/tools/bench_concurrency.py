@@ -0,0 +1,164 @@
+"""
+Concurrency Benchmark
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    Measures how many Spotify-bound requests one worker keeps in flight, for
+    the old sync handler shape (def + blocking client, one threadpool thread
+    per request) versus the async handlers. Spotify is replaced by an
+    in-process mock with a fixed latency (http_client.set_transport_factory),
+    and requests go straight into the ASGI app, so no network or server is needed:
+
+        python -m backend.tools.bench_concurrency
+        python -m backend.tools.bench_concurrency -n 1000 --latency 0.3
+
+    Prints wall time, throughput and the peak number of concurrent upstream
+    calls per variant. The sync variant tops out at the threadpool size (40 by
+    default); the async one is limited only by -n here. In production the
+    per-host pool (HTTP_MAX_CONNECTIONS_PER_HOST) and the Spotify rate budget
+    apply on top, which this benchmark turns off.
+
+    Measured (Python 3.11, 1 CPU, 200 ms mock latency):
+
+        -n 200   sync def   1.23 s   163 req/s   peak 40
+                 async def  0.37 s   534 req/s   peak 200
+        -n 400   sync def   2.29 s   175 req/s   peak 40
+                 async def  0.60 s   663 req/s   peak 400
+
+    (A review run at -n 200 saw sync 1.21 s / 165 req/s / peak 40 and
+    async 0.52 s / 386 req/s / peak 200.) The sync shape is capped at 40 in
+    flight, about 40 / 0.2 s = 200 req/s at best. The async handlers keep every
+    request in flight at once, so wall time approaches one upstream latency plus
+    framework overhead.
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+
+class _Upstream:
+    """
+    Mock Spotify: every call takes `latency` seconds; tracks peak concurrency.
+    """
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.calls = 0
+
+    def _enter(self):
+        with self.lock:
+            self.active += 1
+            self.calls += 1
+            self.peak = max(self.peak, self.active)
+
+    def _leave(self):
+        with self.lock:
+            self.active -= 1
+
+    def reset(self):
+        with self.lock:
+            self.active = self.peak = self.calls = 0
+
+    @staticmethod
+    def _body():
+        return {"items": [{"name": "Daft Punk", "id": "4tZwfgrHOc3mvqYlEYSvVi"}], "next": None}
+
+    def sync_handler(self, request):
+        import httpx
+        self._enter()
+        try:
+            time.sleep(self.latency)
+            return httpx.Response(200, json=self._body())
+        finally:
+            self._leave()
+
+    async def async_handler(self, request):
+        import httpx
+        self._enter()
+        try:
+            await asyncio.sleep(self.latency)
+            return httpx.Response(200, json=self._body())
+        finally:
+            self._leave()
+
+
+def _build_app():
+    from fastapi import FastAPI, HTTPException, Query
+
+    from .. import spotify_auth
+    from ..spotify_client import spotify_get
+
+    app = FastAPI()
+    app.include_router(spotify_auth.router)
+
+    # the pre-async handler, kept here as the baseline
+    @app.get("/legacy/top-artists")
+    def legacy_top_artists(access_token: str = Query(...), limit: int = 10, offset: int = 0):
+        data = spotify_get("/me/top/artists", access_token, params={"limit": limit, "offset": offset})
+        if isinstance(data, dict) and "error" in data:
+            raise HTTPException(400, f"/me/top/artists failed: {data}")
+        return data
+
+    return app
+
+
+async def _run(app, path: str, n: int, upstream: _Upstream) -> dict:
+    import httpx
+
+    upstream.reset()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        # distinct tokens so the response cache never answers for the upstream
+        responses = await asyncio.gather(
+            *(client.get(path, params={"access_token": f"bench-{i}-{time.time_ns()}"}) for i in range(n))
+        )
+        elapsed = time.perf_counter() - started
+    ok = sum(1 for r in responses if r.status_code == 200)
+    return {"ok": ok, "elapsed": elapsed, "rps": n / elapsed, "peak": upstream.peak, "calls": upstream.calls}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--requests", type=int, default=400, help="concurrent requests per variant (default 400)")
+    parser.add_argument("--latency", type=float, default=0.2, help="mock Spotify latency in seconds (default 0.2)")
+    args = parser.parse_args(argv)
+
+    # benchmark the handlers, not the rate limiter
+    os.environ.setdefault("SPOTIFY_RATE_PER_SEC", "1000000")
+    os.environ.setdefault("SPOTIFY_BURST", "1000000")
+    os.environ.setdefault("SPOTIFY_USER_RATE_PER_SEC", "1000000")
+    os.environ.setdefault("SPOTIFY_USER_BURST", "1000000")
+
+    import httpx
+
+    from .. import http_client
+
+    upstream = _Upstream(args.latency)
+    http_client.set_transport_factory(
+        lambda is_async: httpx.MockTransport(upstream.async_handler if is_async else upstream.sync_handler)
+    )
+    app = _build_app()
+
+    print(f"{args.requests} concurrent requests, upstream latency {args.latency * 1000:.0f} ms")
+    print(f"{'variant':<28}{'ok':>6}{'wall s':>9}{'req/s':>9}{'peak in flight':>16}")
+    for label, path in (("sync def (before)", "/legacy/top-artists"), ("async def (after)", "/spotify/top-artists")):
+        res = asyncio.run(_run(app, path, args.requests, upstream))
+        print(f"{label:<28}{res['ok']:>6}{res['elapsed']:>9.2f}{res['rps']:>9.0f}{res['peak']:>16}")
+    http_client.set_transport_factory(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Build Artist Origin Index
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    Build backend/data/artist_origins.idx (see backend/origin_index.py) from a
+    MusicBrainz JSON artist dump, streamed so the dump never sits in memory:
+
+        python -m backend.tools.build_origin_index artist.tar.xz
+        python -m backend.tools.build_origin_index mbdump/artist -o my.idx
+        python -m backend.tools.build_origin_index extra.tsv --format tsv
+
+    JSON input: one artist object per line (the "artist" file inside
+    https://data.metabrainz.org/pub/musicbrainz/data/json-dumps/.../artist.tar.xz).
+    TSV input: "name<TAB>country" per line.
+    Artist aliases are indexed too. When several artists share a normalised
+    name, the one with the most rating votes wins (first seen on a tie).
+    Countries are written as full names (backend/countries.py), matching the
+    seeds and COUNTRY_TO_REGION.
+
+    The build is an external sort, so memory stays flat whatever the dump
+    size: rows are sorted in runs of --chunk records into temp files, the runs
+    are merged, and the merged stream is written straight into the index.
+
+    The generated file is not committed; run this once per deployment (the
+    backend works without it, see backend/origin_index.py).
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+import argparse
+import codecs
+import heapq
+import json
+import os
+import sys
+import tarfile
+import tempfile
+from contextlib import contextmanager
+from itertools import groupby
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from ..countries import country_name
+from ..origin_index import INDEX_PATH, normalize_key, write_sorted_index
+
+RUN_SIZE = 500_000  # records per sorted run
+
+Row = Tuple[str, int, int, str]  # (key, -votes, seq, country): sorts best-first within a key
+
+
+def _country_of(artist: dict) -> Optional[str]:
+    if artist.get("country"):
+        return artist["country"]
+    for key in ("area", "begin-area", "begin_area"):
+        area = artist.get(key)
+        if isinstance(area, dict):
+            codes = area.get("iso-3166-1-codes") or area.get("iso_3166_1_codes")
+            if codes:
+                return codes[0]
+    return None
+
+
+@contextmanager
+def _open_dump(path: str) -> Iterator[TextIO]:
+    if path == "-":
+        yield sys.stdin
+        return
+    if path.endswith((".tar.xz", ".tar.gz", ".tar.bz2", ".tar")):
+        with tarfile.open(path, "r|*") as tar:  # stream mode: no random access needed
+            for member in tar:
+                if member.isfile() and member.name.endswith("mbdump/artist"):
+                    # codecs reader: a stream-mode member isn't seekable, which TextIOWrapper needs
+                    with codecs.getreader("utf-8")(tar.extractfile(member)) as stream:
+                        yield stream
+                    return
+        raise SystemExit(f"no mbdump/artist member in {path}")
+    with open(path, encoding="utf-8") as stream:
+        yield stream
+
+
+def iter_json(stream: TextIO) -> Iterator[Tuple[str, str, int]]:
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            artist = json.loads(line)
+        except ValueError:
+            continue
+        country = _country_of(artist)
+        if not country:
+            continue
+        votes = ((artist.get("rating") or {}).get("votes-count")) or 0
+        names = [artist.get("name")] + [a.get("name") for a in artist.get("aliases") or []]
+        for name in names:
+            if name:
+                yield name, country, votes
+
+
+def iter_tsv(stream: TextIO) -> Iterator[Tuple[str, str, int]]:
+    for line in stream:
+        name, _, country = line.rstrip("\n").partition("\t")
+        if name and country:
+            yield name, country.strip(), 0
+
+
+def _write_run(rows: List[Row], tmpdir: str) -> str:
+    rows.sort()
+    fd, path = tempfile.mkstemp(dir=tmpdir, suffix=".run")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        for key, neg_votes, seq, country in rows:
+            f.write(f"{key}\t{neg_votes}\t{seq}\t{country}\n")
+    return path
+
+
+def _read_run(path: str) -> Iterator[Row]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            key, neg_votes, seq, country = line.rstrip("\n").split("\t")
+            yield key, int(neg_votes), int(seq), country
+
+
+def sorted_runs(rows: Iterable[Tuple[str, str, int]], tmpdir: str, run_size: int = RUN_SIZE) -> List[str]:
+    """
+    Normalise (name, country, votes) rows and spill them as sorted run files.
+    """
+    runs, buf = [], []
+    for seq, (name, country, votes) in enumerate(rows):
+        key = normalize_key(name)
+        country = country_name(country)
+        if not key or not country or "\t" in key or "\n" in key or "\t" in country:
+            continue
+        buf.append((key, -int(votes), seq, country))
+        if len(buf) >= run_size:
+            runs.append(_write_run(buf, tmpdir))
+            buf = []
+    if buf:
+        runs.append(_write_run(buf, tmpdir))
+    return runs
+
+
+def merge_runs(runs: List[str]) -> Iterator[Tuple[str, str]]:
+    """
+    Merge sorted runs into (key, country) for the best row of each key, in key order.
+    """
+    merged = heapq.merge(*(_read_run(path) for path in runs))
+    for key, group in groupby(merged, key=lambda row: row[0]):
+        yield key, next(group)[3]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="MusicBrainz artist dump (.tar.xz, plain JSON lines, or '-')")
+    parser.add_argument("-o", "--output", default=INDEX_PATH)
+    parser.add_argument("--format", choices=["json", "tsv"], default="json")
+    parser.add_argument("--chunk", type=int, default=RUN_SIZE, help="records per sorted run (memory vs. temp files)")
+    args = parser.parse_args(argv)
+
+    rows = iter_tsv if args.format == "tsv" else iter_json
+    with tempfile.TemporaryDirectory(prefix="origin-index-") as tmpdir:
+        with _open_dump(args.source) as stream:
+            runs = sorted_runs(rows(stream), tmpdir, args.chunk)
+        count = write_sorted_index(args.output, merge_runs(runs))
+    print(f"wrote {count} artists to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Import Streaming History Export
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    Load a user's Spotify "Extended streaming history" export into
+    listening_history (streamed, constant memory; safe to re-run):
+
+        python -m backend.tools.import_history_export USER_ID my_spotify_data.zip
+        python -m backend.tools.import_history_export USER_ID "Spotify Extended Streaming History/"
+        python -m backend.tools.import_history_export USER_ID export.zip --queue
+
+    --queue hands the file to the job workers instead (the path must be
+    readable from the worker hosts); progress is then on /jobs/{id}.
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+import argparse
+import os
+import sys
+
+from .. import history, jobs
+from ..db import WorkerSessionLocal
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("user_id")
+    parser.add_argument("path", help="export .zip, its folder, or one Streaming_History_Audio_*.json")
+    parser.add_argument("--queue", action="store_true", help="enqueue a history job instead of importing here")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        raise SystemExit(f"{args.path}: no such file or directory")
+    db = WorkerSessionLocal()
+    try:
+        if args.queue:
+            job, created = jobs.enqueue(db, "history", args.user_id,
+                                        payload={"export_path": os.path.abspath(args.path)}, dedup=False)
+            print(f"queued job {job.id}")
+            return
+
+        def progress(done, total=None, message=None):
+            print(f"\r{done} plays read, {message}", end="", file=sys.stderr, flush=True)
+
+        inserted = history.ingest_export(db, args.user_id, args.path, progress)
+        print(f"\n{inserted} new plays imported", file=sys.stderr)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
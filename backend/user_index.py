@@ -0,0 +1,326 @@
+"""
+"Users Like You" Index
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    Every user with artists is an embedding (embed()) of their current
+    library: four feature-hashed blocks, each L2-normalised and scaled by
+    sqrt(weight), so the cosine of two embeddings is the weighted sum of the
+    per-block cosines:
+
+        country  (artists per origin country)      COUNTRY_WEIGHT
+        region   (artists per region)              REGION_WEIGHT
+        genre    (artists' genres, track-weighted) GENRE_WEIGHT
+        artist   (user_artists, track-weighted)   ARTIST_WEIGHT
+
+    Embeddings live in an LSHIndex (random-hyperplane / SimHash, several
+    tables, multi-probe), so a query only scores the users in matching
+    buckets instead of everyone:
+
+        similar_users(db, user_id, k=10)   # [(user_id, cosine), ...]
+
+    The index is per process and incremental. In the app it is built off the
+    request path: start_background() (a startup hook) embeds every user with
+    artists in a daemon thread, then every USER_INDEX_REFRESH_SECONDS
+    re-embeds only users whose User.library_changed_at is newer than the last
+    refresh. Sync and enrichment stamp it (with library_version) whenever
+    they change a user's artists or those artists' origins, so the index
+    follows library changes whether or not anyone opens a passport.
+    Queries never wait for it: until the first build finishes they are
+    answered from the users embedded so far (stats()["ready"] is False).
+    Without the background thread (scripts, shell) similar_users() refreshes
+    inline instead.
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+# user_index.py - user embeddings + LSH nearest-neighbour index
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from . import crud, similarity
+from .utils import chunked
+
+logger = logging.getLogger(__name__)
+
+COUNTRY_WEIGHT = float(os.getenv("USER_INDEX_COUNTRY_WEIGHT", "0.3"))
+REGION_WEIGHT = float(os.getenv("USER_INDEX_REGION_WEIGHT", "0.1"))
+GENRE_WEIGHT = float(os.getenv("USER_INDEX_GENRE_WEIGHT", "0.35"))
+ARTIST_WEIGHT = float(os.getenv("USER_INDEX_ARTIST_WEIGHT", "0.25"))
+LSH_TABLES = int(os.getenv("USER_INDEX_LSH_TABLES", "8"))
+LSH_BITS = int(os.getenv("USER_INDEX_LSH_BITS", "12"))
+USER_INDEX_REFRESH_SECONDS = float(os.getenv("USER_INDEX_REFRESH_SECONDS", "30"))
+REFRESH_OVERLAP_SECONDS = 5
+CANDIDATE_FACTOR = 4  # probe neighbouring buckets until we have k * this many candidates
+EMBED_CHUNK = 200
+
+# (name, dimensions, weight)
+BLOCKS = (
+    ("country", 64, COUNTRY_WEIGHT),
+    ("region", 16, REGION_WEIGHT),
+    ("genre", 128, GENRE_WEIGHT),
+    ("artist", 256, ARTIST_WEIGHT),
+)
+DIM = sum(size for _, size, _ in BLOCKS)
+
+
+@lru_cache(maxsize=65536)
+def _slot(feature: str, size: int) -> Tuple[int, float]:
+    # stable feature hashing: bucket + sign (the sign keeps collisions unbiased)
+    h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return h % size, (1.0 if (h >> 63) & 1 else -1.0)
+
+
+def embed(features: Dict[str, Dict[str, float]]) -> np.ndarray:
+    """
+    features: {"country": {"US": 12, ...}, "region": {...}, "genre": {...}, "artist": {...}}
+    -> unit-length float32 vector of DIM (all zeros if there are no features).
+    """
+    vec = np.zeros(DIM, dtype=np.float32)
+    offset = 0
+    for name, size, weight in BLOCKS:
+        block = vec[offset:offset + size]
+        for key, value in (features.get(name) or {}).items():
+            if key and key != "Unknown" and value:
+                i, sign = _slot(key, size)
+                block[i] += sign * float(value)
+        norm = np.linalg.norm(block)
+        if norm > 0:
+            block *= np.sqrt(weight) / norm
+        offset += size
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+class LSHIndex:
+    """
+    Random-hyperplane LSH over unit vectors: each table hashes a vector to the
+    sign pattern of `bits` projections. Nearby vectors (small angle) share
+    buckets with high probability; queries re-rank the candidates by exact cosine.
+    """
+    def __init__(self, dim: int, tables: int = LSH_TABLES, bits: int = LSH_BITS, seed: int = 7):
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((tables, bits, dim)).astype(np.float32)
+        self.powers = (1 << np.arange(bits, dtype=np.int64))
+        self.bits = bits
+        self.buckets: List[Dict[int, Set[str]]] = [defaultdict(set) for _ in range(tables)]
+        self.vectors: Dict[str, np.ndarray] = {}
+        self.signatures: Dict[str, Tuple[int, ...]] = {}
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def __contains__(self, key: str):
+        return key in self.vectors
+
+    def _signature(self, vec: np.ndarray) -> Tuple[int, ...]:
+        positive = (self.planes @ vec) > 0  # tables x bits
+        return tuple(int(x) for x in positive.astype(np.int64) @ self.powers)
+
+    def upsert(self, key: str, vec: np.ndarray):
+        sig = self._signature(vec)
+        with self.lock:
+            self.remove(key)
+            if not vec.any():
+                return  # nothing to compare on
+            self.vectors[key] = vec
+            self.signatures[key] = sig
+            for table, bucket in zip(self.buckets, sig):
+                table[bucket].add(key)
+
+    def remove(self, key: str):
+        with self.lock:
+            sig = self.signatures.pop(key, None)
+            self.vectors.pop(key, None)
+            if sig is None:
+                return
+            for table, bucket in zip(self.buckets, sig):
+                members = table.get(bucket)
+                if members is not None:
+                    members.discard(key)
+                    if not members:
+                        del table[bucket]
+
+    def _candidates(self, sig: Tuple[int, ...], want: int) -> Set[str]:
+        found: Set[str] = set()
+        for table, bucket in zip(self.buckets, sig):
+            found |= table.get(bucket, set())
+        if len(found) >= want:
+            return found
+        # multi-probe: buckets one bit away, table by table, until we have enough
+        for table, bucket in zip(self.buckets, sig):
+            for b in range(self.bits):
+                found |= table.get(bucket ^ (1 << b), set())
+            if len(found) >= want:
+                break
+        return found
+
+    def query(self, vec: np.ndarray, k: int = 10, exclude: Iterable[str] = ()) -> Tuple[List[Tuple[str, float]], int]:
+        """
+        Top-k (key, cosine) for a unit vector, and how many candidates were scored.
+        """
+        if not vec.any():
+            return [], 0
+        skip = set(exclude)
+        with self.lock:
+            keys = [c for c in self._candidates(self._signature(vec), (k + len(skip)) * CANDIDATE_FACTOR) if c not in skip]
+            if not keys:
+                return [], 0
+            matrix = np.stack([self.vectors[c] for c in keys])
+        scores = matrix @ vec
+        top = np.argsort(-scores)[:k]
+        return [(keys[i], float(scores[i])) for i in top], len(keys)
+
+
+_index = LSHIndex(DIM)
+_refresh_lock = threading.Lock()
+_watermark: Optional[datetime] = None
+_last_refresh = 0.0
+_ready = threading.Event()  # first full build done
+_builder: Optional[threading.Thread] = None
+_builder_stop = threading.Event()
+
+
+def _artist_features(db: Session, user_ids: List[str]) -> Dict[str, Dict[str, Dict[str, float]]]:
+    out: Dict[str, Dict[str, Dict[str, float]]] = {uid: {"genre": {}, "artist": {}} for uid in user_ids}
+    for uid, artist_id, track_count, genres, _country in similarity.load_memberships(db, user_ids):
+        w = float(max(track_count or 0, 1))
+        feats = out[uid]
+        feats["artist"][artist_id] = w
+        for genre in genres or ():
+            feats["genre"][genre] = feats["genre"].get(genre, 0.0) + w
+    return out
+
+
+def _library_features(artist_feats: Dict[str, Dict[str, float]], histogram) -> Dict[str, Dict[str, float]]:
+    feats = dict(artist_feats)
+    countries: Dict[str, float] = {}
+    regions: Dict[str, float] = {}
+    for country, region, count in histogram:
+        countries[country] = countries.get(country, 0) + count
+        regions[region] = regions.get(region, 0) + count
+    feats["country"] = countries
+    feats["region"] = regions
+    return feats
+
+
+def _embed_users(db: Session, user_ids: List[str]) -> int:
+    # three queries per EMBED_CHUNK users; users with no artists left drop out of the index
+    for chunk in chunked(list(user_ids), EMBED_CHUNK):
+        artist_feats = _artist_features(db, chunk)
+        histograms = crud.country_histograms(db, chunk)
+        for uid in chunk:
+            _index.upsert(uid, embed(_library_features(artist_feats[uid], histograms.get(uid, ()))))
+    return len(user_ids)
+
+
+def refresh(db: Session, force: bool = False) -> int:
+    """
+    Re-embed users whose library changed since the last refresh. Returns how many.
+    """
+    global _watermark, _last_refresh
+    with _refresh_lock:
+        if not force and time.monotonic() - _last_refresh < USER_INDEX_REFRESH_SECONDS:
+            return 0
+        # look back a little: a change committed late may carry an earlier library_changed_at
+        since = _watermark - timedelta(seconds=REFRESH_OVERLAP_SECONDS) if _watermark else None
+        started = datetime.utcnow()
+        changed = crud.library_changed_users(db, since)
+        updated = _embed_users(db, [uid for uid, _ in changed])
+        stamps = [ts for _, ts in changed if ts]
+        if since is None:
+            stamps.append(started - timedelta(seconds=REFRESH_OVERLAP_SECONDS))
+        if stamps:
+            _watermark = max(stamps + [_watermark] if _watermark else stamps)
+        _last_refresh = time.monotonic()
+        if updated:
+            logger.info("user index: %d users re-embedded (%d indexed)", updated, len(_index))
+        return updated
+
+
+def start_background(session_factory, interval: float = USER_INDEX_REFRESH_SECONDS):
+    """
+    Start (once) a daemon thread that builds the index, then refreshes it every `interval` seconds.
+    """
+    global _builder
+    if _builder is not None and _builder.is_alive():
+        return
+    _builder_stop.clear()
+
+    def run():
+        while True:
+            db = session_factory()
+            try:
+                refresh(db, force=True)
+                _ready.set()
+            except Exception:
+                db.rollback()
+                logger.exception("user index refresh failed")
+            finally:
+                db.close()
+            if _builder_stop.wait(interval):
+                return
+
+    _builder = threading.Thread(target=run, name="user-index", daemon=True)
+    _builder.start()
+
+
+def stop_background():
+    _builder_stop.set()
+
+
+def _background_running() -> bool:
+    return _builder is not None and _builder.is_alive() and not _builder_stop.is_set()
+
+
+def embed_user(db: Session, user_id: str) -> np.ndarray:
+    """
+    Embedding from the user's current library (the same one refresh() builds).
+    """
+    feats = _artist_features(db, [user_id])[user_id]
+    return embed(_library_features(feats, crud.country_histogram(db, user_id)))
+
+
+def remove_user(user_id: str):
+    _index.remove(user_id)
+
+
+def similar_users(db: Session, user_id: str, k: int = 10) -> Tuple[List[Tuple[str, float]], int]:
+    """
+    The k users most similar to `user_id` as [(user_id, cosine)], plus the
+    number of candidates scored.
+    """
+    if not _background_running():
+        refresh(db)
+    vec = _index.vectors.get(user_id)
+    if vec is None:
+        vec = embed_user(db, user_id)
+        _index.upsert(user_id, vec)
+    return _index.query(vec, k, exclude=(user_id,))
+
+
+def stats() -> dict:
+    return {
+        "ready": _ready.is_set(),
+        "indexed_users": len(_index),
+        "tables": len(_index.buckets),
+        "bits": _index.bits,
+        "buckets": sum(len(t) for t in _index.buckets),
+        "watermark": _watermark.isoformat() if _watermark else None,
+    }
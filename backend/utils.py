@@ -11,23 +11,56 @@ Created backend code helper for geocoding
 """
 # utils.py - small helpers for enrichment and geocoding (stubs)
 import time
-from typing import Optional, Dict
+from datetime import datetime
+from typing import Optional, Dict, Iterator, List, Sequence
+from .artist_names import NameIndex
+from .countries import country_name as _country_name
+from . import origin_index
+
+# hand-curated origins (matched on exact normalised names); countries are full names like everywhere else
+KNOWN_ARTISTS = NameIndex({
+    "The Beatles": {"country": _country_name("GB"), "region": "England", "lat": 53.4, "lon": -2.97},
+})
+
+# approximate centroids, keyed by full country name (countries.country_name())
+COUNTRY_COORDS = {
+    "United States": {"lat": 39.8, "lon": -98.6},
+    "United Kingdom": {"lat": 54.0, "lon": -2.0},
+}
 
 def musicbrainz_lookup_artist(name: str) -> Optional[Dict]:
     """
-    Stub: replace with real MusicBrainz calls.
-    Return a dict like {"country": "GB", "region": "England", "lat": 51.5, "lon": -0.1}
+    Offline origin lookup (curated names, then the bundled origin index).
+    Return a dict like {"country": "United Kingdom", "region": "England", "lat": 51.5, "lon": -0.1}
     """
-    # naive hack for demo:
-    if "beatles" in name.lower():
-        return {"country": "GB", "region": "England", "lat": 53.4, "lon": -2.97}
+    known = KNOWN_ARTISTS.get(name)
+    if known:
+        return dict(known)
+    country = origin_index.lookup(name)
+    if country:
+        coords = geocode_country(country) or {}
+        return {"country": country, "region": None, "lat": coords.get("lat"), "lon": coords.get("lon")}
     return None
 
 def geocode_country(country_name: str) -> Optional[Dict]:
-    # stub: convert country to approximate lat/lon
-    mapping = {"United States": {"lat": 39.8, "lon": -98.6}, "GB": {"lat": 54.0, "lon": -2.0}}
-    return mapping.get(country_name) or mapping.get(country_name[:2]) or None
+    # stub: convert country (full name or ISO code) to approximate lat/lon
+    coords = COUNTRY_COORDS.get(_country_name(country_name))
+    return dict(coords) if coords else None
 
 def now_iso():
     return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
+def parse_spotify_time(value: Optional[str]) -> Optional[datetime]:
+    # Spotify timestamps look like "2024-05-01T12:34:56Z" (sometimes with .sss)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+def chunked(seq: Sequence, size: int) -> Iterator[List]:
+    # split a sequence into lists of at most `size` items
+    for i in range(0, len(seq), size):
+        yield list(seq[i:i + size])
+
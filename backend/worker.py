@@ -0,0 +1,125 @@
+"""
+Background Job Worker
+@Author: Tuniverse Team
+@Version: 1.0
+@Since: 10/17/2026
+
+Usage:
+    Runs queued jobs (see backend/jobs.py) outside the web server:
+
+        python -m backend.worker                        # JOB_WORKER_CONCURRENCY threads
+        python -m backend.worker --concurrency 4 --processes 2
+        python -m backend.worker --kinds sync,enrich
+
+    Each process runs `concurrency` job slots (threads; jobs are mostly waiting
+    on Spotify). Use --processes, or start more workers on other hosts, to
+    scale out. Every worker shares the queue through the database. On
+    SIGINT/SIGTERM a worker stops claiming and lets running jobs finish;
+    anything it was killed in the middle of is picked up again after its lease
+    expires.
+
+Change Log:
+    Version 1.0 (10/17/2026): Initial creation
+"""
+
+
+
+# worker.py - job worker process
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from typing import List, Optional
+
+from . import jobs, migrations
+from .db import WorkerSessionLocal
+# importing the routers registers their job handlers
+from .routers import artists, playlists  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+
+
+def _slot(worker: str, kinds: Optional[List[str]], stop: threading.Event, poll_interval: float):
+    while not stop.is_set():
+        db = WorkerSessionLocal()
+        try:
+            job = jobs.claim(db, worker, kinds)
+            if job is None:
+                db.close()
+                stop.wait(poll_interval)
+                continue
+            logger.info("running job %s (%s, user %s, attempt %d)", job.id, job.kind, job.user_id, job.attempts)
+            jobs.run(db, job, worker, progress_session_factory=WorkerSessionLocal)
+        except Exception:
+            # DB hiccup while claiming/finishing: back off and carry on
+            logger.exception("worker slot error")
+            stop.wait(poll_interval)
+        finally:
+            db.close()
+
+
+def run_worker(concurrency: int = JOB_WORKER_CONCURRENCY, kinds: Optional[List[str]] = None,
+               poll_interval: float = JOB_POLL_INTERVAL):
+    """
+    Run `concurrency` job slots in this process until SIGINT/SIGTERM.
+    """
+    stop = threading.Event()
+    worker = jobs.worker_id()
+
+    def _stop(signum, frame):
+        logger.info("worker %s stopping (signal %s)", worker, signum)
+        stop.set()
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    logger.info("worker %s: %d slots, kinds=%s", worker, concurrency, kinds or "all")
+    threads = [
+        threading.Thread(target=_slot, args=(worker, kinds, stop, poll_interval), name=f"job-slot-{i}", daemon=True)
+        for i in range(max(1, concurrency))
+    ]
+    for t in threads:
+        t.start()
+    while any(t.is_alive() for t in threads):
+        for t in threads:
+            t.join(timeout=1.0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY, help="job slots per process")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to start")
+    parser.add_argument("--kinds", default="", help="comma-separated job kinds to run (default: all)")
+    parser.add_argument("--poll-interval", type=float, default=JOB_POLL_INTERVAL, help="seconds between polls when idle")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(name)s: %(message)s")
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()] or None
+    migrations.upgrade()  # before any slot touches the jobs table
+    if args.processes <= 1:
+        run_worker(args.concurrency, kinds, args.poll_interval)
+        return
+
+    procs = [
+        multiprocessing.Process(target=run_worker, args=(args.concurrency, kinds, args.poll_interval), name=f"worker-{i}")
+        for i in range(args.processes)
+    ]
+    for p in procs:
+        p.start()
+    # pass SIGTERM on (terminate() sends SIGTERM, which children handle gracefully)
+    signal.signal(signal.SIGTERM, lambda signum, frame: [p.terminate() for p in procs if p.is_alive()])
+    while any(p.is_alive() for p in procs):
+        try:
+            for p in procs:
+                p.join()
+        except KeyboardInterrupt:
+            pass  # Ctrl+C reached the children too; wait for them to finish their jobs
+
+
+if __name__ == "__main__":
+    main()
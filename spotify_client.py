@@ -9,15 +9,11 @@ Change Log:
 Version 1.0 (10/03/2025):
 Gain spotify data for user
 """
-import requests
-import os
-
-SPOTIFY_BASE_URL = "https://api.spotify.com/v1"
+# Delegates to the shared pooled client in backend/spotify_client.py
+from backend.spotify_client import SPOTIFY_API as SPOTIFY_BASE_URL, spotify_request
 
 def spotify_api_get(endpoint: str, token: str, params=None):
-    url = f"{SPOTIFY_BASE_URL}{endpoint}"
-    headers = {"Authorization": f"Bearer {token}"}
-    r = requests.get(url, headers=headers, params=params)
+    r = spotify_request(endpoint, token, params=params)
     if r.status_code == 200:
         return r.json()
     else:
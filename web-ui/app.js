@@ -1,6 +1,6 @@
 /*
 @Author: Tuniverse Team
-@Version: 1.0
+@Version: 1.4
 @Since: 11/9/2025
 
 Usage:
@@ -16,6 +16,14 @@ Usage:
 Change Log:
     Version 1.0 (11/9/2025): Implemented main frontend behavior for Tuniverse, including
                              passport loading, region breakdown, and community sharing.
+    Version 1.1 (10/17/2026): First paint loads profile, passport and top artist from
+                              a single /dashboard call.
+    Version 1.2 (10/17/2026): Community feed is paged (?before=&limit=) with a
+                              "Load older posts" button.
+    Version 1.3 (10/17/2026): New posts arrive live from /community/stream (SSE)
+                              instead of re-fetching the feed.
+    Version 1.4 (10/17/2026): Posts share region counts; the server renders the
+                              passport snippet and the feed references it by hash.
 */
 
 
@@ -28,6 +36,8 @@ const LS_DISPLAY_NAME_KEY = "tuniverse_display_name";
 
 // cache of the last "Artists by Region" HTML
 let lastArtistsByRegionHtml = "";
+// region -> artist count behind lastArtistsByRegionHtml (what a community post shares)
+let lastRegionCounts = {};
 
 /* ------------ Tuniverse Region Definitions ------------ */
 const REGION_ICON_MAP = {
@@ -231,6 +241,12 @@ window.addEventListener("DOMContentLoaded", () => {
             $("displayNameInput").value = savedName;
         }
     }
+
+    loadCommunityFeed();
+
+    if (getAccessToken()) {
+        loadDashboard();
+    }
 });
 
 /* ------------ Auth / Spotify ------------ */
@@ -338,54 +354,64 @@ async function loadPassportCountries() {
         alert("No Spotify access token yet.");
         return;
     }
+    await loadDashboard();
+}
+
+// One round trip for the first paint: profile, passport snapshot and top
+// artists all come from /dashboard (the backend fans out to Spotify in parallel).
+async function loadDashboard() {
+    const token = getAccessToken();
+    if (!token) return;
 
     const countriesBox = $("countriesList");
     if (countriesBox) {
         countriesBox.innerHTML = `<p class="placeholder-text">Loading passport snapshot…</p>`;
     }
+    const statTop = $("statTopArtist");
 
-    const passportUrl = `${API_BASE}/passport/from_token?access_token=${encodeURIComponent(token)}&limit=8`;
-    const topArtistsUrl = `${API_BASE}/spotify/top-artists?access_token=${encodeURIComponent(token)}&limit=1`;
-
+    const url = `${API_BASE}/dashboard?access_token=${encodeURIComponent(token)}&limit=8`;
     try {
-        const [passportRes, topRes] = await Promise.all([
-            fetch(passportUrl),
-            fetch(topArtistsUrl),
-        ]);
+        const res = await fetch(url);
+        if (!res.ok) {
+            const text = await res.text();
+            console.error("dashboard error:", res.status, text);
+            if (countriesBox) {
+                countriesBox.innerHTML =
+                    `<p class="placeholder-text">Failed to load passport countries.</p>`;
+            }
+            if (statTop) {
+                statTop.textContent = "No top artist data";
+            }
+            return;
+        }
+        const data = await res.json();
+        console.log("dashboard:", data);
+
+        if (data.me && data.me.display_name) {
+            setDisplayName(data.me.display_name);
+        }
 
         // Handle passport snapshot
-        if (!passportRes.ok) {
-            const text = await passportRes.text();
-            console.error("passport/from_token error:", passportRes.status, text);
+        if (data.passport) {
+            renderPassportCountries(data.passport);
+            updatePassportStats(data.passport);
+            cacheArtistsByRegionHtml(data.passport);
+        } else {
+            console.error("dashboard passport unavailable:", data.errors);
             if (countriesBox) {
                 countriesBox.innerHTML =
                     `<p class="placeholder-text">Failed to load passport countries.</p>`;
             }
-        } else {
-            const passportData = await passportRes.json();
-            console.log("passport snapshot:", passportData);
-            renderPassportCountries(passportData);
-            updatePassportStats(passportData);
-            cacheArtistsByRegionHtml(passportData);
         }
 
         // Handle top artist
-        const statTop = $("statTopArtist");
-        if (topRes.ok) {
-            const topData = await topRes.json();
-            const items = topData.items || [];
-            const first = items[0];
-            const name = first && first.name ? first.name : null;
-            if (statTop) {
-                statTop.textContent = name || "No top artist data";
-            }
-        } else {
-            if (statTop) {
-                statTop.textContent = "No top artist data";
-            }
+        const first = (data.top_artists || [])[0];
+        const name = first && first.name ? first.name : null;
+        if (statTop) {
+            statTop.textContent = name || "No top artist data";
         }
     } catch (err) {
-        console.error("loadPassportCountries failed:", err);
+        console.error("loadDashboard failed:", err);
         if (countriesBox) {
             countriesBox.innerHTML =
                 `<p class="placeholder-text">Failed to load passport countries.</p>`;
@@ -424,6 +450,7 @@ function renderPassportCountries(data) {
             countryCountInput.value = "0";
         }
         lastArtistsByRegionHtml = "";
+        lastRegionCounts = {};
         return;
     }
 
@@ -492,8 +519,10 @@ function cacheArtistsByRegionHtml(data) {
 
     if (!regionEntries.length || totalArtists === 0) {
         lastArtistsByRegionHtml = "";
+        lastRegionCounts = {};
         return;
     }
+    lastRegionCounts = regionCounts;
 
     // sort regions by count desc, Unknown last
     const sorted = regionEntries.sort((a, b) => {
@@ -581,7 +610,7 @@ async function shareToCommunity() {
     const payload = {
         display_name: displayName || "Anonymous traveler",
         message,
-        passport_summary: lastArtistsByRegionHtml,
+        passport_regions: lastRegionCounts,
     };
 
     const headers = { "Content-Type": "application/json" };
@@ -602,67 +631,150 @@ async function shareToCommunity() {
             return;
         }
         msgBox.value = "";
-        loadCommunityFeed();
+        if (!communityStream || communityStream.readyState === EventSource.CLOSED) {
+            loadCommunityFeed();  // otherwise the stream delivers the new post
+        }
     } catch (err) {
         console.error("shareToCommunity failed:", err);
         alert("Failed to share post (network error).");
     }
 }
 
-async function loadCommunityFeed() {
+// cursor for the next (older) page of the community feed; null = no more posts
+let communityNextBefore = null;
+// newest post id on screen, and the live stream that adds posts above it
+let communityNewestId = 0;
+let communityStream = null;
+
+// passport snippets are stored once on the server and shared by hash; fetch each once
+const passportFragments = new Map();  // hash -> Promise<html>
+
+function loadPassportFragment(hash) {
+    if (!passportFragments.has(hash)) {
+        const req = fetch(`${API_BASE}/community/passport/${hash}`)
+            .then((res) => (res.ok ? res.text() : ""))
+            .catch(() => "");
+        passportFragments.set(hash, req);
+    }
+    return passportFragments.get(hash);
+}
+
+// fill the passport snippets of posts rendered with data-passport-hash
+function hydratePassportFragments(container) {
+    container.querySelectorAll("[data-passport-hash]").forEach(async (el) => {
+        const hash = el.getAttribute("data-passport-hash");
+        el.removeAttribute("data-passport-hash");
+        el.innerHTML = await loadPassportFragment(hash);
+    });
+}
+
+function renderCommunityPost(p) {
+    const name = p.display_name || "Anonymous traveler";
+    const when = p.created_at || "";
+    const hashAttr = p.passport_hash ? ` data-passport-hash="${p.passport_hash}"` : "";
+    const message = p.message || "";
+    return `
+                <div class="community-post">
+                    <div class="community-post-header">
+                        <span class="community-name">${name}</span>
+                        <span class="community-time">${when}</span>
+                    </div>
+                    <div class="community-passport-summary">
+                        <span class="badge-passport">Passport</span>
+                        <div class="community-country"${hashAttr}></div>
+                    </div>
+                    <div class="community-message">${message}</div>
+                </div>
+            `;
+}
+
+// loadCommunityFeed() reloads the newest page; loadCommunityFeed(true) appends the next older one
+async function loadCommunityFeed(older = false) {
     const container = $("communityFeed");
     if (!container) return;
-    container.innerHTML = `<p class="placeholder-text">Loading community feed…</p>`;
+    if (older && !communityNextBefore) return;
+
+    const params = new URLSearchParams({ limit: "20" });
+    if (older) {
+        params.set("before", String(communityNextBefore));
+    } else {
+        container.innerHTML = `<p class="placeholder-text">Loading community feed…</p>`;
+    }
+    const moreBtn = $("communityLoadMore");
+    if (moreBtn) moreBtn.remove();
 
     try {
-        const res = await fetch(`${API_BASE}/community/feed`);
+        const res = await fetch(`${API_BASE}/community/feed?${params}`);
         if (!res.ok) {
             const text = await res.text();
             console.error("community/feed error:", res.status, text);
-            container.innerHTML =
-                `<p class="placeholder-text">Failed to load community feed.</p>`;
+            if (!older) {
+                container.innerHTML =
+                    `<p class="placeholder-text">Failed to load community feed.</p>`;
+            }
             return;
         }
         const data = await res.json();
         const posts = data.posts || data || [];
-        if (!posts.length) {
+        communityNextBefore = data.next_before || null;
+        if (!older) {
+            communityNewestId = posts.length ? posts[0].id : 0;
+            openCommunityStream();
+        }
+        if (!older && !posts.length) {
             container.innerHTML =
                 `<p class="placeholder-text">No posts yet – be the first to share!</p>`;
             return;
         }
 
-        const html = posts
-            .map((p) => {
-                const name = p.display_name || "Anonymous traveler";
-                const when = p.created_at || "";
-                const summaryHtml = p.passport_summary || "";
-                const message = p.message || "";
-                return `
-                <div class="community-post">
-                    <div class="community-post-header">
-                        <span class="community-name">${name}</span>
-                        <span class="community-time">${when}</span>
-                    </div>
-                    <div class="community-passport-summary">
-                        <span class="badge-passport">Passport</span>
-                        <div class="community-country">
-                            ${summaryHtml}
-                        </div>
-                    </div>
-                    <div class="community-message">${message}</div>
-                </div>
-            `;
-            })
-            .join("");
-
-        container.innerHTML = html;
+        const html = posts.map(renderCommunityPost).join("");
+        if (older) {
+            container.insertAdjacentHTML("beforeend", html);
+        } else {
+            container.innerHTML = html;
+        }
+        hydratePassportFragments(container);
+        if (communityNextBefore) {
+            container.insertAdjacentHTML(
+                "beforeend",
+                `<button type="button" id="communityLoadMore" class="btn secondary btn-sm"
+                         onclick="loadCommunityFeed(true)">Load older posts</button>`
+            );
+        }
     } catch (err) {
         console.error("loadCommunityFeed failed:", err);
-        container.innerHTML =
-            `<p class="placeholder-text">Failed to load community feed.</p>`;
+        if (!older) {
+            container.innerHTML =
+                `<p class="placeholder-text">Failed to load community feed.</p>`;
+        }
     }
 }
 
+// live updates: the server pushes each new post once; no polling
+function openCommunityStream() {
+    if (!window.EventSource) return;
+    if (communityStream) communityStream.close();
+
+    communityStream = new EventSource(`${API_BASE}/community/stream?after=${communityNewestId}`);
+    communityStream.addEventListener("post", (e) => {
+        const post = JSON.parse(e.data);
+        if (post.id <= communityNewestId) return;
+        communityNewestId = post.id;
+        const container = $("communityFeed");
+        if (!container) return;
+        const placeholder = container.querySelector(".placeholder-text");
+        if (placeholder) placeholder.remove();
+        container.insertAdjacentHTML("afterbegin", renderCommunityPost(post));
+        hydratePassportFragments(container);
+    });
+    communityStream.addEventListener("resync", () => {
+        // we fell behind; reload the feed (which reopens the stream)
+        communityStream.close();
+        communityStream = null;
+        loadCommunityFeed();
+    });
+}
+
 /* ------------ Achievements ------------ */
 function computeAchievements(countryCount) {
     const n = countryCount || 0;